@@ -1,3 +1,4 @@
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from app.models import AuditLog
 from datetime import datetime
@@ -5,7 +6,16 @@ from fastapi import Request
 from typing import Any
 from app.services.siem import post_siem
 
+_PENDING_KEY = 'audit_siem_pending'
+
+
 def audit(db: Session, actor_user_id: int | None, action: str, entity_type: str, entity_id: str, before: Any = None, after: Any = None, request: Request | None = None):
+    """Add an audit row to the caller's transaction.
+
+    Nothing is committed here: the row is persisted atomically with the change
+    it describes when the caller commits, and the SIEM event is only sent once
+    that commit succeeds (dropped on rollback).
+    """
     ip = request.client.host if request and request.client else None
     ua = request.headers.get('User-Agent') if request else None
     row = AuditLog(
@@ -20,19 +30,31 @@ def audit(db: Session, actor_user_id: int | None, action: str, entity_type: str,
         timestamp=datetime.utcnow(),
     )
     db.add(row)
-    db.commit()
-    # Fire and forget SIEM webhook
-    try:
-        post_siem({
-            "actor_user_id": actor_user_id,
-            "action": action,
-            "entity_type": entity_type,
-            "entity_id": str(entity_id),
-            "before": before,
-            "after": after,
-            "ip": ip,
-            "user_agent": ua,
-            "timestamp": row.timestamp.isoformat()+"Z",
-        })
-    except Exception:
-        pass
+    db.info.setdefault(_PENDING_KEY, []).append({
+        "actor_user_id": actor_user_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": str(entity_id),
+        "before": before,
+        "after": after,
+        "ip": ip,
+        "user_agent": ua,
+        "timestamp": row.timestamp.isoformat()+"Z",
+    })
+    return row
+
+
+@event.listens_for(Session, 'after_commit')
+def _forward_committed(session: Session):
+    for evt in session.info.pop(_PENDING_KEY, ()):
+        # Fire and forget SIEM webhook
+        try:
+            post_siem(evt)
+        except Exception:
+            pass
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rolled_back(session: Session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
@@ -9,9 +9,20 @@ class Settings(BaseSettings):
     OIDC_ISSUER: str | None = None
     OIDC_AUDIENCE: str | None = None
     OIDC_JWKS_URL: str | None = None
+    OIDC_JWKS_TTL_SEC: float = 3600
+    OIDC_JWKS_REFRESH_AHEAD_SEC: float = 300
+    OIDC_JWKS_MIN_REFETCH_SEC: float = 30
+    OIDC_HTTP_TIMEOUT_SEC: float = 5.0
+    OIDC_TOKEN_CACHE_SIZE: int = 10000
 
     DATABASE_URL: str
     REDIS_URL: str
+    # async routes (asyncpg); derived from DATABASE_URL unless set
+    ASYNC_DATABASE_URL: str | None = None
+    ASYNC_DB_POOL_SIZE: int = 20
+    ASYNC_DB_MAX_OVERFLOW: int = 20
+    ASYNC_DB_POOL_TIMEOUT_SEC: float = 10.0
+    ASYNC_DB_POOL_RECYCLE_SEC: int = 1800
 
     S3_ENDPOINT_URL: str | None = None
     S3_ACCESS_KEY: str | None = None
@@ -19,17 +30,109 @@ class Settings(BaseSettings):
     S3_REGION: str = "us-east-1"
     S3_BUCKET: str = "artifacts"
     S3_SECURE: bool = False
+    S3_MAX_POOL_CONNECTIONS: int = 20
+    S3_PART_SIZE_MB: int = 8
+    ARTIFACT_UPLOAD_CONCURRENCY: int = 4
+    ARTIFACT_URL_TTL_SEC: int = 3600  # lifetime of a presigned download link
+    ARTIFACT_URL_REFRESH_SEC: int = 300  # a cached link is re-signed once it has less than this left
+    ARTIFACT_URL_CACHE_SIZE: int = 50000
 
     SIEM_WEBHOOK_URL: str | None = None
+    SIEM_FORMAT: str = "ndjson"  # ndjson | array
+    SIEM_BATCH_SIZE: int = 100
+    SIEM_FLUSH_INTERVAL_SEC: float = 1.0
+    SIEM_QUEUE_MAX: int = 10000
+    SIEM_TIMEOUT_SEC: float = 5.0
+    SIEM_MAX_RETRIES: int = 3
+    SIEM_MAX_BACKOFF_SEC: float = 60.0
+    SIEM_SPOOL_DIR: str = "/tmp/ssr-siem-spool"
+    SIEM_SPOOL_MAX_MB: int = 64
+
+    RBAC_CACHE_SIZE: int = 10000
+    RBAC_VERSION_CHECK_SEC: float = 1.0
+    # read-through Module/User/Script snapshots (services/entity_cache.py)
+    ENTITY_CACHE_SIZE: int = 10000
+    ENTITY_CACHE_TTL_SEC: float = 300
+    ENTITY_CACHE_VERSION_CHECK_SEC: float = 1.0
 
     SCRIPT_BASE: str = "/opt/scripts"
     ALLOW_INTERPRETERS: str = "python3,bash,pwsh,node"
+    CHECKSUM_WORKERS: int = 8
+    MODULE_SPEC_CACHE_SIZE: int = 1024  # compiled validators/command builders, keyed by (module_id, version)
     RUNNER_IMAGE: str = "secure-script-runner/runner:latest"
+    RUNNER_POOL_SIZE: int = 2  # warm containers per limits profile; 0 disables refill-ahead
+    RUNNER_POOL_MAX_IDLE: int = 8
+    # "prefork": one execution per Celery child; "async": each child multiplexes executions on an event loop
+    EXECUTION_ENGINE: str = "prefork"
+    ASYNC_ENGINE_MAX_CONCURRENCY: int = 200
+    ASYNC_ENGINE_THREADS: int = 16
+    ASYNC_ENGINE_SHUTDOWN_GRACE_SEC: float = 30.0
+    DOCKER_SOCKET: str = "/var/run/docker.sock"
+    DOCKER_API_VERSION: str = "v1.43"
+    # sandbox backends modules may select; "process" runs scripts as confined local processes
+    # (rlimits, private workdir and network namespace) for trusted, short-lived modules
+    SANDBOX_BACKENDS: str = "docker"
+    LOCAL_SANDBOX_ROOT: str | None = None  # parent of per-execution workdirs; the system temp dir if unset
+    LOCAL_SANDBOX_UID: int = 1000  # scripts run as this user when the worker is root
+    LOCAL_SANDBOX_GID: int = 1000
+    LOCAL_SANDBOX_CGROUP: str | None = None  # delegated cgroup v2 directory for cpu.max/memory.max; rlimits only if unset
+    LOCAL_SANDBOX_MAX_PROCS: int = 64
+    LOCAL_SANDBOX_MAX_FILE_MB: int = 1024
+
+    BATCH_MAX_EXECUTIONS: int = 1000  # parameter sets per POST /{id}/execute/batch
+    RESULT_CACHE_TTL_SEC: int = 3600  # memoized results of cacheable modules
+
+    # Admission scheduler (services/scheduler.py); when disabled executions go straight to Celery
+    SCHEDULER_ENABLED: bool = True
+    SCHED_MAX_PER_MODULE: int = 10
+    SCHED_MAX_PER_USER: int = 5
+    SCHED_STARVATION_SEC: float = 120.0
+    SCHED_SCAN_LIMIT: int = 500
+    SCHED_HEARTBEAT_SEC: float = 10.0
+    SCHED_WORKER_TTL_SEC: float = 30.0
+    SCHED_LOCK_TTL_SEC: float = 10.0
+    SCHED_DISPATCH_INTERVAL_SEC: float = 5.0
+    SCHED_SECRET_TTL_SEC: int = 86400  # secret parameter values of a pending job; it fails if they expire first
+    # host capacity advertised by a worker node; unset means detect (80% of RAM for memory)
+    WORKER_CPU: float | None = None
+    WORKER_MEM_MB: int | None = None
+    WORKER_SLOTS: int | None = None
 
     DEFAULT_TIMEOUT_SEC: int = 600
     DEFAULT_CPU_LIMIT: float = 1.0
     DEFAULT_MEM_LIMIT_MB: int = 512
     MAX_OUTPUT_MB: int = 16
+    LOG_TAIL_KB: int = 256  # kept in memory once MAX_OUTPUT_MB is exceeded, logged at the end
+    OUTPUT_OVERFLOW_MAX_MB: int = 1024  # cap on the overflow artifact; 0 for no cap
+
+    LOG_CHUNK_MAX_CHARS: int = 16384
+    LOG_FLUSH_BATCH: int = 200
+    LOG_FLUSH_INTERVAL_SEC: float = 0.5
+    REDACTION_HOLD_CHARS: int = 256
+    LOG_PAGE_SIZE: int = 1000
+    LOG_PAGE_MAX: int = 5000
+    # only used once execution_logs has been converted with `python -m app.migrations.execution_logs partition`
+    LOG_PARTITIONS_AHEAD_DAYS: int = 3
+    LOG_RETENTION_DAYS: int = 0  # 0 keeps every partition
+    LOG_ARCHIVE_ENABLED: bool = True
+    LOG_ARCHIVE_DELAY_SEC: int = 300
+    LOG_ARCHIVE_BLOCK_KB: int = 256
+    LOG_ARCHIVE_SWEEP_BATCH: int = 100
+    # retention sweeper (services/retention.py), 0 keeps forever; Module.retention_days overrides the first
+    EXECUTION_RETENTION_DAYS: int = 0
+    ARTIFACT_RETENTION_DAYS: int = 0  # sets ExecutionArtifact.retention_until; may be shorter than the execution's
+    AUDIT_RETENTION_DAYS: int = 0
+    RETENTION_BATCH_SIZE: int = 500  # rows per delete and transaction
+    RETENTION_MAX_RUNTIME_SEC: float = 300.0  # per sweep; the next one resumes from the checkpoint
+    RETENTION_SWEEP_INTERVAL_SEC: float = 3600.0
+
+    EVENTS_QUEUE_MAX: int = 1000
+    EVENTS_KEEPALIVE_SEC: float = 15.0
+    LONG_POLL_MAX_SEC: float = 30.0
+
+    # /metrics on the API; workers write to PROMETHEUS_MULTIPROC_DIR, served by app.worker.metrics_exporter
+    METRICS_ENABLED: bool = True
+    WORKER_METRICS_PORT: int = 9808
 
     class Config:
         env_file = ".env"
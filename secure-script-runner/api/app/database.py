@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.config import settings
 
@@ -15,3 +16,51 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async engine for the hot API routes; Celery and the rest keep the sync one above.
+_ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+_async_engine = None
+_async_sessions = None
+
+
+def async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    backend = url.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver for {backend}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=_ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def async_engine():
+    """Created on first use so processes that never serve requests need no async driver."""
+    global _async_engine, _async_sessions
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        url = async_database_url()
+        kw = {}
+        if not url.startswith('sqlite'):
+            # no thread is parked per checkout, so the pool can be sized for request concurrency
+            kw = dict(pool_size=settings.ASYNC_DB_POOL_SIZE, max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+                      pool_timeout=settings.ASYNC_DB_POOL_TIMEOUT_SEC, pool_recycle=settings.ASYNC_DB_POOL_RECYCLE_SEC)
+        _async_engine = create_async_engine(url, pool_pre_ping=True, **kw)
+        # nothing is read after commit in the async routes, and a lazy refresh would need the loop anyway
+        _async_sessions = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    async_engine()
+    return _async_sessions()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
@@ -1,18 +1,34 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response
 from app.config import settings
-from app.database import Base, engine
-from app.routes import scripts, modules, assignments, executions, audit
+from app.database import Base, engine, dispose_async_engine
+from app.routes import scripts, modules, assignments, executions, audit, groups
+from app.services import metrics
 
 app = FastAPI(title="Secure Script Runner", version="0.1.0")
 
 # Create tables (MVP). For production use Alembic migrations.
 Base.metadata.create_all(bind=engine)
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.RequestMetrics)
+
 app.include_router(scripts.router)
 app.include_router(modules.router)
 app.include_router(assignments.router)
 app.include_router(executions.router)
 app.include_router(audit.router)
+app.include_router(groups.router)
+
+@app.on_event('shutdown')
+async def _close_async_pool():
+    await dispose_async_engine()
+
+@app.get('/metrics', include_in_schema=False)
+def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    data, content_type = metrics.render()
+    return Response(data, media_type=content_type)
 
 @app.get('/')
 def root():
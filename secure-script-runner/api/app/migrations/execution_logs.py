@@ -0,0 +1,99 @@
+"""Schema migrations for ``execution_logs`` on PostgreSQL.
+
+``create_all`` only creates missing tables, so existing deployments apply these
+by hand (run from api/):
+
+    python -m app.migrations.execution_logs index        # composite (execution_id, sequence_no) index
+    python -m app.migrations.execution_logs partition    # convert to daily RANGE partitions on timestamp
+    python -m app.migrations.execution_logs partition --dry-run
+
+On the partitioned table ``ux_execution_logs_exec_seq`` covers
+``(execution_id, sequence_no, "timestamp")``, because a unique index there has
+to include the partition key. ``(execution_id, sequence_no)`` alone is then no
+longer enforced unique by the database; the log ingestor is the only writer and
+hands out sequence numbers per execution, so nothing relies on the constraint.
+
+After ``partition``, the ``app.tasks.maintain_log_partitions`` beat task keeps
+partitions ahead of time and drops days older than ``LOG_RETENTION_DAYS``.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app.config import settings
+from app.database import engine
+from app.services.log_partitions import TABLE, create_partition_sql, is_partitioned
+
+INDEX_SQL = f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_execution_logs_exec_seq ON {TABLE} (execution_id, sequence_no)"
+
+# A unique index on a partitioned table has to include the partition key; the
+# leading (execution_id, sequence_no) columns still serve the range reads.
+PARTITIONED_DDL = [
+    f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE",
+    f"ALTER TABLE {TABLE} RENAME TO {TABLE}_legacy",
+    f"ALTER TABLE {TABLE}_legacy RENAME CONSTRAINT {TABLE}_pkey TO {TABLE}_legacy_pkey",
+    "ALTER INDEX IF EXISTS ux_execution_logs_exec_seq RENAME TO ux_execution_logs_legacy_exec_seq",
+    f"ALTER TABLE {TABLE}_legacy ALTER COLUMN id DROP DEFAULT",
+    f"""CREATE TABLE {TABLE} (
+        id INTEGER NOT NULL DEFAULT nextval('{TABLE}_id_seq'),
+        execution_id INTEGER REFERENCES executions (id),
+        "timestamp" TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        stream VARCHAR(10) NOT NULL,
+        chunk_text_redacted TEXT NOT NULL,
+        sequence_no INTEGER NOT NULL,
+        PRIMARY KEY (id, "timestamp")
+    ) PARTITION BY RANGE ("timestamp")""",
+    f"ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id",
+    f'CREATE UNIQUE INDEX ux_execution_logs_exec_seq ON {TABLE} (execution_id, sequence_no, "timestamp")',
+    # safety net for rows outside the pre-created range; keep it empty by running the beat task
+    f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT",
+]
+
+
+def add_index(dry_run: bool = False):
+    print(INDEX_SQL)
+    if dry_run:
+        return
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if is_partitioned(conn):
+            print("execution_logs is partitioned; index is created by the partition migration")
+            return
+        conn.execute(text(INDEX_SQL))
+
+
+def partition(dry_run: bool = False, keep_legacy: bool = False):
+    with engine.begin() as conn:
+        if conn.dialect.name != 'postgresql':
+            sys.exit("partitioning requires PostgreSQL")
+        if is_partitioned(conn):
+            print("execution_logs is already partitioned")
+            return
+        first = conn.execute(text(f'SELECT min("timestamp") FROM {TABLE}')).scalar()
+        today = datetime.utcnow().date()
+        day = (first.date() if first else today)
+        stmts = list(PARTITIONED_DDL)
+        while day <= today + timedelta(days=settings.LOG_PARTITIONS_AHEAD_DAYS):
+            stmts.append(create_partition_sql(day))
+            day += timedelta(days=1)
+        stmts.append(f'INSERT INTO {TABLE} (id, execution_id, "timestamp", stream, chunk_text_redacted, sequence_no) '
+                     f'SELECT id, execution_id, "timestamp", stream, chunk_text_redacted, sequence_no FROM {TABLE}_legacy')
+        if not keep_legacy:
+            stmts.append(f"DROP TABLE {TABLE}_legacy")
+        for s in stmts:
+            print(s + ';')
+            if not dry_run:
+                conn.execute(text(s))
+        if dry_run:
+            conn.rollback()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('step', choices=['index', 'partition'])
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--keep-legacy', action='store_true', help='keep execution_logs_legacy after copying')
+    args = parser.parse_args()
+    if args.step == 'index':
+        add_index(args.dry_run)
+    else:
+        partition(args.dry_run, args.keep_legacy)
@@ -0,0 +1,160 @@
+"""Column and index migrations for databases created before a model change.
+
+``create_all`` only creates missing tables, so existing deployments apply the
+steps for what they are missing by hand (run from api/):
+
+    python -m app.migrations.schema list
+    python -m app.migrations.schema apply artifact_checksums --dry-run
+    python -m app.migrations.schema apply all
+
+A step names model columns and indexes; the DDL is compiled from the models
+for the connected database. Everything is idempotent: columns and indexes
+that already exist are skipped, an existing column is only altered when its
+type or nullability differs from the model. New columns get the model's
+scalar default as a server default so existing rows are backfilled. Type and
+NOT NULL changes are PostgreSQL only (SQLite cannot alter a column and ignores
+declared types; recreate a dev database instead). Indexes are built
+``CONCURRENTLY`` on PostgreSQL.
+"""
+import argparse
+import sys
+from dataclasses import dataclass, field
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.schema import CreateIndex
+from app.database import Base, engine
+import app.models  # noqa: F401  (register tables)
+
+
+@dataclass
+class Step:
+    doc: str
+    columns: list[tuple[str, str]] = field(default_factory=list)  # (table, column)
+    indexes: list[tuple[str, str]] = field(default_factory=list)  # (table, index name)
+
+
+STEPS: dict[str, Step] = {
+    'artifact_checksums': Step(
+        'execution_artifacts: BIGINT size_bytes and checksum_sha256 for streamed uploads',
+        columns=[('execution_artifacts', 'size_bytes'), ('execution_artifacts', 'checksum_sha256')],
+    ),
+    'assignment_subjects': Step(
+        'module_assignments: (subject_type, subject_id) index for effective-permission expansion',
+        indexes=[('module_assignments', 'ix_module_assignments_subject')],
+    ),
+    'audit_keyset': Step(
+        'audit_logs: (timestamp, id) keyset indexes, overall and per actor, action and entity',
+        indexes=[('audit_logs', 'ix_audit_logs_ts_id'), ('audit_logs', 'ix_audit_logs_actor_ts'),
+                 ('audit_logs', 'ix_audit_logs_action_ts'), ('audit_logs', 'ix_audit_logs_entity_ts')],
+    ),
+    'log_archive': Step(
+        'executions: log_archive_key, log_archive_index_offset for compacted logs',
+        columns=[('executions', 'log_archive_key'), ('executions', 'log_archive_index_offset')],
+    ),
+    'scheduler': Step(
+        'executions: lane, queued_at, dispatched_at, queue_wait_ms; modules: max_concurrency',
+        columns=[('executions', 'lane'), ('executions', 'queued_at'), ('executions', 'dispatched_at'),
+                 ('executions', 'queue_wait_ms'), ('modules', 'max_concurrency')],
+    ),
+    'batches': Step(
+        'executions: batch_id and its (batch_id, status) index for batch fan-out',
+        columns=[('executions', 'batch_id')],
+        indexes=[('executions', 'ix_executions_batch_status')],
+    ),
+    'memo': Step(
+        'executions: idempotency_key, request_hash, memo_key, memo_source_id; modules: cacheable, cache_ttl_sec',
+        columns=[('executions', 'idempotency_key'), ('executions', 'request_hash'), ('executions', 'memo_key'),
+                 ('executions', 'memo_source_id'), ('modules', 'cacheable'), ('modules', 'cache_ttl_sec')],
+        indexes=[('executions', 'ux_executions_idempotency')],
+    ),
+    'runtime_float': Step(
+        'executions: runtime_sec as a float',
+        columns=[('executions', 'runtime_sec')],
+    ),
+    'sandbox_backend': Step(
+        'modules: sandbox_backend',
+        columns=[('modules', 'sandbox_backend')],
+    ),
+    'retention': Step(
+        'modules: retention_days; indexes for the retention sweep',
+        columns=[('modules', 'retention_days')],
+        indexes=[('executions', 'ix_executions_module_finished'), ('executions', 'ix_executions_memo_source'),
+                 ('execution_params', 'ix_execution_params_execution'), ('execution_artifacts', 'ix_execution_artifacts_execution'),
+                 ('execution_artifacts', 'ix_execution_artifacts_retention')],
+    ),
+    'artifact_keys': Step(
+        'execution_artifacts: storage_key; storage_url_signed no longer required',
+        columns=[('execution_artifacts', 'storage_key'), ('execution_artifacts', 'storage_url_signed')],
+    ),
+}
+
+
+def _default_sql(col, dialect) -> str:
+    default = col.default
+    if default is None or not default.is_scalar:
+        return ''
+    return ' DEFAULT ' + str(literal(default.arg).compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+
+def column_ddl(conn, table: str, name: str) -> list[str]:
+    col = Base.metadata.tables[table].c[name]
+    dialect = conn.dialect
+    existing = {c['name']: c for c in inspect(conn).get_columns(table)}
+    col_type = col.type.compile(dialect=dialect)
+    if name not in existing:
+        ddl = f"ALTER TABLE {table} ADD COLUMN {name} {col_type}{_default_sql(col, dialect)}"
+        for fk in col.foreign_keys:
+            ddl += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+        return [ddl]
+    stmts = []
+    # SQLite column types are only affinities: an INTEGER column already holds 64-bit values and floats
+    if dialect.name == 'postgresql' and not isinstance(existing[name]['type'], type(col.type)):
+        stmts.append(f"ALTER TABLE {table} ALTER COLUMN {name} TYPE {col_type} USING {name}::{col_type}")
+    if col.nullable and not existing[name]['nullable']:
+        stmts.append(f"ALTER TABLE {table} ALTER COLUMN {name} DROP NOT NULL")
+    if stmts and dialect.name != 'postgresql':
+        print(f"-- {table}.{name}: {'; '.join(stmts)} needs PostgreSQL; skipped")
+        return []
+    return stmts
+
+
+def index_ddl(conn, table: str, name: str) -> list[str]:
+    if name in {i['name'] for i in inspect(conn).get_indexes(table)}:
+        return []
+    index = next(i for i in Base.metadata.tables[table].indexes if i.name == name)
+    ddl = str(CreateIndex(index).compile(dialect=conn.dialect))
+    if conn.dialect.name == 'postgresql':
+        ddl = ddl.replace(' INDEX ', ' INDEX CONCURRENTLY ', 1)
+    return [ddl]
+
+
+def apply(names: list[str], dry_run: bool = False):
+    # new tables first (the app's own create_all), so new foreign keys have a target
+    if not dry_run:
+        Base.metadata.create_all(bind=engine)
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for name in names:
+            step = STEPS[name]
+            print(f"-- {name}: {step.doc}")
+            stmts = [s for t, c in step.columns for s in column_ddl(conn, t, c)]
+            stmts += [s for t, i in step.indexes for s in index_ddl(conn, t, i)]
+            for s in stmts:
+                print(s + ';')
+                if not dry_run:
+                    conn.execute(text(s))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['list', 'apply'])
+    parser.add_argument('steps', nargs='*', help="step names, or 'all'")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+    if args.command == 'list':
+        for name, step in STEPS.items():
+            print(f"{name:24} {step.doc}")
+        sys.exit()
+    names = list(STEPS) if args.steps in ([], ['all']) else args.steps
+    unknown = [n for n in names if n not in STEPS]
+    if unknown:
+        sys.exit(f"unknown step(s): {', '.join(unknown)}; see 'list'")
+    apply(names, args.dry_run)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Boolean, DateTime, Text, ForeignKey, JSON, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import datetime
 from app.database import Base
@@ -17,6 +17,8 @@ class ExecStatus(str, enum.Enum):
     canceled = "canceled"
     timeout = "timeout"
 
+TERMINAL_STATUSES = {ExecStatus.succeeded.value, ExecStatus.failed.value, ExecStatus.canceled.value, ExecStatus.timeout.value}
+
 class User(Base):
     __tablename__ = 'users'
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -33,6 +35,14 @@ class Group(Base):
     name: Mapped[str] = mapped_column(String(200), unique=True)
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+class GroupMember(Base):
+    __tablename__ = 'group_members'
+    __table_args__ = (UniqueConstraint('group_id', 'user_id'), Index('ix_group_members_user', 'user_id'))
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    group_id: Mapped[int] = mapped_column(Integer, ForeignKey('groups.id'))
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'))
+    added_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
 class Script(Base):
     __tablename__ = 'scripts'
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -64,9 +74,16 @@ class Module(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     enabled: Mapped[bool] = mapped_column(Boolean, default=True)
+    max_concurrency: Mapped[int | None] = mapped_column(Integer, nullable=True)  # None: SCHED_MAX_PER_MODULE
+    # deterministic, read-only modules: identical requests reuse a recent succeeded run (services/memo.py)
+    cacheable: Mapped[bool] = mapped_column(Boolean, default=False)
+    cache_ttl_sec: Mapped[int | None] = mapped_column(Integer, nullable=True)  # None: RESULT_CACHE_TTL_SEC
+    sandbox_backend: Mapped[str] = mapped_column(String(20), default='docker')  # app/worker/sandbox.py
+    retention_days: Mapped[int | None] = mapped_column(Integer, nullable=True)  # None: EXECUTION_RETENTION_DAYS, 0: keep
 
 class ModuleAssignment(Base):
     __tablename__ = 'module_assignments'
+    __table_args__ = (Index('ix_module_assignments_subject', 'subject_type', 'subject_id'),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     module_id: Mapped[int] = mapped_column(Integer, ForeignKey('modules.id'))
     subject_type: Mapped[str] = mapped_column(String(10))  # user | group
@@ -75,24 +92,53 @@ class ModuleAssignment(Base):
     assigned_by: Mapped[int | None] = mapped_column(Integer, ForeignKey('users.id'))
     assigned_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+class ExecutionBatch(Base):
+    __tablename__ = 'execution_batches'
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    module_id: Mapped[int] = mapped_column(Integer, ForeignKey('modules.id'))
+    trigger_user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'))
+    lane: Mapped[str] = mapped_column(String(20), default='batch')
+    total: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
 class Execution(Base):
     __tablename__ = 'executions'
+    __table_args__ = (
+        Index('ix_executions_batch_status', 'batch_id', 'status'),
+        Index('ux_executions_idempotency', 'trigger_user_id', 'idempotency_key', unique=True),
+        Index('ix_executions_module_finished', 'module_id', 'finished_at'),
+        Index('ix_executions_memo_source', 'memo_source_id'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     module_id: Mapped[int] = mapped_column(Integer, ForeignKey('modules.id'))
     trigger_user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'))
     status: Mapped[str] = mapped_column(String(20), default=ExecStatus.queued.value)
+    lane: Mapped[str] = mapped_column(String(20), default='interactive')
+    queued_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow, nullable=True)
+    dispatched_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    queue_wait_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
     started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     exit_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
-    runtime_sec: Mapped[float | None] = mapped_column(Integer, nullable=True)
+    runtime_sec: Mapped[float | None] = mapped_column(Float, nullable=True)
     worker_id: Mapped[str | None] = mapped_column(String(100), nullable=True)
     sandbox_id: Mapped[str | None] = mapped_column(String(200), nullable=True)
     redactions_applied: Mapped[bool] = mapped_column(Boolean, default=False)
     error_summary: Mapped[str | None] = mapped_column(Text, nullable=True)
     approvals_info_json: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # set once the log rows have been compacted into object storage (see services/log_archive.py)
+    log_archive_key: Mapped[str | None] = mapped_column(String(300), nullable=True)
+    log_archive_index_offset: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    batch_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('execution_batches.id'), nullable=True)
+    idempotency_key: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    request_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    memo_key: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # memoized run: logs and artifacts are read from this execution
+    memo_source_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('executions.id'), nullable=True)
 
 class ExecutionParam(Base):
     __tablename__ = 'execution_params'
+    __table_args__ = (Index('ix_execution_params_execution', 'execution_id'),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     execution_id: Mapped[int] = mapped_column(Integer, ForeignKey('executions.id'))
     key: Mapped[str] = mapped_column(String(200))
@@ -101,6 +147,9 @@ class ExecutionParam(Base):
 
 class ExecutionLog(Base):
     __tablename__ = 'execution_logs'
+    # unique on (execution_id, sequence_no) as created here; once partitioned the index also
+    # carries "timestamp" (see app.migrations.execution_logs), so the pair alone is not enforced
+    __table_args__ = (Index('ux_execution_logs_exec_seq', 'execution_id', 'sequence_no', unique=True),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     execution_id: Mapped[int] = mapped_column(Integer, ForeignKey('executions.id'))
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -110,16 +159,29 @@ class ExecutionLog(Base):
 
 class ExecutionArtifact(Base):
     __tablename__ = 'execution_artifacts'
+    __table_args__ = (
+        Index('ix_execution_artifacts_execution', 'execution_id'),
+        Index('ix_execution_artifacts_retention', 'retention_until'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     execution_id: Mapped[int] = mapped_column(Integer, ForeignKey('executions.id'))
     filename: Mapped[str] = mapped_column(String(300))
-    size_bytes: Mapped[int] = mapped_column(Integer)
+    size_bytes: Mapped[int] = mapped_column(BigInteger)
     content_type: Mapped[str] = mapped_column(String(100))
-    storage_url_signed: Mapped[str] = mapped_column(Text)
+    checksum_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    storage_key: Mapped[str | None] = mapped_column(String(500), nullable=True)  # None on rows written before keys were stored
+    storage_url_signed: Mapped[str | None] = mapped_column(Text, nullable=True)  # legacy; links are signed per request
     retention_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
 class AuditLog(Base):
     __tablename__ = 'audit_logs'
+    # keyset pagination walks (timestamp, id) descending, optionally within one filter
+    __table_args__ = (
+        Index('ix_audit_logs_ts_id', 'timestamp', 'id'),
+        Index('ix_audit_logs_actor_ts', 'actor_user_id', 'timestamp', 'id'),
+        Index('ix_audit_logs_action_ts', 'action', 'timestamp', 'id'),
+        Index('ix_audit_logs_entity_ts', 'entity_type', 'entity_id', 'timestamp', 'id'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     actor_user_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('users.id'))
     action: Mapped[str] = mapped_column(String(200))
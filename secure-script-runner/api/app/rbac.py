@@ -1,12 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import or_, and_
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from app.models import User, ModuleAssignment, Module
+from app.config import settings
+from app.models import User, ModuleAssignment, Module, GroupMember
+from app.services.redis_client import client as redis_client
 
 class Permission:
     RUN = 'run'
     VIEW = 'view'
     MANAGE = 'manage'
 
+ADMIN_ROLES = ('admin', 'super_admin')
+VERSION_KEY = 'rbac:version'
+
+
+class PermissionIndex:
+    """Effective permissions per user: ``{module_id: frozenset(perms)}``.
+
+    Built from the user's own assignments plus those of every group they
+    belong to, and kept in an in-process LRU. Entries are tagged with a
+    version counter held in Redis; ``invalidate()`` bumps it so every API
+    process rebuilds on its next lookup (checked at most every
+    ``RBAC_VERSION_CHECK_SEC``). Lookups are then dict/set membership tests.
+    """
+
+    def __init__(self, max_size: int | None = None, check_interval: float | None = None):
+        self.max_size = settings.RBAC_CACHE_SIZE if max_size is None else max_size
+        self.check_interval = settings.RBAC_VERSION_CHECK_SEC if check_interval is None else check_interval
+        self._entries: OrderedDict[int, tuple[int, dict[int, frozenset[str]]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self._checked_at = 0.0
+
+    def version(self) -> int:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            try:
+                self._version = int(redis_client().get(VERSION_KEY) or 0)
+            except Exception:
+                # Redis unavailable: fall back to not caching across requests
+                self._version = -1
+            self._checked_at = now
+        return self._version
+
+    def invalidate(self):
+        try:
+            self._version = int(redis_client().incr(VERSION_KEY))
+            self._checked_at = time.monotonic()
+        except Exception:
+            self._version = -1
+        with self._lock:
+            self._entries.clear()
+
+    def effective(self, db: Session, user_id: int) -> dict[int, frozenset[str]]:
+        v = self.version()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == v and v >= 0:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        perms = self._build(db, user_id)
+        if v >= 0:
+            with self._lock:
+                self._entries[user_id] = (v, perms)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return perms
+
+    @staticmethod
+    def _build(db: Session, user_id: int) -> dict[int, frozenset[str]]:
+        group_ids = db.query(GroupMember.group_id).filter(GroupMember.user_id == user_id)
+        rows = db.query(ModuleAssignment.module_id, ModuleAssignment.permissions).filter(or_(
+            and_(ModuleAssignment.subject_type == 'user', ModuleAssignment.subject_id == user_id),
+            and_(ModuleAssignment.subject_type == 'group', ModuleAssignment.subject_id.in_(group_ids.scalar_subquery())),
+        ))
+        merged: dict[int, set[str]] = {}
+        for module_id, perms in rows:
+            merged.setdefault(module_id, set()).update(perms or [])
+        return {mid: frozenset(p) for mid, p in merged.items()}
+
+    def has(self, db: Session, user_id: int, module_id: int, perm: str) -> bool:
+        return perm in self.effective(db, user_id).get(module_id, ())
+
+    def modules(self, db: Session, user_id: int, perm: str | None = None) -> set[int]:
+        eff = self.effective(db, user_id)
+        return {mid for mid, p in eff.items() if perm is None or perm in p}
+
+
+permission_index = PermissionIndex()
+
 
 def ensure_role(user: User, allowed: list[str]):
     if user.role not in allowed:
@@ -14,12 +100,9 @@ def ensure_role(user: User, allowed: list[str]):
 
 
 def ensure_module_permission(db: Session, user: User, module_id: int, perm: str):
-    # For MVP: user-based assignments only
-    q = db.query(ModuleAssignment).filter_by(module_id=module_id, subject_type='user', subject_id=user.id)
-    for a in q:
-        if perm in (a.permissions or []):
-            return
+    if permission_index.has(db, user.id, module_id, perm):
+        return
     # allow admins to view/manage
-    if user.role in ['admin', 'super_admin']:
+    if user.role in ADMIN_ROLES:
         return
     raise HTTPException(status_code=403, detail=f"Missing permission {perm} on module {module_id}")
@@ -4,6 +4,7 @@ from app.database import get_db
 from app.models import ModuleAssignment, User
 from app.schemas import AssignmentIn
 from app.audit import audit
+from app.rbac import permission_index
 
 router = APIRouter(prefix="/api/modules", tags=["assignments"])
 
@@ -15,6 +16,7 @@ def assign_module(id: int, payload: AssignmentIn, request: Request, db: Session
 
     a = ModuleAssignment(module_id=id, subject_type=payload.subject_type, subject_id=payload.subject_id, permissions=payload.permissions, assigned_by=admin.id)
     db.add(a)
-    db.commit()
     audit(db, admin.id, 'module.assign', 'module', str(id), None, a.permissions, request)
+    db.commit()
+    permission_index.invalidate()
     return {"ok": True}
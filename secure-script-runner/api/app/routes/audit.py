@@ -1,13 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import AuditLog
+from app.services.siem import forwarder
 
 router = APIRouter(prefix="/api/audit", tags=["audit"])
 
+
+def _utc(dt: datetime) -> datetime:
+    # timestamps are stored as naive UTC
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def _encode_cursor(ts: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{row_id}".encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get('')
-def list_audit(db: Session = Depends(get_db)):
-    rows = db.query(AuditLog).order_by(AuditLog.timestamp.desc()).limit(200).all()
+def list_audit(
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=1000),
+    actor: int | None = None,
+    action: str | None = None,
+    entity_type: str | None = None,
+    entity_id: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    db: Session = Depends(get_db),
+):
+    """Newest first. Pass the ``X-Next-Cursor`` response header back as ``cursor`` for the next page.
+
+    Pages are keyed on ``(timestamp, id)`` rather than OFFSET, so every page is
+    an index range scan no matter how deep it is.
+    """
+    q = db.query(AuditLog)
+    if actor is not None:
+        q = q.filter(AuditLog.actor_user_id == actor)
+    if action:
+        q = q.filter(AuditLog.action == action)
+    if entity_type:
+        q = q.filter(AuditLog.entity_type == entity_type)
+    if entity_id:
+        q = q.filter(AuditLog.entity_id == entity_id)
+    if since:
+        q = q.filter(AuditLog.timestamp >= _utc(since))
+    if until:
+        q = q.filter(AuditLog.timestamp < _utc(until))
+    if cursor:
+        ts, row_id = _decode_cursor(cursor)
+        q = q.filter(tuple_(AuditLog.timestamp, AuditLog.id) < tuple_(ts, row_id))
+    rows = q.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers['X-Next-Cursor'] = _encode_cursor(rows[-1].timestamp, rows[-1].id)
     return [
         {
             "id": r.id,
@@ -18,3 +76,8 @@ def list_audit(db: Session = Depends(get_db)):
             "timestamp": r.timestamp.isoformat()+"Z",
         } for r in rows
     ]
+
+@router.get('/siem')
+def siem_stats():
+    """Forwarder throughput and backlog for this API process."""
+    return forwarder.stats()
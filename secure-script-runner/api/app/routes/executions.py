@@ -1,47 +1,359 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import asc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import asc, func, select
+from dataclasses import dataclass
 from datetime import datetime
-from app.database import get_db
-from app.models import Execution, Module, User, ExecutionLog, ExecutionArtifact
-from app.schemas import ExecutionRequest, ExecutionOut, LogChunkOut, ArtifactOut
+import asyncio, json, time
+from itertools import product
+from math import prod
+from celery import group
+from app.config import settings
+from app.database import get_async_db, AsyncSessionLocal, SessionLocal
+from app.models import Execution, ExecutionBatch, ExecStatus, ExecutionLog, ExecutionArtifact, TERMINAL_STATUSES
+from app.schemas import ExecutionRequest, BatchExecutionRequest, BatchOut, ExecutionOut, LogChunkOut, ArtifactOut
 from app.worker.celery_app import celery
 from app.audit import audit
+from app.rbac import ensure_module_permission, Permission
+from app.services.events import hub
+from app.services import log_archive, memo, metrics, storage
+from app.services.scheduler import scheduler, Job
+from app.services.module_spec import compiled_modules
+from app.services.entity_cache import get_module, get_script, get_user_by_email
 
 router = APIRouter(prefix="/api/modules", tags=["executions"])
 
-@router.post('/{id}/execute', response_model=ExecutionOut)
-def execute_module(id: int, payload: ExecutionRequest, request: Request, db: Session = Depends(get_db)):
-    user = db.query(User).filter_by(email=request.headers.get('X-Demo-User')).first()
+# The routes below run on the event loop with an AsyncSession; sync ORM code
+# (the inserts and their audit rows) runs through run_sync, which drives the
+# same asyncpg connection. Everything that talks to Redis with the sync client
+# (entity caches, permission index, memo entries, Celery/scheduler hand-off) and
+# S3 goes to the threadpool, or it would block the loop for every round-trip.
+
+def _lookups(fn, *args):
+    # a sync session for the cache loaders: it only takes a pooled connection when a cache misses
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+def _resolve(db: Session, id: int, request: Request):
+    user = get_user_by_email(db, request.headers.get('X-Demo-User'))
     if not user:
         raise HTTPException(status_code=403, detail="Unknown user")
-    m = db.query(Module).get(id)
+    m = get_module(db, id)
     if not m:
         raise HTTPException(status_code=404, detail="Module not found")
+    ensure_module_permission(db, user, m.id, Permission.RUN)
+    return user, m
+
+def _job(ex: Execution, m, cm, params: dict) -> Job:
+    return Job(
+        execution_id=ex.id, module_id=m.id, user_id=ex.trigger_user_id,
+        cpu=float(m.cpu_limit or settings.DEFAULT_CPU_LIMIT), mem_mb=int(m.mem_limit_mb or settings.DEFAULT_MEM_LIMIT_MB),
+        params=params, lane=ex.lane, module_cap=m.max_concurrency, secret_names=sorted(cm.secret_names),
+    )
+
+def _replay(db: Session, user_id: int, idempotency_key: str, rhash: str) -> Execution | None:
+    prior = db.query(Execution).filter_by(trigger_user_id=user_id, idempotency_key=idempotency_key).first()
+    if prior is not None and prior.request_hash != rhash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return prior
+
+@dataclass
+class _Lookup:
+    user: object
+    m: object
+    cm: object
+    params: dict
+    rhash: str | None = None
+    key: str | None = None
+    source_id: int | None = None
+
+def _lookup(db: Session, id: int, payload: ExecutionRequest, request: Request, idempotency_key: str | None) -> _Lookup:
+    """The cached part of admission: user, module, permission, validated params and any memo hit."""
+    user, m = _resolve(db, id, request)
+    cm = compiled_modules.get(m)
+    lk = _Lookup(user, m, cm, cm.validate(payload.parameters))
+    if idempotency_key:
+        lk.rhash = memo.request_hash(m.id, lk.params, cm.secret_names, payload.lane)
+    if m.cacheable:
+        script = get_script(db, m.script_id)
+        lk.key = memo.memo_key(m, script.checksum if script else None, lk.params, cm.secret_names)
+        lk.source_id = memo.lookup(m.id, lk.key)
+    return lk
 
-    ex = Execution(module_id=m.id, trigger_user_id=user.id, status='queued')
+def _admit(db: Session, lk: _Lookup, payload: ExecutionRequest, request: Request, idempotency_key: str | None = None) -> tuple[Execution, Job | None, bool, bool]:
+    """Returns the execution, the job to hand off (None when nothing has to run), whether it is
+    a replay and whether the memo entry pointed at an unusable execution."""
+    user, m, params, rhash, key = lk.user, lk.m, lk.params, lk.rhash, lk.key
+    if idempotency_key:
+        prior = _replay(db, user.id, idempotency_key, rhash)
+        if prior is not None:
+            return prior, None, True, False
+
+    source = db.query(Execution).get(lk.source_id) if lk.source_id is not None else None
+    stale = lk.source_id is not None and (source is None or source.status != ExecStatus.succeeded.value)
+    if stale:
+        source = None  # purged or otherwise unusable; evicted by the caller
+
+    ex = Execution(module_id=m.id, trigger_user_id=user.id, status='queued', lane=payload.lane,
+                   idempotency_key=idempotency_key, request_hash=rhash, memo_key=key)
+    if source is not None:
+        # served from the memoized run: linked to its logs and artifacts, no worker involved
+        now = datetime.utcnow()
+        ex.status = ExecStatus.succeeded.value
+        ex.exit_code = 0
+        ex.memo_source_id = source.id
+        ex.redactions_applied = source.redactions_applied
+        ex.dispatched_at = ex.started_at = ex.finished_at = now
+        ex.queue_wait_ms = 0
+        ex.runtime_sec = 0
     db.add(ex)
+    try:
+        db.flush()
+    except IntegrityError:
+        # a concurrent request with the same Idempotency-Key inserted first
+        db.rollback()
+        prior = _replay(db, user.id, idempotency_key, rhash) if idempotency_key else None
+        if prior is None:
+            raise
+        return prior, None, True, stale
+    after = {"module_id": m.id}
+    if source is not None:
+        after["memoized_from"] = source.id
+    audit(db, user.id, 'execution.enqueue', 'execution', str(ex.id), None, after, request)
     db.commit()
+    return ex, (None if source is not None else _job(ex, m, lk.cm, params)), False, stale
 
-    audit(db, user.id, 'execution.enqueue', 'execution', str(ex.id), None, {"module_id": m.id}, request)
+def _hand_off(jobs: list[Job]):
+    if settings.SCHEDULER_ENABLED:
+        scheduler.enqueue_many(jobs)
+        scheduler.dispatch()
+    elif len(jobs) == 1:
+        celery.send_task('app.tasks.run_execution', args=[jobs[0].execution_id, jobs[0].params])
+    else:
+        group(celery.signature('app.tasks.run_execution', args=[j.execution_id, j.params]) for j in jobs).apply_async()
 
-    celery.send_task('app.tasks.run_execution', args=[ex.id, payload.parameters])
+@router.post('/{id}/execute', response_model=ExecutionOut)
+async def execute_module(id: int, payload: ExecutionRequest, request: Request, response: Response, db: AsyncSession = Depends(get_async_db),
+                         idempotency_key: str | None = Header(None, max_length=200)):
+    """With ``Idempotency-Key`` a retried request returns the execution it created the first time."""
+    t0 = time.perf_counter()
+    lk = await run_in_threadpool(_lookups, _lookup, id, payload, request, idempotency_key)
+    ex, job, replayed, stale = await db.run_sync(_admit, lk, payload, request, idempotency_key)
+    if stale:
+        await run_in_threadpool(memo.evict, lk.m.id, lk.key)
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    if job is not None:
+        await run_in_threadpool(_hand_off, [job])
+    outcome = 'replayed' if replayed else ('queued' if job is not None else 'memoized')
+    metrics.ENQUEUE_SECONDS.labels(outcome).observe(time.perf_counter() - t0)
+    return ExecutionOut.model_validate(ex)
 
-    return ex
+def _parameter_sets(payload: BatchExecutionRequest) -> list[dict]:
+    if (payload.parameters is None) == (payload.matrix is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of parameters or matrix")
+    if payload.matrix is not None:
+        total = prod(len(v) for v in payload.matrix.values()) if payload.matrix else 0
+        if total > settings.BATCH_MAX_EXECUTIONS:
+            raise HTTPException(status_code=400, detail=f"Batch of {total} exceeds BATCH_MAX_EXECUTIONS ({settings.BATCH_MAX_EXECUTIONS})")
+        keys = list(payload.matrix)
+        sets = [dict(zip(keys, combo)) for combo in product(*payload.matrix.values())] if total else []
+    else:
+        sets = payload.parameters
+    if not sets:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(sets) > settings.BATCH_MAX_EXECUTIONS:
+        raise HTTPException(status_code=400, detail=f"Batch of {len(sets)} exceeds BATCH_MAX_EXECUTIONS ({settings.BATCH_MAX_EXECUTIONS})")
+    return [{**payload.base, **p} for p in sets]
 
-@router.get('/exec/{exec_id}', response_model=ExecutionOut)
-def get_execution(exec_id: int, db: Session = Depends(get_db)):
-    ex = db.query(Execution).get(exec_id)
-    if not ex:
+def _admit_batch(db: Session, user, m, payload: BatchExecutionRequest, request: Request) -> tuple[ExecutionBatch, list[Execution], list[Job]]:
+    cm = compiled_modules.get(m)
+    validated, errors = [], []
+    for i, p in enumerate(_parameter_sets(payload)):
+        try:
+            validated.append(cm.validate(p))
+        except HTTPException as e:
+            errors.append({"index": i, "errors": e.detail})
+    if errors:
+        raise HTTPException(status_code=400, detail=errors[:100])
+
+    # one transaction for the batch, its executions and their audit rows
+    batch = ExecutionBatch(module_id=m.id, trigger_user_id=user.id, lane=payload.lane, total=len(validated))
+    db.add(batch)
+    db.flush()
+    exs = [Execution(module_id=m.id, trigger_user_id=user.id, status='queued', lane=payload.lane, batch_id=batch.id) for _ in validated]
+    db.add_all(exs)
+    db.flush()
+    for ex in exs:
+        audit(db, user.id, 'execution.enqueue', 'execution', str(ex.id), None, {"module_id": m.id, "batch_id": batch.id}, request)
+    audit(db, user.id, 'execution.batch', 'execution_batch', str(batch.id), None, {"module_id": m.id, "total": batch.total}, request)
+    db.commit()
+    return batch, exs, [_job(ex, m, cm, p) for ex, p in zip(exs, validated)]
+
+def _batch_out(batch: ExecutionBatch, counts: dict[str, int], execution_ids: list[int] | None = None) -> BatchOut:
+    finished = sum(n for st, n in counts.items() if st in TERMINAL_STATUSES)
+    if finished >= batch.total:
+        status = 'completed'
+    elif finished or counts.get('running'):
+        status = 'running'
+    else:
+        status = 'queued'
+    return BatchOut(id=batch.id, module_id=batch.module_id, lane=batch.lane, total=batch.total, finished=finished, status=status, counts=counts, execution_ids=execution_ids)
+
+@router.post('/{id}/execute/batch', response_model=BatchOut)
+async def execute_batch(id: int, payload: BatchExecutionRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Validate every parameter set (a list, or the cartesian product of ``matrix``) and enqueue them as one batch."""
+    user, m = await run_in_threadpool(_lookups, _resolve, id, request)
+    batch, exs, jobs = await db.run_sync(_admit_batch, user, m, payload, request)
+    await run_in_threadpool(_hand_off, jobs)
+    return _batch_out(batch, {'queued': len(exs)}, [ex.id for ex in exs])
+
+@router.get('/batch/{batch_id}', response_model=BatchOut)
+async def get_batch(batch_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Aggregated status of a batch; counts come from ix_executions_batch_status."""
+    batch = await db.get(ExecutionBatch, batch_id)
+    if not batch:
         raise HTTPException(status_code=404, detail="Not found")
-    return ex
+    rows = (await db.execute(select(Execution.status, func.count()).where(Execution.batch_id == batch_id).group_by(Execution.status))).all()
+    return _batch_out(batch, {st: n for st, n in rows})
+
+async def _load_execution(exec_id: int) -> ExecutionOut:
+    # short-lived session: long polls and streams must not hold a connection while they wait
+    async with AsyncSessionLocal() as db:
+        ex = await db.get(Execution, exec_id)
+        if not ex:
+            raise HTTPException(status_code=404, detail="Not found")
+        return ExecutionOut.model_validate(ex)
+
+def _logs_select(exec_id: int, since_seq: int, limit: int):
+    # served by ux_execution_logs_exec_seq as a bounded range scan
+    return select(ExecutionLog).where(ExecutionLog.execution_id == exec_id, ExecutionLog.sequence_no >= since_seq).order_by(asc(ExecutionLog.sequence_no)).limit(limit)
+
+async def _query_logs(db: AsyncSession, exec_id: int, since_seq: int, limit: int) -> list[LogChunkOut]:
+    rows = (await db.execute(_logs_select(exec_id, since_seq, limit))).scalars().all()
+    if rows:
+        return [LogChunkOut(sequence_no=r.sequence_no, stream=r.stream, text=r.chunk_text_redacted) for r in rows]
+    # rows and archive key change in one transaction, so no rows here means either compacted or nothing yet
+    arch = (await db.execute(select(Execution.log_archive_key, Execution.log_archive_index_offset, Execution.memo_source_id).where(Execution.id == exec_id))).first()
+    if arch and arch[0]:
+        return [LogChunkOut(**r) for r in await run_in_threadpool(log_archive.read_range, arch[0], arch[1], since_seq, limit)]
+    if arch and arch[2]:
+        return await _query_logs(db, arch[2], since_seq, limit)
+    return []
+
+async def _load_logs(exec_id: int, since_seq: int, limit: int):
+    async with AsyncSessionLocal() as db:
+        # status first: once it is terminal every chunk is already committed
+        status = (await db.execute(select(Execution.status).where(Execution.id == exec_id))).scalar()
+        return await _query_logs(db, exec_id, since_seq, limit), status
+
+@router.get('/exec/{exec_id}', response_model=ExecutionOut)
+async def get_execution(exec_id: int, waitWhile: str | None = None, timeout: float = 25.0):
+    """Return the execution; with ``waitWhile=<status>`` hold the request until the status changes."""
+    ex = await _load_execution(exec_id)
+    if not waitWhile or ex.status != waitWhile or ex.status in TERMINAL_STATUSES:
+        return ex
+    q = await hub.subscribe(exec_id)
+    try:
+        # re-read after subscribing so a transition in between is not missed
+        ex = await _load_execution(exec_id)
+        deadline = time.monotonic() + min(max(timeout, 0.0), settings.LONG_POLL_MAX_SEC)
+        while ex.status == waitWhile:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                ev = await asyncio.wait_for(q.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if ev.get('type') in ('status', 'resync'):
+                # status events are published after the commit: reload for the full row, as a normal GET returns it
+                ex = await _load_execution(exec_id)
+        return ex
+    finally:
+        await hub.unsubscribe(exec_id, q)
 
 @router.get('/exec/{exec_id}/logs')
-def get_logs(exec_id: int, sinceSeq: int = 0, db: Session = Depends(get_db)):
-    rows = db.query(ExecutionLog).filter(ExecutionLog.execution_id==exec_id, ExecutionLog.sequence_no>=sinceSeq).order_by(asc(ExecutionLog.sequence_no)).all()
-    return [LogChunkOut(sequence_no=r.sequence_no, stream=r.stream, text=r.chunk_text_redacted) for r in rows]
-
-@router.get('/exec/{exec_id}/artifacts')
-def get_artifacts(exec_id: int, db: Session = Depends(get_db)):
-    rows = db.query(ExecutionArtifact).filter_by(execution_id=exec_id).all()
-    return [ArtifactOut(filename=r.filename, size_bytes=r.size_bytes, url=r.storage_url_signed) for r in rows]
+async def get_logs(exec_id: int, response: Response, sinceSeq: int = 0, limit: int = Query(settings.LOG_PAGE_SIZE, ge=1, le=settings.LOG_PAGE_MAX), db: AsyncSession = Depends(get_async_db)):
+    """At most ``limit`` chunks from ``sinceSeq``; ``X-Next-Since-Seq`` is set when more follow."""
+    rows = await _query_logs(db, exec_id, sinceSeq, limit + 1)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers['X-Next-Since-Seq'] = str(rows[-1].sequence_no + 1)
+    return rows
+
+def _sse(event: str, data: dict, id: int | None = None) -> str:
+    head = f"id: {id}\n" if id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get('/exec/{exec_id}/stream')
+async def stream_logs(exec_id: int, request: Request, sinceSeq: int = 0, last_event_id: str | None = Header(None)):
+    """Server-Sent Events: DB backfill from ``sinceSeq`` (or ``Last-Event-ID``), then live chunks and status."""
+    next_seq = sinceSeq
+    if last_event_id and last_event_id.isdigit():
+        next_seq = max(next_seq, int(last_event_id) + 1)
+    await _load_execution(exec_id)
+
+    async def events():
+        nonlocal next_seq
+        q = await hub.subscribe(exec_id)
+        try:
+            resync = True
+            while True:
+                if resync:
+                    while True:
+                        rows, status = await _load_logs(exec_id, next_seq, settings.LOG_PAGE_SIZE)
+                        for r in rows:
+                            yield _sse('log', r.model_dump(), r.sequence_no)
+                            next_seq = r.sequence_no + 1
+                        if len(rows) < settings.LOG_PAGE_SIZE:
+                            break
+                    if status in TERMINAL_STATUSES:
+                        yield _sse('status', {"status": status})
+                        return
+                    resync = False
+                if await request.is_disconnected():
+                    return
+                try:
+                    ev = await asyncio.wait_for(q.get(), settings.EVENTS_KEEPALIVE_SEC)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if ev['type'] == 'log':
+                    if ev['sequence_no'] < next_seq:
+                        continue
+                    if ev['sequence_no'] > next_seq:
+                        resync = True
+                        continue
+                    yield _sse('log', {k: ev[k] for k in ('sequence_no', 'stream', 'text')}, ev['sequence_no'])
+                    next_seq += 1
+                elif ev['type'] == 'status':
+                    if ev['status'] in TERMINAL_STATUSES:
+                        # make sure every chunk committed before the final status is delivered
+                        resync = True
+                        continue
+                    yield _sse('status', {"status": ev['status']})
+                else:
+                    resync = True
+        finally:
+            await hub.unsubscribe(exec_id, q)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@router.get('/exec/{exec_id}/artifacts', response_model=list[ArtifactOut])
+async def get_artifacts(exec_id: int, db: AsyncSession = Depends(get_async_db)):
+    source_id = (await db.execute(select(Execution.memo_source_id).where(Execution.id == exec_id))).scalar()
+    rows = (await db.execute(
+        select(ExecutionArtifact.execution_id, ExecutionArtifact.filename, ExecutionArtifact.size_bytes, ExecutionArtifact.storage_key)
+        .where(ExecutionArtifact.execution_id == (source_id or exec_id)).order_by(ExecutionArtifact.id)
+    )).all()
+    keys = [r.storage_key or storage.artifact_key(r.execution_id, r.filename) for r in rows]
+    # signing is CPU work (~0.4 ms a key with boto3): keep cold listings off the event loop
+    urls = await run_in_threadpool(storage.artifact_urls, keys) if keys else []
+    return [ArtifactOut(filename=r.filename, size_bytes=r.size_bytes, url=u) for r, u in zip(rows, urls)]
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models import Group, GroupMember, User
+from app.schemas import GroupIn, GroupOut, GroupMemberIn
+from app.audit import audit
+from app.rbac import permission_index
+
+router = APIRouter(prefix="/api/groups", tags=["groups"])
+
+def _admin(db: Session) -> User:
+    # For demo: assume admin
+    admin = db.query(User).filter(User.role.in_(['admin','super_admin'])).first()
+    if not admin:
+        raise HTTPException(status_code=403, detail="Admin required")
+    return admin
+
+@router.post('', response_model=GroupOut)
+def create_group(payload: GroupIn, request: Request, db: Session = Depends(get_db)):
+    admin = _admin(db)
+    g = Group(name=payload.name, description=payload.description)
+    db.add(g)
+    db.flush()
+    audit(db, admin.id, 'group.create', 'group', str(g.id), None, {"name": g.name}, request)
+    db.commit()
+    return g
+
+@router.get('', response_model=list[GroupOut])
+def list_groups(db: Session = Depends(get_db)):
+    return db.query(Group).all()
+
+@router.post('/{id}/members')
+def add_member(id: int, payload: GroupMemberIn, request: Request, db: Session = Depends(get_db)):
+    admin = _admin(db)
+    if not db.query(Group).get(id):
+        raise HTTPException(status_code=404, detail="Group not found")
+    if not db.query(User).get(payload.user_id):
+        raise HTTPException(status_code=400, detail="User not found")
+    added = not db.query(GroupMember).filter_by(group_id=id, user_id=payload.user_id).first()
+    if added:
+        db.add(GroupMember(group_id=id, user_id=payload.user_id))
+    audit(db, admin.id, 'group.member_add', 'group', str(id), None, {"user_id": payload.user_id}, request)
+    db.commit()
+    if added:
+        permission_index.invalidate()
+    return {"ok": True}
+
+@router.delete('/{id}/members/{user_id}')
+def remove_member(id: int, user_id: int, request: Request, db: Session = Depends(get_db)):
+    admin = _admin(db)
+    deleted = db.query(GroupMember).filter_by(group_id=id, user_id=user_id).delete()
+    audit(db, admin.id, 'group.member_remove', 'group', str(id), {"user_id": user_id}, None, request)
+    db.commit()
+    if deleted:
+        permission_index.invalidate()
+    return {"ok": True}
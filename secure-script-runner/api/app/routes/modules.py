@@ -1,13 +1,25 @@
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_async_db
 from app.models import User, Script, Module
-from app.schemas import ModuleCreateIn, ModuleOut
+from app.schemas import ModuleCreateIn, ModuleUpdateIn, ModuleOut
 from app.config import settings
 from app.audit import audit
+from app.rbac import permission_index
+from app.services.module_spec import CompiledModule, compiled_modules
+from app.services.entity_cache import get_user_by_email
+from app.services import memo
 
 router = APIRouter(prefix="/api/modules", tags=["modules"])
 
+def _check_backend(name: str):
+    enabled = {b.strip() for b in settings.SANDBOX_BACKENDS.split(',')}
+    if name not in enabled:
+        raise HTTPException(status_code=400, detail=f"Sandbox backend '{name}' is not enabled (SANDBOX_BACKENDS)")
+
 @router.post('', response_model=ModuleOut)
 def create_module(payload: ModuleCreateIn, request: Request, db: Session = Depends(get_db)):
     # For demo: assume admin
@@ -21,6 +33,8 @@ def create_module(payload: ModuleCreateIn, request: Request, db: Session = Depen
 
     params_schema = {p.name: p.model_dump() for p in payload.parameters}
     cmd_tmpl = payload.command
+    CompiledModule(0, 1, params_schema, cmd_tmpl)  # reject bad templates/regexes now, not at first run
+    _check_backend(payload.sandbox_backend)
 
     m = Module(
         name=payload.name,
@@ -33,14 +47,75 @@ def create_module(payload: ModuleCreateIn, request: Request, db: Session = Depen
         cpu_limit=payload.cpu_limit or settings.DEFAULT_CPU_LIMIT,
         mem_limit_mb=payload.mem_limit_mb or settings.DEFAULT_MEM_LIMIT_MB,
         approvals_required=payload.approvals_required or 0,
+        max_concurrency=payload.max_concurrency,
+        cacheable=payload.cacheable,
+        cache_ttl_sec=payload.cache_ttl_sec,
+        sandbox_backend=payload.sandbox_backend,
+        retention_days=payload.retention_days,
         created_by=user.id,
     )
     db.add(m)
-    db.commit()
+    db.flush()
     audit(db, user.id, 'module.create', 'module', str(m.id), None, {"name": m.name, "version": m.version}, request)
+    db.commit()
     return m
 
+@router.put('/{id}', response_model=ModuleOut)
+def update_module(id: int, payload: ModuleUpdateIn, request: Request, db: Session = Depends(get_db)):
+    user = db.query(User).filter(User.role.in_(['admin','super_admin'])).first()
+    if not user:
+        raise HTTPException(status_code=403, detail="Admin required")
+    m = db.query(Module).get(id)
+    if not m:
+        raise HTTPException(status_code=404, detail="Module not found")
+
+    changes = payload.model_dump(exclude_unset=True)
+    if 'parameters' in changes:
+        changes['parameters_schema_json'] = {p.name: p.model_dump() for p in payload.parameters or []}
+        del changes['parameters']
+    if 'command' in changes:
+        changes['command_template_json'] = changes.pop('command')
+    CompiledModule(m.id, m.version, changes.get('parameters_schema_json', m.parameters_schema_json), changes.get('command_template_json', m.command_template_json))
+    if changes.get('sandbox_backend'):
+        _check_backend(changes['sandbox_backend'])
+
+    for k, v in changes.items():
+        setattr(m, k, v)
+    # a new version makes every process recompile its validator/command builder
+    m.version = (m.version or 1) + 1
+    m.updated_at = datetime.utcnow()
+    audit(db, user.id, 'module.update', 'module', str(m.id), None, {"version": m.version, "fields": sorted(changes)}, request)
+    db.commit()
+    compiled_modules.invalidate(m.id)
+    try:
+        memo.evict(m.id)  # keyed by version, so these could no longer be hit anyway
+    except Exception:
+        pass
+    return m
+
+@router.get('/memo/stats')
+def memo_stats():
+    return memo.stats()
+
+@router.delete('/{id}/memo')
+def evict_memo(id: int, request: Request, db: Session = Depends(get_db)):
+    user = db.query(User).filter(User.role.in_(['admin','super_admin'])).first()
+    if not user:
+        raise HTTPException(status_code=403, detail="Admin required")
+    evicted = memo.evict(id)
+    audit(db, user.id, 'module.memo_evict', 'module', str(id), None, {"evicted": evicted}, request)
+    db.commit()
+    return {"evicted": evicted}
+
 @router.get('', response_model=list[ModuleOut])
-def list_modules(assignedTo: str | None = None, db: Session = Depends(get_db)):
-    rows = db.query(Module).filter_by(enabled=True).all()
-    return rows
+async def list_modules(assignedTo: str | None = None, permission: str | None = None, db: AsyncSession = Depends(get_async_db)):
+    q = select(Module).where(Module.enabled == True)  # noqa: E712
+    if assignedTo:
+        user = await db.run_sync(get_user_by_email, assignedTo)
+        if not user:
+            return []
+        module_ids = await db.run_sync(permission_index.modules, user.id, permission)
+        if not module_ids:
+            return []
+        q = q.where(Module.id.in_(module_ids))
+    return (await db.execute(q)).scalars().all()
@@ -3,10 +3,11 @@ from sqlalchemy.orm import Session
 from pathlib import Path
 from app.config import settings
 from app.database import get_db
-from app.schemas import ScriptRegisterIn, ScriptOut
-from app.models import Script, User
+from app.schemas import ScriptRegisterIn, ScriptRescanIn, ScriptOut
+from app.models import Script
 from app.security import get_principal, Principal
-from app.services.checksum import sha256_file
+from app.services.checksum import cache as checksum_cache, scan_tree
+from app.services.entity_cache import get_user_by_email
 from app.audit import audit
 
 router = APIRouter(prefix="/api/scripts", tags=["scripts"])
@@ -14,7 +15,7 @@ router = APIRouter(prefix="/api/scripts", tags=["scripts"])
 @router.post('/register', response_model=ScriptOut)
 def register_script(payload: ScriptRegisterIn, request: Request, db: Session = Depends(get_db), p: Principal = Depends(get_principal)):
     # Resolve user
-    user = db.query(User).filter_by(email=p.email).first()
+    user = get_user_by_email(db, p.email)
     if not user:
         raise HTTPException(status_code=403, detail="Unknown user")
     if user.role not in ['admin', 'super_admin']:
@@ -32,13 +33,16 @@ def register_script(payload: ScriptRegisterIn, request: Request, db: Session = D
     if not pth.exists() or not pth.is_file():
         raise HTTPException(status_code=400, detail="File not found")
 
-    checksum = sha256_file(str(pth))
+    res = checksum_cache.checksum(str(pth))
+    if res is None:
+        raise HTTPException(status_code=400, detail="File not readable")
+    checksum, _ = res
 
     scr = Script(name=pth.name, path=str(pth), interpreter=payload.interpreter, checksum=checksum, registered_by=user.id)
     db.add(scr)
-    db.commit()
-
+    db.flush()
     audit(db, user.id, 'script.register', 'script', str(scr.id), None, {"path": scr.path, "checksum": scr.checksum}, request)
+    db.commit()
 
     return scr
 
@@ -46,3 +50,69 @@ def register_script(payload: ScriptRegisterIn, request: Request, db: Session = D
 def list_scripts(db: Session = Depends(get_db), p: Principal = Depends(get_principal)):
     rows = db.query(Script).all()
     return rows
+
+@router.post('/rescan')
+def rescan_scripts(payload: ScriptRescanIn, request: Request, db: Session = Depends(get_db), p: Principal = Depends(get_principal)):
+    """Hash every file under SCRIPT_BASE (or a subtree) and report drift against registered checksums.
+
+    With ``register_new`` files that are not registered yet are added in the same pass.
+    """
+    user = get_user_by_email(db, p.email)
+    if not user:
+        raise HTTPException(status_code=403, detail="Unknown user")
+    if user.role not in ['admin', 'super_admin']:
+        raise HTTPException(status_code=403, detail="Admin required")
+
+    base = Path(settings.SCRIPT_BASE).resolve()
+    root = Path(payload.path).resolve() if payload.path else base
+    if root != base and not str(root).startswith(str(base) + "/"):
+        raise HTTPException(status_code=400, detail="Path must be under allowlisted base")
+    if not root.is_dir():
+        raise HTTPException(status_code=400, detail="Directory not found")
+
+    scan = scan_tree(str(root))
+    prefix = str(root) + "/"
+    known = db.query(Script.id, Script.path, Script.checksum).filter(Script.path.startswith(prefix, autoescape=True)).all()
+    known_paths = set()
+    drifted, missing, unchanged = [], [], 0
+    for sid, path, recorded in known:
+        known_paths.add(path)
+        hit = scan.files.get(path)
+        if hit is None:
+            missing.append({"id": sid, "path": path})
+        elif hit[0] != recorded:
+            drifted.append({"id": sid, "path": path, "recorded": recorded, "actual": hit[0]})
+        else:
+            unchanged += 1
+
+    new_paths = sorted(pth for pth in scan.files if pth not in known_paths)
+    registered, skipped = [], []
+    if payload.register_new:
+        for pth in new_paths:
+            interp = payload.interpreters.get(Path(pth).suffix)
+            if not interp:
+                skipped.append(pth)
+                continue
+            registered.append(Script(name=Path(pth).name, path=pth, interpreter=interp, checksum=scan.files[pth][0], registered_by=user.id))
+        db.add_all(registered)
+        db.flush()
+    audit(db, user.id, 'script.rescan', 'script', str(root), None, {
+        "registered": [s.id for s in registered],
+        "drifted": [d["id"] for d in drifted],
+        "missing": [m["id"] for m in missing],
+    }, request)
+    db.commit()
+
+    return {
+        "root": str(root),
+        "files": len(scan.files),
+        "hashed": sum(1 for _, cached in scan.files.values() if not cached),
+        "cache_hits": sum(1 for _, cached in scan.files.values() if cached),
+        "seconds": round(scan.seconds, 3),
+        "unchanged": unchanged,
+        "drifted": drifted,
+        "missing": missing,
+        "unregistered": [] if payload.register_new else new_paths,
+        "registered": [{"id": s.id, "path": s.path, "interpreter": s.interpreter} for s in registered],
+        "skipped": skipped,
+    }
@@ -1,10 +1,16 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 
 class ScriptRegisterIn(BaseModel):
     path: str
     interpreter: str
 
+class ScriptRescanIn(BaseModel):
+    path: Optional[str] = None  # subtree of SCRIPT_BASE; whole base when omitted
+    register_new: bool = False
+    # file suffix -> interpreter for newly registered scripts; files with other suffixes are skipped
+    interpreters: Dict[str, str] = {'.py': 'python3', '.sh': 'bash', '.ps1': 'pwsh', '.js': 'node'}
+
 class ScriptOut(BaseModel):
     id: int
     name: str
@@ -33,6 +39,26 @@ class ModuleCreateIn(BaseModel):
     cpu_limit: float
     mem_limit_mb: int
     approvals_required: int = 0
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    cacheable: bool = False
+    cache_ttl_sec: Optional[int] = Field(None, ge=1)
+    sandbox_backend: Literal['docker', 'process'] = 'docker'
+    retention_days: Optional[int] = Field(None, ge=0)
+
+class ModuleUpdateIn(BaseModel):
+    description: Optional[str] = None
+    parameters: Optional[List[ModuleParam]] = None
+    command: Optional[Dict[str, Any]] = None
+    timeout_sec: Optional[int] = None
+    cpu_limit: Optional[float] = None
+    mem_limit_mb: Optional[int] = None
+    approvals_required: Optional[int] = None
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    cacheable: Optional[bool] = None
+    cache_ttl_sec: Optional[int] = Field(None, ge=1)
+    sandbox_backend: Optional[Literal['docker', 'process']] = None
+    retention_days: Optional[int] = Field(None, ge=0)
+    enabled: Optional[bool] = None
 
 class ModuleOut(BaseModel):
     id: int
@@ -48,12 +74,48 @@ class AssignmentIn(BaseModel):
     subject_id: int
     permissions: List[str]  # run|view|manage
 
+class GroupIn(BaseModel):
+    name: str
+    description: Optional[str] = None
+
+class GroupOut(BaseModel):
+    id: int
+    name: str
+    description: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+class GroupMemberIn(BaseModel):
+    user_id: int
+
 class ExecutionRequest(BaseModel):
     parameters: Dict[str, Any]
+    lane: Literal['interactive', 'batch'] = 'interactive'
+
+class BatchExecutionRequest(BaseModel):
+    # either explicit parameter sets, or a matrix whose cartesian product is run; ``base`` applies to every set
+    parameters: Optional[List[Dict[str, Any]]] = None
+    matrix: Optional[Dict[str, List[Any]]] = None
+    base: Dict[str, Any] = {}
+    lane: Literal['interactive', 'batch'] = 'batch'
+
+class BatchOut(BaseModel):
+    id: int
+    module_id: int
+    lane: str
+    total: int
+    finished: int
+    status: str  # queued | running | completed
+    counts: Dict[str, int]
+    execution_ids: Optional[List[int]] = None
 
 class ExecutionOut(BaseModel):
     id: int
     status: str
+    lane: Optional[str] = None
+    queue_wait_ms: Optional[int] = None
+    memo_source_id: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -2,7 +2,7 @@ from fastapi import Header, HTTPException, Request
 from typing import Optional
 from app.config import settings
 from jose import jwt
-import httpx
+from app.services.jwks import jwks_cache, token_cache
 
 class Principal:
     def __init__(self, user_email: str, role: str = "user", user_id: Optional[int] = None):
@@ -23,28 +23,27 @@ async def get_principal(request: Request, x_demo_user: Optional[str] = Header(No
         token = auth.split(' ', 1)[1]
         if not settings.OIDC_JWKS_URL or not settings.OIDC_AUDIENCE or not settings.OIDC_ISSUER:
             raise HTTPException(status_code=500, detail="OIDC not configured")
-        # Stateless verification using JWKS
-        async with httpx.AsyncClient() as client:
-            jwks = (await client.get(settings.OIDC_JWKS_URL)).json()
-        try:
-            claims = jwt.get_unverified_claims(token)
-            kid = jwt.get_unverified_header(token).get('kid')
-            key = None
-            for k in jwks.get('keys', []):
-                if k.get('kid') == kid:
-                    key = k
-                    break
+        # Stateless verification using cached JWKS; verified tokens are memoized until exp
+        claims = token_cache.get(token)
+        if claims is None:
+            try:
+                kid = jwt.get_unverified_header(token).get('kid')
+                key = await jwks_cache.get_key(kid)
+            except Exception as e:
+                raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
             if not key:
                 raise HTTPException(status_code=401, detail="JWKS key not found")
-            jwt.decode(
-                token,
-                key,
-                audience=settings.OIDC_AUDIENCE,
-                issuer=settings.OIDC_ISSUER,
-                options={"verify_at_hash": False},
-            )
-        except Exception as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+            try:
+                claims = jwt.decode(
+                    token,
+                    key,
+                    audience=settings.OIDC_AUDIENCE,
+                    issuer=settings.OIDC_ISSUER,
+                    options={"verify_at_hash": False},
+                )
+            except Exception as e:
+                raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+            token_cache.put(token, claims)
         email = claims.get('preferred_username') or claims.get('upn') or claims.get('email')
         if not email:
             raise HTTPException(status_code=401, detail="Token missing email claim")
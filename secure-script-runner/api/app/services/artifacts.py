@@ -0,0 +1,294 @@
+import hashlib
+import io
+import mimetypes
+import os
+import stat
+import tarfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from app.config import settings
+from app.services import metrics, storage
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=settings.ARTIFACT_UPLOAD_CONCURRENCY, thread_name_prefix='artifact-upload')
+            _executor_pid = os.getpid()
+    return _executor
+
+
+@dataclass
+class ArtifactResult:
+    filename: str
+    key: str
+    size_bytes: int
+    content_type: str
+    sha256: str
+
+
+class _IterStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks (e.g. ``get_archive``)."""
+
+    def __init__(self, chunks):
+        self._it = iter(chunks)
+        self._buf = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buf:
+            try:
+                self._buf = memoryview(next(self._it))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+def _read_part(f, size: int) -> bytes:
+    parts, remaining = [], size
+    while remaining:
+        data = f.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b''.join(parts)
+
+
+def _content_type(filename: str, head: bytes) -> str:
+    guessed = mimetypes.guess_type(filename)[0]
+    if guessed:
+        return guessed
+    if b'\x00' in head[:8192]:
+        return 'application/octet-stream'
+    try:
+        head[:8192].decode('utf-8')
+    except UnicodeDecodeError as e:
+        # a multi-byte sequence cut at the sniff window is still text
+        if e.start < len(head[:8192]) - 3:
+            return 'application/octet-stream'
+    return 'text/plain'
+
+
+class PendingUpload:
+    def __init__(self, result: ArtifactResult, futures: list[Future], finalize=None, abort=None):
+        self.result = result
+        self._futures = futures
+        self._finalize = finalize
+        self._abort = abort
+
+    def wait(self) -> ArtifactResult:
+        try:
+            outputs = [f.result() for f in self._futures]
+            if self._finalize:
+                self._finalize(outputs)
+        except Exception:
+            if self._abort:
+                self._abort()
+            raise
+        return self.result
+
+
+class ArtifactUploader:
+    """Streams file objects to S3/MinIO with bounded memory.
+
+    Data is read in ``part_size`` pieces, hashed and typed on the fly; files
+    larger than one part become multipart uploads. Parts of all artifacts go
+    through one shared thread pool and client, and at most ``max_inflight``
+    parts are buffered at any time, so memory stays at roughly
+    ``part_size * max_inflight`` regardless of artifact size.
+    """
+
+    def __init__(self, s3=None, part_size: int | None = None, max_inflight: int | None = None):
+        self.s3 = s3 or storage.client()
+        self.part_size = part_size or settings.S3_PART_SIZE_MB * 1024 * 1024
+        self._slots = threading.BoundedSemaphore(max_inflight or settings.ARTIFACT_UPLOAD_CONCURRENCY * 2)
+
+    def _submit(self, fn, *args, **kwargs) -> Future:
+        self._slots.acquire()
+        try:
+            fut = _pool().submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def upload(self, key: str, f, filename: str) -> PendingUpload:
+        bucket = settings.S3_BUCKET
+        h = hashlib.sha256()
+        data = _read_part(f, self.part_size)
+        h.update(data)
+        size = len(data)
+        ctype = _content_type(filename, data)
+        result = ArtifactResult(filename=filename, key=key, size_bytes=size, content_type=ctype, sha256='')
+        nxt = _read_part(f, self.part_size) if len(data) == self.part_size else b''
+        if not nxt:
+            result.sha256 = h.hexdigest()
+            fut = self._submit(self.s3.put_object, Bucket=bucket, Key=key, Body=data, ContentType=ctype)
+            return PendingUpload(result, [fut])
+
+        upload_id = self.s3.create_multipart_upload(Bucket=bucket, Key=key, ContentType=ctype)['UploadId']
+        futures: list[Future] = []
+
+        def abort():
+            self.s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+
+        try:
+            part_no = 1
+            while data:
+                futures.append(self._submit(self._upload_part, bucket, key, upload_id, part_no, data))
+                part_no += 1
+                data, nxt = nxt, (_read_part(f, self.part_size) if nxt else b'')
+                if data:
+                    h.update(data)
+                    size += len(data)
+        except Exception:
+            for fut in futures:
+                fut.cancel()
+            abort()
+            raise
+        result.size_bytes = size
+        result.sha256 = h.hexdigest()
+
+        def finalize(parts):
+            self.s3.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+
+        return PendingUpload(result, futures, finalize, abort)
+
+    def open_writer(self, key: str, filename: str, content_type: str) -> "ArtifactWriter":
+        return ArtifactWriter(self, key, filename, content_type)
+
+    def _upload_part(self, bucket: str, key: str, upload_id: str, part_no: int, data: bytes) -> dict:
+        resp = self.s3.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_no, Body=data)
+        return {'PartNumber': part_no, 'ETag': resp['ETag']}
+
+
+class ArtifactWriter:
+    """Push-style counterpart of ``ArtifactUploader.upload`` for data produced incrementally.
+
+    Bytes are buffered up to one part and handed to the shared upload pool;
+    the multipart upload is only started once a first part is full.
+    """
+
+    def __init__(self, uploader: ArtifactUploader, key: str, filename: str, content_type: str):
+        self.uploader = uploader
+        self.result = ArtifactResult(filename=filename, key=key, size_bytes=0, content_type=content_type, sha256='')
+        self._h = hashlib.sha256()
+        self._buf = bytearray()
+        self._upload_id: str | None = None
+        self._futures: list[Future] = []
+
+    def write(self, data: bytes):
+        if not data:
+            return
+        self._h.update(data)
+        self.result.size_bytes += len(data)
+        self._buf += data
+        while len(self._buf) >= self.uploader.part_size:
+            part = bytes(self._buf[:self.uploader.part_size])
+            del self._buf[:self.uploader.part_size]
+            self._send(part)
+
+    def _send(self, data: bytes):
+        up = self.uploader
+        if self._upload_id is None:
+            self._upload_id = up.s3.create_multipart_upload(Bucket=settings.S3_BUCKET, Key=self.result.key, ContentType=self.result.content_type)['UploadId']
+        self._futures.append(up._submit(up._upload_part, settings.S3_BUCKET, self.result.key, self._upload_id, len(self._futures) + 1, data))
+
+    def close(self) -> ArtifactResult:
+        up = self.uploader
+        self.result.sha256 = self._h.hexdigest()
+        if self._upload_id is None:
+            up.s3.put_object(Bucket=settings.S3_BUCKET, Key=self.result.key, Body=bytes(self._buf), ContentType=self.result.content_type)
+            return self.result
+        try:
+            if self._buf:
+                self._send(bytes(self._buf))
+                self._buf.clear()
+            parts = [f.result() for f in self._futures]
+            up.s3.complete_multipart_upload(Bucket=settings.S3_BUCKET, Key=self.result.key, UploadId=self._upload_id, MultipartUpload={'Parts': parts})
+        except Exception:
+            self.abort()
+            raise
+        return self.result
+
+    def abort(self):
+        for f in self._futures:
+            f.cancel()
+        if self._upload_id is not None:
+            try:
+                self.uploader.s3.abort_multipart_upload(Bucket=settings.S3_BUCKET, Key=self.result.key, UploadId=self._upload_id)
+            except Exception:
+                pass
+
+
+def collect_artifacts(container, path: str, execution_id: int, uploader: ArtifactUploader | None = None) -> list[ArtifactResult]:
+    """Stream ``path`` out of ``container`` and upload every regular file under ``exec/<id>/``.
+
+    The tar archive is consumed incrementally; failed uploads are skipped.
+    """
+    uploader = uploader or ArtifactUploader()
+    bits, _ = container.get_archive(path, chunk_size=1024 * 1024)
+    pending: list[PendingUpload] = []
+    stream = io.BufferedReader(_IterStream(bits), buffer_size=1024 * 1024)
+    with tarfile.open(fileobj=stream, mode='r|') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            f = tar.extractfile(member)
+            if not f:
+                continue
+            name = os.path.basename(member.name)
+            try:
+                pending.append(uploader.upload(storage.artifact_key(execution_id, name), f, name))
+            except Exception:
+                metrics.ARTIFACT_UPLOADS.labels('failed').inc()
+                continue
+    return _wait_all(pending)
+
+
+def collect_directory(path: str, execution_id: int, uploader: ArtifactUploader | None = None) -> list[ArtifactResult]:
+    """Local-directory counterpart of ``collect_artifacts``; symlinks and special files are skipped."""
+    uploader = uploader or ArtifactUploader()
+    pending: list[PendingUpload] = []
+    for root, _, files in os.walk(path):
+        for name in files:
+            full = os.path.join(root, name)
+            try:
+                # O_NOFOLLOW: the script may swap a file for a link to something outside its workdir
+                fd = os.open(full, os.O_RDONLY | os.O_NOFOLLOW)
+            except OSError:
+                continue
+            with os.fdopen(fd, 'rb') as f:
+                if not stat.S_ISREG(os.fstat(fd).st_mode):
+                    continue
+                try:
+                    pending.append(uploader.upload(storage.artifact_key(execution_id, name), f, name))
+                except Exception:
+                    metrics.ARTIFACT_UPLOADS.labels('failed').inc()
+    return _wait_all(pending)
+
+
+def _wait_all(pending: list[PendingUpload]) -> list[ArtifactResult]:
+    results = []
+    for p in pending:
+        try:
+            results.append(p.wait())
+        except Exception:
+            metrics.ARTIFACT_UPLOADS.labels('failed').inc()
+            continue
+        metrics.ARTIFACT_UPLOADS.labels('ok').inc()
+        metrics.ARTIFACT_BYTES.inc(p.result.size_bytes)
+    return results
@@ -1,9 +1,148 @@
 import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from app.config import settings
+from app.services.redis_client import client as redis_client
 
-def sha256_file(path: str) -> str:
-    h = hashlib.sha256()
-    with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            h.update(chunk)
-    return h.hexdigest()
+CACHE_KEY = 'checksum:sha256'
+_BUF = 1024 * 1024
+_BATCH = 64
+
+
+def sha256_file(path: str, size: int | None = None) -> str:
+    with open(path, 'rb', buffering=0) as f:
+        if size is not None and size <= _BUF:
+            # typical script: one read, one update
+            return hashlib.sha256(f.read()).hexdigest()
+        h = hashlib.sha256()
+        buf = bytearray(_BUF)
+        view = memoryview(buf)
+        while n := f.readinto(buf):
+            h.update(view[:n])
+        return h.hexdigest()
+
+
+def _fingerprint(st: os.stat_result) -> str:
+    return f"{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class ChecksumCache:
+    """SHA-256 per path, reused while ``(inode, size, mtime_ns)`` is unchanged.
+
+    Kept in process and mirrored to a Redis hash so other API processes and
+    restarts skip rehashing too (best effort: without Redis it is local only).
+    """
+
+    def __init__(self):
+        self._local: dict[str, tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, paths: list[str]):
+        missing = [p for p in paths if p not in self._local]
+        if not missing:
+            return
+        try:
+            values = redis_client().hmget(CACHE_KEY, missing)
+        except Exception:
+            return
+        with self._lock:
+            for p, v in zip(missing, values):
+                if v:
+                    fp, digest = v.decode().rsplit(':', 1)
+                    self._local[p] = (fp, digest)
+
+    def _store(self, entries: dict[str, tuple[str, str]]):
+        if not entries:
+            return
+        with self._lock:
+            self._local.update(entries)
+        try:
+            redis_client().hset(CACHE_KEY, mapping={p: f"{fp}:{d}" for p, (fp, d) in entries.items()})
+        except Exception:
+            pass
+
+    def checksum(self, path: str, st: os.stat_result | None = None) -> tuple[str, bool] | None:
+        """Return ``(sha256, cached)`` for one file, or None if it is gone or unreadable."""
+        try:
+            st = st or os.stat(path)
+        except OSError:
+            return None
+        return self.checksums({path: st}, workers=1).get(path)
+
+    def checksums(self, stats: dict[str, os.stat_result], workers: int | None = None) -> dict[str, tuple[str, bool]]:
+        paths = list(stats)
+        self._load(paths)
+        out: dict[str, tuple[str, bool]] = {}
+        todo = []
+        for p in paths:
+            fp = _fingerprint(stats[p])
+            hit = self._local.get(p)
+            if hit and hit[0] == fp:
+                out[p] = (hit[1], True)
+            else:
+                todo.append((p, fp))
+        self.hits += len(out)
+        self.misses += len(todo)
+        fresh: dict[str, tuple[str, str]] = {}
+        if todo:
+            # file reads and hashlib updates release the GIL, so threads overlap I/O and hashing;
+            # batches keep per-task overhead negligible for small scripts
+            batches = [todo[i:i + _BATCH] for i in range(0, len(todo), _BATCH)]
+
+            def hash_batch(batch):
+                return [_safe_hash(p, stats[p].st_size) for p, _ in batch]
+            with ThreadPoolExecutor(max_workers=workers or settings.CHECKSUM_WORKERS) as ex:
+                for batch, digests in zip(batches, ex.map(hash_batch, batches)):
+                    for (p, fp), digest in zip(batch, digests):
+                        if digest is not None:
+                            fresh[p] = (fp, digest)
+                            out[p] = (digest, False)
+        self._store(fresh)
+        return out
+
+
+def _safe_hash(path: str, size: int) -> str | None:
+    try:
+        return sha256_file(path, size)
+    except OSError:
+        return None
+
+
+cache = ChecksumCache()
+
+
+@dataclass
+class ScanResult:
+    files: dict[str, tuple[str, bool]]  # path -> (sha256, from cache)
+    seconds: float
+
+
+def walk_files(base: str) -> dict[str, os.stat_result]:
+    """Regular files under ``base`` (symlinks are not followed)."""
+    found: dict[str, os.stat_result] = {}
+    stack = [base]
+    while stack:
+        d = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+                    elif e.is_file(follow_symlinks=False):
+                        found[e.path] = e.stat(follow_symlinks=False)
+        except OSError:
+            continue
+    return found
+
+
+def scan_tree(base: str | None = None, workers: int | None = None) -> ScanResult:
+    t0 = time.perf_counter()
+    root = str(Path(base or settings.SCRIPT_BASE).resolve())
+    files = cache.checksums(walk_files(root), workers)
+    return ScanResult(files=files, seconds=time.perf_counter() - t0)
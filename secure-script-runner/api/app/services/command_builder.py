@@ -1,20 +1,36 @@
+from functools import lru_cache
 from typing import Dict, Any, List
 from fastapi import HTTPException
 from app.config import settings
-import shlex
 
-ALLOWED_INTERPRETERS = set(i.strip() for i in settings.ALLOW_INTERPRETERS.split(','))
 
+@lru_cache(maxsize=8)
+def _parse_interpreters(raw: str) -> frozenset[str]:
+    return frozenset(i.strip() for i in raw.split(',') if i.strip())
 
-def build_argv(command_template: Dict[str, Any], params: Dict[str, Any]) -> List[str]:
-    """Create argv array from template and param map. No shell join."""
+
+def allowed_interpreters() -> frozenset[str]:
+    # read through settings so a changed ALLOW_INTERPRETERS is honoured without a re-import
+    return _parse_interpreters(settings.ALLOW_INTERPRETERS)
+
+
+def check_template(command_template: Dict[str, Any]) -> tuple[str, str]:
     interp = command_template.get('interpreter')
     script = command_template.get('script_path')
-    if interp not in ALLOWED_INTERPRETERS:
+    if interp not in allowed_interpreters():
         raise HTTPException(status_code=400, detail=f"Interpreter not allowlisted: {interp}")
     if not script or not script.startswith(settings.SCRIPT_BASE + "/"):
         raise HTTPException(status_code=400, detail="Script path must be under allowlisted base")
+    return interp, script
+
+
+def build_argv(command_template: Dict[str, Any], params: Dict[str, Any]) -> List[str]:
+    """Create argv array from template and param map. No shell join.
 
+    Interprets the template on every call; executions go through
+    ``module_spec.compiled_modules`` instead.
+    """
+    interp, script = check_template(command_template)
     argv: List[str] = [interp, script]
     # positional args
     pos: list[str] = command_template.get('positional_args', [])
@@ -0,0 +1,203 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, fields
+from typing import Any, Callable
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.config import settings
+from app.models import Module, Script, User
+from app.services.redis_client import client as redis_client
+
+_DIRTY_KEY = 'entity_cache_dirty'
+
+
+@dataclass(frozen=True)
+class ModuleSnapshot:
+    id: int
+    name: str
+    version: int
+    script_id: int
+    parameters_schema_json: dict
+    command_template_json: dict
+    timeout_sec: int
+    cpu_limit: float
+    mem_limit_mb: int
+    approvals_required: int
+    max_concurrency: int | None
+    enabled: bool
+    # defaults keep snapshots cached before these columns existed loadable
+    cacheable: bool = False
+    cache_ttl_sec: int | None = None
+    sandbox_backend: str = 'docker'
+
+
+@dataclass(frozen=True)
+class ScriptSnapshot:
+    id: int
+    name: str
+    path: str
+    interpreter: str
+    checksum: str
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    id: int
+    name: str
+    email: str
+    role: str
+    status: str
+
+
+def _snapshot(cls, row):
+    return cls(**{f.name: getattr(row, f.name) for f in fields(cls)})
+
+
+class ReadThroughCache:
+    """Detached snapshots of rarely-changing rows: in-process LRU, then Redis, then the loader.
+
+    Both tiers are tagged with a per-kind generation counter in Redis (checked
+    at most every ``ENTITY_CACHE_VERSION_CHECK_SEC``); ``invalidate()`` bumps
+    it, so every process drops its entries and the old Redis keys are never
+    read again (they expire after ``ENTITY_CACHE_TTL_SEC``). Without Redis
+    nothing is cached across requests.
+    """
+
+    def __init__(self, kind: str, cls, max_size: int | None = None, ttl: float | None = None, check_interval: float | None = None):
+        self.kind = kind
+        self.cls = cls
+        self.max_size = settings.ENTITY_CACHE_SIZE if max_size is None else max_size
+        self.ttl = settings.ENTITY_CACHE_TTL_SEC if ttl is None else ttl
+        self.check_interval = settings.ENTITY_CACHE_VERSION_CHECK_SEC if check_interval is None else check_interval
+        self._entries: OrderedDict[Any, tuple[int, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._gen = 0
+        self._checked_at = 0.0
+        self.local_hits = self.redis_hits = self.misses = 0
+
+    @property
+    def _gen_key(self) -> str:
+        return f"cache:gen:{self.kind}"
+
+    def _redis_key(self, gen: int, key) -> str:
+        return f"cache:{self.kind}:{gen}:{key}"
+
+    def generation(self) -> int:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            try:
+                self._gen = int(redis_client().get(self._gen_key) or 0)
+            except Exception:
+                self._gen = -1
+            self._checked_at = now
+        return self._gen
+
+    def get(self, key, load: Callable[[], Any]):
+        gen = self.generation()
+        if gen >= 0:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == gen:
+                    self._entries.move_to_end(key)
+                    self.local_hits += 1
+                    return entry[1]
+            try:
+                raw = redis_client().get(self._redis_key(gen, key))
+            except Exception:
+                raw = None
+            if raw is not None:
+                self.redis_hits += 1
+                value = self.cls(**json.loads(raw))
+                self._put(gen, key, value)
+                return value
+        self.misses += 1
+        row = load()
+        if row is None:
+            return None  # not cached: a row created later must be found at once
+        value = _snapshot(self.cls, row)
+        if gen >= 0:
+            try:
+                redis_client().set(self._redis_key(gen, key), json.dumps(asdict(value)), ex=int(self.ttl))
+            except Exception:
+                pass
+            self._put(gen, key, value)
+        return value
+
+    def _put(self, gen: int, key, value):
+        with self._lock:
+            self._entries[key] = (gen, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        try:
+            self._gen = int(redis_client().incr(self._gen_key))
+            self._checked_at = time.monotonic()
+        except Exception:
+            self._gen = -1
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.local_hits + self.redis_hits) / lookups, 4) if lookups else None,
+        }
+
+
+module_cache = ReadThroughCache('module', ModuleSnapshot)
+user_cache = ReadThroughCache('user', UserSnapshot)
+script_cache = ReadThroughCache('script', ScriptSnapshot)
+_CACHES = {Module: module_cache, User: user_cache, Script: script_cache}
+
+
+def get_module(db: Session, module_id: int) -> ModuleSnapshot | None:
+    return module_cache.get(module_id, lambda: db.query(Module).get(module_id))
+
+
+def get_script(db: Session, script_id: int) -> ScriptSnapshot | None:
+    return script_cache.get(script_id, lambda: db.query(Script).get(script_id))
+
+
+def get_user_by_email(db: Session, email: str | None) -> UserSnapshot | None:
+    if not email:
+        return None
+    return user_cache.get(email, lambda: db.query(User).filter_by(email=email).first())
+
+
+def stats() -> dict:
+    return {c.kind: c.stats() for c in _CACHES.values()}
+
+
+# Any ORM write to a cached table invalidates its kind once the transaction
+# commits, whichever route, task or script made it. Bulk query.update() calls
+# bypass these hooks and must call ``invalidate()`` themselves.
+
+def _mark_dirty(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(type(target))
+
+
+for _model in _CACHES:
+    for _evt in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _evt, _mark_dirty)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session: Session):
+    for model in session.info.pop(_DIRTY_KEY, ()):
+        _CACHES[model].invalidate()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rolled_back(session: Session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import redis.asyncio as aioredis
+from app.config import settings
+from app.services.redis_client import client as _client
+
+# Live execution events. Workers publish redacted log chunks and status
+# transitions; each API process keeps one pub/sub connection and fans the
+# messages out to its local subscribers (SSE streams, long-polls).
+
+
+def channel(execution_id: int) -> str:
+    return f"exec:{execution_id}:events"
+
+
+def _publish(execution_id: int, events: list[dict]):
+    if not events:
+        return
+    try:
+        pipe = _client().pipeline(transaction=False)
+        for ev in events:
+            pipe.publish(channel(execution_id), json.dumps(ev))
+        pipe.execute()
+    except Exception:
+        # Live streaming is best effort; clients backfill from the DB.
+        pass
+
+
+def publish_logs(execution_id: int, rows: list[dict]):
+    _publish(execution_id, [
+        {"type": "log", "sequence_no": r["sequence_no"], "stream": r["stream"], "text": r["chunk_text_redacted"]}
+        for r in rows
+    ])
+
+
+def publish_status(execution_id: int, status: str):
+    _publish(execution_id, [{"type": "status", "status": status}])
+
+
+class EventHub:
+    """Per-process fan-out of execution events over a single Redis connection."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._redis = None
+        self._pubsub = None
+        self._reader: asyncio.Task | None = None
+        self._subs: dict[str, set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, execution_id: int) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_MAX)
+        ch = channel(execution_id)
+        async with self._lock:
+            if self._pubsub is None:
+                self._redis = aioredis.from_url(self.url)
+                self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            if ch not in self._subs:
+                self._subs[ch] = set()
+                await self._pubsub.subscribe(ch)
+            self._subs[ch].add(q)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+        return q
+
+    async def unsubscribe(self, execution_id: int, q: asyncio.Queue):
+        ch = channel(execution_id)
+        async with self._lock:
+            subs = self._subs.get(ch)
+            if subs is None:
+                return
+            subs.discard(q)
+            if not subs:
+                del self._subs[ch]
+                try:
+                    await self._pubsub.unsubscribe(ch)
+                except Exception:
+                    pass
+
+    async def _read(self):
+        while self._subs:
+            try:
+                msg = await self._pubsub.get_message(timeout=1.0)
+            except Exception:
+                await asyncio.sleep(1.0)
+                continue
+            if not msg or msg.get('type') != 'message':
+                continue
+            ch = msg['channel'].decode() if isinstance(msg['channel'], bytes) else msg['channel']
+            ev = json.loads(msg['data'])
+            for q in list(self._subs.get(ch, ())):
+                try:
+                    q.put_nowait(ev)
+                except asyncio.QueueFull:
+                    # slow consumer: tell it to resync from the DB
+                    while not q.empty():
+                        q.get_nowait()
+                    q.put_nowait({"type": "resync"})
+
+
+hub = EventHub(settings.REDIS_URL)
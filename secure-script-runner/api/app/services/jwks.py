@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+import httpx
+from app.config import settings
+
+_http: httpx.AsyncClient | None = None
+
+
+def http_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for IdP calls."""
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient(timeout=settings.OIDC_HTTP_TIMEOUT_SEC, limits=httpx.Limits(max_keepalive_connections=4))
+    return _http
+
+
+class JWKSCache:
+    """JWKS document cache keyed by ``kid``.
+
+    Keys are fetched once and reused for ``ttl`` seconds. Inside the last
+    ``refresh_ahead`` seconds a refresh runs in the background while requests
+    keep using the current keys. An unknown ``kid`` triggers an immediate
+    refetch (at most once per ``min_refetch`` seconds) to pick up key
+    rotation. If the IdP is unreachable, previously fetched keys keep serving.
+    """
+
+    def __init__(self, url: str | None, ttl: float | None = None, refresh_ahead: float | None = None, min_refetch: float | None = None):
+        self.url = url
+        self.ttl = settings.OIDC_JWKS_TTL_SEC if ttl is None else ttl
+        self.refresh_ahead = settings.OIDC_JWKS_REFRESH_AHEAD_SEC if refresh_ahead is None else refresh_ahead
+        self.min_refetch = settings.OIDC_JWKS_MIN_REFETCH_SEC if min_refetch is None else min_refetch
+        self._keys: dict[str, dict] = {}
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+        self._lock = asyncio.Lock()
+        self._bg: asyncio.Task | None = None
+        self.fetches = 0
+
+    async def get_key(self, kid: str | None) -> dict | None:
+        age = time.monotonic() - self._fetched_at
+        if not self._keys or age >= self.ttl:
+            await self._refresh(force=not self._keys)
+        elif age >= self.ttl - self.refresh_ahead and (self._bg is None or self._bg.done()):
+            self._bg = asyncio.create_task(self._refresh())
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._attempted_at >= self.min_refetch:
+            await self._refresh(force=True)
+            key = self._keys.get(kid)
+        return key
+
+    async def _refresh(self, force: bool = False):
+        started = time.monotonic()
+        async with self._lock:
+            # another request refreshed while we waited for the lock
+            if self._attempted_at >= started or (not force and time.monotonic() - self._fetched_at < self.ttl - self.refresh_ahead):
+                return
+            self._attempted_at = time.monotonic()
+            try:
+                resp = await http_client().get(self.url)
+                resp.raise_for_status()
+                keys = {k.get('kid'): k for k in resp.json().get('keys', [])}
+            except Exception:
+                if not self._keys:
+                    raise
+                return
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            self.fetches += 1
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified token claims keyed by SHA-256 of the token.
+
+    Entries are dropped once the token's ``exp`` passes, so a cached hit
+    never outlives the token itself.
+    """
+
+    def __init__(self, max_size: int | None = None):
+        self.max_size = settings.OIDC_TOKEN_CACHE_SIZE if max_size is None else max_size
+        self._items: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> dict | None:
+        k = self._key(token)
+        item = self._items.get(k)
+        if item is None or item[1] <= time.time():
+            if item is not None:
+                del self._items[k]
+            self.misses += 1
+            return None
+        self._items.move_to_end(k)
+        self.hits += 1
+        return item[0]
+
+    def put(self, token: str, claims: dict):
+        exp = claims.get('exp')
+        if not isinstance(exp, (int, float)) or exp <= time.time() or self.max_size <= 0:
+            return
+        k = self._key(token)
+        self._items[k] = (claims, float(exp))
+        self._items.move_to_end(k)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+jwks_cache = JWKSCache(settings.OIDC_JWKS_URL)
+token_cache = VerifiedTokenCache()
@@ -0,0 +1,113 @@
+import bisect
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta
+from functools import lru_cache
+from sqlalchemy import delete, exists
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Execution, ExecutionLog, TERMINAL_STATUSES
+from app.services import storage
+from app.services.artifacts import ArtifactUploader
+
+# Blob layout: a run of independent gzip members, each holding one block of
+# NDJSON log chunks ({"s": seq, "t": stream, "x": text}), followed by one more
+# gzip member with the index {"blocks": [[first_seq, offset], ...], "end": offset}.
+# The file as a whole is still a valid .gz (zcat prints the chunks, then the
+# index line); readers fetch the index by range and then only the blocks they need.
+
+
+def archive_key(execution_id: int) -> str:
+    return f"logs/{execution_id}.ndjson.gz"
+
+
+def write_blob(rows, f, block_bytes: int) -> tuple[int, int]:
+    """Write ``(seq, stream, text)`` rows to ``f``; return (chunk count, index offset)."""
+    blocks, buf, size, first, count = [], [], 0, None, 0
+
+    def flush_block():
+        nonlocal buf, size, first
+        if buf:
+            blocks.append([first, f.tell()])
+            f.write(gzip.compress(''.join(buf).encode(), compresslevel=6))
+            buf, size, first = [], 0, None
+
+    for seq, stream, text in rows:
+        line = json.dumps({"s": seq, "t": stream, "x": text}) + '\n'
+        if first is None:
+            first = seq
+        buf.append(line)
+        size += len(line)
+        count += 1
+        if size >= block_bytes:
+            flush_block()
+    flush_block()
+    index_offset = f.tell()
+    f.write(gzip.compress(json.dumps({"blocks": blocks, "end": index_offset}).encode()))
+    return count, index_offset
+
+
+def _get_range(key: str, start: int, end: int | None = None) -> bytes:
+    rng = f"bytes={start}-{'' if end is None else end - 1}"
+    return storage.client().get_object(Bucket=settings.S3_BUCKET, Key=key, Range=rng)['Body'].read()
+
+
+@lru_cache(maxsize=1024)
+def _index(key: str, index_offset: int) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    idx = json.loads(gzip.decompress(_get_range(key, index_offset)))
+    firsts = tuple(b[0] for b in idx["blocks"])
+    offsets = tuple(b[1] for b in idx["blocks"]) + (idx["end"],)
+    return firsts, offsets
+
+
+def read_range(key: str, index_offset: int, since_seq: int, limit: int) -> list[dict]:
+    """Up to ``limit`` chunks with ``sequence_no >= since_seq``, fetching only the covering blocks."""
+    firsts, offsets = _index(key, index_offset)
+    i = max(bisect.bisect_right(firsts, since_seq) - 1, 0)
+    out: list[dict] = []
+    while i < len(firsts) and len(out) < limit:
+        # sequence numbers increase, so blocks starting past since_seq + limit are not needed yet
+        j = max(bisect.bisect_right(firsts, since_seq + limit), i + 1)
+        data = _get_range(key, offsets[i], offsets[j])
+        for line in gzip.decompress(data).decode().splitlines():
+            r = json.loads(line)
+            if r["s"] >= since_seq and len(out) < limit:
+                out.append({"sequence_no": r["s"], "stream": r["t"], "text": r["x"]})
+        i = j
+    return out
+
+
+def compact_execution(db: Session, execution_id: int, s3=None) -> dict | None:
+    """Move a finished execution's log rows into one archive blob, then delete the rows."""
+    ex = db.query(Execution).get(execution_id)
+    if ex is None or ex.status not in TERMINAL_STATUSES or ex.log_archive_key:
+        return None
+    q = (db.query(ExecutionLog.sequence_no, ExecutionLog.stream, ExecutionLog.chunk_text_redacted)
+         .filter(ExecutionLog.execution_id == execution_id)
+         .order_by(ExecutionLog.sequence_no)
+         .yield_per(1000))
+    key = archive_key(execution_id)
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as f:
+        count, index_offset = write_blob(q, f, settings.LOG_ARCHIVE_BLOCK_KB * 1024)
+        if not count:
+            return None
+        f.seek(0)
+        result = ArtifactUploader(s3).upload(key, f, key.rsplit('/', 1)[-1]).wait()
+    ex.log_archive_key = key
+    ex.log_archive_index_offset = index_offset
+    db.execute(delete(ExecutionLog).where(ExecutionLog.execution_id == execution_id))
+    db.commit()
+    return {"execution_id": execution_id, "chunks": count, "bytes": result.size_bytes}
+
+
+def pending_executions(db: Session, limit: int) -> list[int]:
+    """Finished executions, past ``LOG_ARCHIVE_DELAY_SEC``, that still keep log rows."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.LOG_ARCHIVE_DELAY_SEC)
+    has_rows = exists().where(ExecutionLog.execution_id == Execution.id)
+    return [r[0] for r in db.query(Execution.id).filter(
+        Execution.status.in_(TERMINAL_STATUSES),
+        Execution.log_archive_key.is_(None),
+        Execution.finished_at < cutoff,
+        has_rows,
+    ).order_by(Execution.id).limit(limit)]
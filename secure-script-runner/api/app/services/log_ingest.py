@@ -0,0 +1,277 @@
+import codecs
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import ExecutionLog, ExecutionArtifact
+from app.services.artifacts import ArtifactUploader, ArtifactWriter
+from app.services.redaction import RedactionEngine, RedactionStream
+from app.services.events import publish_logs
+from app.services import metrics
+from app.services.retention import artifact_expiry
+from app.services.storage import artifact_key
+
+
+class LogIngestor:
+    """Buffers container output and writes it to ``execution_logs`` in bulk.
+
+    Each stream is decoded incrementally and passed through its own redaction
+    stream, which only releases text that cannot hide a partial secret.
+    Lines are coalesced into chunks of at most ``max_chunk_chars``; a chunk is
+    also closed once it is older than ``flush_interval`` so live logs keep moving.
+    Closed chunks get the next ``sequence_no`` and are inserted with a single
+    executemany + commit when ``batch_size`` are pending or the interval elapses,
+    then published to live subscribers.
+
+    At most ``max_output_bytes`` of (redacted) output go to the database. Past
+    that a ``system`` marker is logged and the rest is gzip-streamed into an
+    ``output-overflow.log.gz`` artifact (up to ``OUTPUT_OVERFLOW_MAX_MB``),
+    while only the last ``LOG_TAIL_KB`` are kept in memory and logged on close.
+    """
+
+    OVERFLOW_NAME = 'output-overflow.log.gz'
+
+    def __init__(self, db: Session, execution_id: int, redactor: RedactionEngine | None = None, start_seq: int = 0,
+                 max_chunk_chars: int | None = None, batch_size: int | None = None, flush_interval: float | None = None,
+                 max_output_bytes: int | None = None, uploader: ArtifactUploader | None = None):
+        self.db = db
+        self.execution_id = execution_id
+        self.redactor = redactor or RedactionEngine()
+        self.seq = start_seq
+        self.max_chunk_chars = max_chunk_chars or settings.LOG_CHUNK_MAX_CHARS
+        self.batch_size = batch_size or settings.LOG_FLUSH_BATCH
+        self.flush_interval = flush_interval if flush_interval is not None else settings.LOG_FLUSH_INTERVAL_SEC
+        self._decoders: dict[str, codecs.IncrementalDecoder] = {}
+        self._redactors: dict[str, RedactionStream] = {}
+        self._open: dict[str, list] = {}  # stream -> [opened_at, timestamp, parts, size]
+        self._pending: list[dict] = []
+        self._last_flush = time.monotonic()
+        self.lines = 0
+        self.chunks = 0
+        self.max_output_bytes = settings.MAX_OUTPUT_MB * 1024 * 1024 if max_output_bytes is None else max_output_bytes
+        self.tail_chars = settings.LOG_TAIL_KB * 1024
+        self.overflow_max = settings.OUTPUT_OVERFLOW_MAX_MB * 1024 * 1024
+        self.db_bytes = 0
+        self.truncated = False
+        self.overflow_bytes = 0
+        self.dropped_bytes = 0
+        self._tail: deque[list] = deque()  # [stream, text]
+        self._tail_size = 0
+        self._uploader = uploader
+        self._overflow: ArtifactWriter | None = None
+        self._gz = None
+
+    def feed(self, stream: str, data: bytes):
+        if not data:
+            return
+        dec = self._decoders.get(stream)
+        if dec is None:
+            dec = self._decoders[stream] = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+            self._redactors[stream] = self.redactor.stream()
+        text = self._redactors[stream].feed(dec.decode(data))
+        if text:
+            self.lines += text.count('\n')
+            self._emit(stream, text)
+        self.tick()
+
+    def tick(self):
+        """Close and flush everything buffered once the flush interval has elapsed."""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            for stream in list(self._open):
+                self._close(stream)
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.db.execute(insert(ExecutionLog), self._pending)
+            metrics.commit(self.db, 'log_flush')
+            publish_logs(self.execution_id, self._pending)
+            self._count(self._pending)
+            self._pending = []
+        self._last_flush = time.monotonic()
+
+    @staticmethod
+    def _count(rows: list[dict]):
+        per_stream: dict[str, list[int]] = {}
+        for row in rows:
+            text = row['chunk_text_redacted']
+            n = per_stream.setdefault(row['stream'], [0, 0])
+            n[0] += text.count('\n')
+            n[1] += len(text)
+        for stream, (lines, size) in per_stream.items():
+            metrics.LOG_LINES.labels(stream).inc(lines)
+            metrics.LOG_CHARS.labels(stream).inc(size)
+
+    def close(self):
+        """Drain partial lines and decoder state, then flush all remaining chunks."""
+        for stream, dec in self._decoders.items():
+            red = self._redactors[stream]
+            rest = red.feed(dec.decode(b'', final=True)) + red.flush()
+            if rest:
+                self.lines += rest.count('\n') + (not rest.endswith('\n'))
+                self._emit(stream, rest)
+        if self.truncated:
+            self._finish_overflow()
+        for stream in list(self._open):
+            self._close(stream)
+        self.flush()
+        if self._overflow is not None:
+            self._store_overflow()
+
+    # -- output budget -----------------------------------------------------
+
+    def _emit(self, stream: str, text: str):
+        if not self.truncated:
+            if not self.max_output_bytes:
+                self._append(stream, text)
+                return
+            data = text.encode()
+            room = self.max_output_bytes - self.db_bytes
+            if len(data) <= room:
+                self.db_bytes += len(data)
+                self._append(stream, text)
+                return
+            # cut on a character boundary inside the remaining budget
+            head = data[:room].decode('utf-8', errors='ignore')
+            if head:
+                self.db_bytes += len(head.encode())
+                self._append(stream, head)
+            text = text[len(head):]
+            self._truncate()
+        self._spill(stream, text)
+
+    def _system(self, text: str):
+        for stream in list(self._open):
+            self._close(stream)
+        self._append('system', text)
+        self._close('system')
+
+    def _truncate(self):
+        self.truncated = True
+        try:
+            self._overflow = (self._uploader or ArtifactUploader()).open_writer(
+                artifact_key(self.execution_id, self.OVERFLOW_NAME), self.OVERFLOW_NAME, 'application/gzip')
+            self._gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip container
+            where = f"continues in artifact {self.OVERFLOW_NAME}"
+        except Exception:
+            self._overflow = None
+            where = "is discarded"
+        self._system(f"[output truncated: exceeded MAX_OUTPUT_MB ({self.max_output_bytes} bytes); further output {where}]\n")
+
+    def _spill(self, stream: str, text: str):
+        data = text.encode()
+        if self._overflow is not None and (not self.overflow_max or self.overflow_bytes + len(data) <= self.overflow_max):
+            try:
+                self._overflow.write(self._gz.compress(data))
+                self.overflow_bytes += len(data)
+            except Exception:
+                self._overflow.abort()
+                self._overflow = None
+                self.dropped_bytes += len(data)
+        else:
+            self.dropped_bytes += len(data)
+        self._tail.append([stream, text])
+        self._tail_size += len(text)
+        while self._tail_size > self.tail_chars:
+            first = self._tail[0]
+            excess = self._tail_size - self.tail_chars
+            if len(first[1]) <= excess:
+                self._tail.popleft()
+                self._tail_size -= len(first[1])
+            else:
+                first[1] = first[1][excess:]
+                self._tail_size -= excess
+
+    def _finish_overflow(self):
+        omitted = self.overflow_bytes + self.dropped_bytes - sum(len(t.encode()) for _, t in self._tail)
+        note = f"; {self.dropped_bytes} bytes beyond OUTPUT_OVERFLOW_MAX_MB were discarded" if self.dropped_bytes else ""
+        self._system(f"[... {max(omitted, 0)} bytes omitted{note}; last {self._tail_size} characters follow ...]\n")
+        for stream, text in self._tail:
+            self._append(stream, text)
+        self._tail.clear()
+        self._tail_size = 0
+
+    def _store_overflow(self):
+        writer, self._overflow = self._overflow, None
+        try:
+            writer.write(self._gz.flush())
+            art = writer.close()
+        except Exception:
+            writer.abort()
+            return
+        metrics.ARTIFACT_UPLOADS.labels('ok').inc()
+        metrics.ARTIFACT_BYTES.inc(art.size_bytes)
+        self.db.add(ExecutionArtifact(execution_id=self.execution_id, filename=art.filename, size_bytes=art.size_bytes, content_type=art.content_type, checksum_sha256=art.sha256, storage_key=art.key, retention_until=artifact_expiry()))
+        self.db.commit()
+
+    def _append(self, stream: str, text: str):
+        while text:
+            chunk = self._open.get(stream)
+            if chunk is None:
+                chunk = self._open[stream] = [time.monotonic(), datetime.utcnow(), [], 0]
+            room = self.max_chunk_chars - chunk[3]
+            if len(text) <= room:
+                chunk[2].append(text)
+                chunk[3] += len(text)
+                text = ''
+            else:
+                # prefer to split on a line boundary inside the remaining room
+                nl = text.rfind('\n', 0, room)
+                take = nl + 1 if nl >= 0 else (room if chunk[3] == 0 else 0)
+                if take:
+                    chunk[2].append(text[:take])
+                    chunk[3] += take
+                    text = text[take:]
+                self._close(stream)
+        chunk = self._open.get(stream)
+        if chunk is not None and chunk[3] >= self.max_chunk_chars:
+            self._close(stream)
+
+    def _close(self, stream: str):
+        chunk = self._open.pop(stream, None)
+        if not chunk or not chunk[3]:
+            return
+        self._pending.append({
+            "execution_id": self.execution_id,
+            "timestamp": chunk[1],
+            "stream": stream,
+            "chunk_text_redacted": ''.join(chunk[2]),
+            "sequence_no": self.seq,
+        })
+        self.seq += 1
+        self.chunks += 1
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+
+def pump_frames(frames, ingestor: LogIngestor, deadline: float, kill) -> bool:
+    """Feed demultiplexed ``(stdout, stderr)`` frames into ``ingestor``.
+
+    A watchdog timer calls ``kill`` at ``deadline`` even when the script prints
+    nothing (killing the container ends the frame stream). Returns False when
+    the deadline passed.
+    """
+    expired = threading.Event()
+
+    def fire():
+        expired.set()
+        kill()
+
+    watchdog = threading.Timer(max(0.0, deadline - time.time()), fire)
+    watchdog.daemon = True
+    watchdog.start()
+    try:
+        for out, err in frames:
+            if expired.is_set():
+                break
+            if out:
+                ingestor.feed('stdout', out)
+            if err:
+                ingestor.feed('stderr', err)
+    finally:
+        watchdog.cancel()
+    return not expired.is_set()
@@ -0,0 +1,76 @@
+import re
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from app.config import settings
+
+TABLE = 'execution_logs'
+_NAME = re.compile(rf'^{TABLE}_p(\d{{8}})$')
+
+
+def partition_name(day: date) -> str:
+    return f"{TABLE}_p{day:%Y%m%d}"
+
+
+def create_partition_sql(day: date) -> str:
+    return (f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')")
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != 'postgresql':
+        return False
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :t"
+    ), {"t": TABLE}).scalar())
+
+
+def partitions(conn: Connection) -> dict[date, str]:
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :t"
+    ), {"t": TABLE}).scalars()
+    out = {}
+    for name in rows:
+        m = _NAME.match(name)
+        if m:
+            out[datetime.strptime(m.group(1), '%Y%m%d').date()] = name
+    return out
+
+
+def ensure_partitions(conn: Connection, start: date, end: date) -> list[str]:
+    """Create daily partitions covering ``[start, end]``."""
+    existing = partitions(conn)
+    created = []
+    day = start
+    while day <= end:
+        if day not in existing:
+            conn.execute(text(create_partition_sql(day)))
+            created.append(partition_name(day))
+        day += timedelta(days=1)
+    return created
+
+
+def drop_partitions_before(conn: Connection, cutoff: date) -> list[str]:
+    """Detach and drop whole days older than ``cutoff`` (no row-by-row deletes)."""
+    dropped = []
+    for day, name in sorted(partitions(conn).items()):
+        if day >= cutoff:
+            break
+        conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+
+def maintain(engine: Engine) -> dict:
+    """Pre-create upcoming partitions and apply ``LOG_RETENTION_DAYS``. No-op unless partitioned."""
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return {"partitioned": False}
+        today = datetime.utcnow().date()
+        created = ensure_partitions(conn, today, today + timedelta(days=settings.LOG_PARTITIONS_AHEAD_DAYS))
+        dropped = []
+        if settings.LOG_RETENTION_DAYS > 0:
+            dropped = drop_partitions_before(conn, today - timedelta(days=settings.LOG_RETENTION_DAYS))
+        return {"partitioned": True, "created": created, "dropped": dropped}
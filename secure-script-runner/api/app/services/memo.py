@@ -0,0 +1,86 @@
+import hashlib
+import json
+from app.config import settings
+from app.services.redis_client import client as redis_client
+
+# Results of cacheable modules: memo:{module_id}:{key} -> id of the succeeded
+# execution whose logs and artifacts a matching request is linked to.
+STATS_KEY = 'memo:stats'
+
+
+def request_hash(module_id: int, params: dict, secret_names=frozenset(), *parts) -> str:
+    """sha256 over the module, the normalized parameters (secret values left out) and ``parts``."""
+    public = {k: v for k, v in params.items() if k not in secret_names}
+    raw = json.dumps([module_id, public, *parts], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def memo_key(m, script_checksum: str | None, params: dict, secret_names=frozenset()) -> str:
+    return request_hash(m.id, params, secret_names, m.version, script_checksum)
+
+
+def _key(module_id: int, key: str) -> str:
+    return f"memo:{module_id}:{key}"
+
+
+def _count(field: str, n: int = 1):
+    try:
+        redis_client().hincrby(STATS_KEY, field, n)
+    except Exception:
+        pass
+
+
+def lookup(module_id: int, key: str) -> int | None:
+    try:
+        raw = redis_client().get(_key(module_id, key))
+    except Exception:
+        return None
+    _count('hits' if raw else 'misses')
+    return int(raw) if raw else None
+
+
+def store(module_id: int, key: str, execution_id: int, ttl_sec: int | None = None):
+    ttl = ttl_sec or settings.RESULT_CACHE_TTL_SEC
+    try:
+        redis_client().set(_key(module_id, key), execution_id, ex=int(ttl))
+    except Exception:
+        return
+    _count('stores')
+
+
+def forget(module_id: int, key: str, execution_id: int):
+    """Drop the entry if it still points at ``execution_id`` (which is being deleted)."""
+    try:
+        r = redis_client()
+        if r.get(_key(module_id, key)) == str(execution_id).encode():
+            r.delete(_key(module_id, key))
+    except Exception:
+        pass
+
+
+def evict(module_id: int, key: str | None = None) -> int:
+    """Drop one entry, or every entry of the module; returns how many went."""
+    r = redis_client()
+    if key is not None:
+        n = r.delete(_key(module_id, key))
+    else:
+        n = 0
+        batch = []
+        for k in r.scan_iter(match=f"memo:{module_id}:*", count=500):
+            batch.append(k)
+            if len(batch) >= 500:
+                n += r.delete(*batch)
+                batch = []
+        if batch:
+            n += r.delete(*batch)
+    if n:
+        _count('evictions', n)
+    return n
+
+
+def stats() -> dict:
+    raw = {k.decode() if isinstance(k, bytes) else k: int(v) for k, v in redis_client().hgetall(STATS_KEY).items()}
+    out = {f: raw.get(f, 0) for f in ('hits', 'misses', 'stores', 'evictions')}
+    lookups = out['hits'] + out['misses']
+    out['hit_ratio'] = round(out['hits'] / lookups, 4) if lookups else None
+    return out
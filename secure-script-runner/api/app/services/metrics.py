@@ -0,0 +1,147 @@
+"""Prometheus metrics for the API and the workers.
+
+Workers are prefork children, so when ``PROMETHEUS_MULTIPROC_DIR`` is set every
+process writes its samples there and ``app.worker.metrics_exporter`` serves
+the sum; the API reads the same directory when it runs several uvicorn workers.
+"""
+import os
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# sub-millisecond to a few seconds: request handling, commits, per-stage overheads
+_FAST = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+# queueing and script runtimes
+_SLOW = (.05, .1, .5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+REQUEST_SECONDS = Histogram('ssr_http_request_duration_seconds', 'API time to response headers, by route template',
+                            ['method', 'route', 'status'], buckets=_FAST)
+ENQUEUE_SECONDS = Histogram('ssr_execution_enqueue_seconds', 'execute_module admission: validate, insert, hand off',
+                            ['outcome'], buckets=_FAST)
+QUEUE_WAIT_SECONDS = Histogram('ssr_execution_queue_wait_seconds', 'queued_at until a worker picks the execution up',
+                               ['lane'], buckets=_SLOW)
+STAGE_SECONDS = Histogram('ssr_execution_stage_seconds', 'Worker-side execution stages', ['stage'], buckets=_FAST + (30, 60, 300, 1800))
+RUNTIME_SECONDS = Histogram('ssr_execution_runtime_seconds', 'started_at to finished_at', ['status'], buckets=_SLOW)
+EXECUTIONS_FINISHED = Counter('ssr_executions_finished_total', 'Executions by final status', ['status'])
+EXECUTIONS_RUNNING = Gauge('ssr_executions_running', 'Executions supervised right now', multiprocess_mode='livesum')
+DB_COMMIT_SECONDS = Histogram('ssr_db_commit_seconds', 'Commit latency on the execution path', ['step'], buckets=_FAST)
+LOG_LINES = Counter('ssr_log_lines_total', 'Log lines written to execution_logs', ['stream'])
+LOG_CHARS = Counter('ssr_log_chars_total', 'Redacted log characters written to execution_logs', ['stream'])
+ARTIFACT_BYTES = Counter('ssr_artifact_upload_bytes_total', 'Artifact bytes uploaded to object storage')
+ARTIFACT_UPLOADS = Counter('ssr_artifact_uploads_total', 'Artifact uploads', ['outcome'])
+RETENTION_DELETED = Counter('ssr_retention_deleted_total', 'Rows and objects removed by the retention sweeper', ['kind'])
+RETENTION_BYTES = Counter('ssr_retention_reclaimed_bytes_total', 'Artifact bytes and log text reclaimed by the retention sweeper')
+POOL_ACQUIRE = Counter('ssr_container_pool_acquire_total', 'Sandbox containers handed out', ['result'])
+
+
+def stage(name: str):
+    """``with stage('run'):`` times a worker stage."""
+    return STAGE_SECONDS.labels(name).time()
+
+
+def commit(db, step: str):
+    with DB_COMMIT_SECONDS.labels(step).time():
+        db.commit()
+
+
+class RequestMetrics:
+    """ASGI middleware: latency until the response starts, labelled by route template (not path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] == '/metrics':
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        done = False
+
+        def observe(status):
+            nonlocal done
+            done = True
+            route = scope.get('route')
+            REQUEST_SECONDS.labels(scope['method'], getattr(route, 'path', 'unmatched'), str(status)).observe(time.perf_counter() - t0)
+
+        async def _send(message):
+            if message['type'] == 'http.response.start' and not done:
+                observe(message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            if not done:
+                observe(500)
+
+
+class StatsCollector:
+    """Exposes the in-process cache and forwarder counters (and the shared scheduler/memo state) at scrape time."""
+
+    def collect(self):
+        from app.services import entity_cache, memo
+        from app.services.checksum import cache as checksum_cache
+        from app.services.jwks import token_cache
+        from app.services.module_spec import compiled_modules
+        from app.services.scheduler import scheduler
+        from app.services.siem import forwarder
+        from app.services.storage import url_cache
+
+        hits = CounterMetricFamily('ssr_cache_hits', 'In-process cache hits', labels=['cache'])
+        misses = CounterMetricFamily('ssr_cache_misses', 'In-process cache misses', labels=['cache'])
+        for name, c in (('compiled_module', compiled_modules), ('oidc_token', token_cache), ('script_checksum', checksum_cache), ('artifact_url', url_cache)):
+            hits.add_metric([name], c.hits)
+            misses.add_metric([name], c.misses)
+        for kind, s in entity_cache.stats().items():
+            hits.add_metric([f'entity_{kind}_local'], s['local_hits'])
+            hits.add_metric([f'entity_{kind}_redis'], s['redis_hits'])
+            misses.add_metric([f'entity_{kind}'], s['misses'])
+        yield hits
+        yield misses
+
+        siem = forwarder.stats()
+        fam = CounterMetricFamily('ssr_siem_events', 'Audit events through the SIEM forwarder', labels=['state'])
+        for state in ('enqueued', 'sent', 'spooled', 'replayed', 'dropped'):
+            fam.add_metric([state], siem[state])
+        yield fam
+        yield GaugeMetricFamily('ssr_siem_queue_depth', 'Audit events waiting to be sent', value=siem['queued'])
+        yield GaugeMetricFamily('ssr_siem_spool_bytes', 'Bytes of audit events spooled to disk', value=siem['spool_bytes'])
+
+        # shared state in Redis: the same on every API process
+        try:
+            m = memo.stats()
+            sched = scheduler.stats()
+        except Exception:
+            return
+        fam = CounterMetricFamily('ssr_result_memo', 'Result memoization lookups and writes', labels=['event'])
+        for event in ('hits', 'misses', 'stores', 'evictions'):
+            fam.add_metric([event], m[event])
+        yield fam
+        fam = GaugeMetricFamily('ssr_scheduler_pending', 'Executions waiting for capacity', labels=['lane'])
+        for lane, n in sched['pending'].items():
+            fam.add_metric([lane], n)
+        yield fam
+        yield GaugeMetricFamily('ssr_scheduler_running', 'Executions holding capacity', value=sched['running'])
+        yield GaugeMetricFamily('ssr_scheduler_workers', 'Worker nodes with a live heartbeat', value=len(sched['workers']))
+
+
+_stats = StatsCollector()
+_registered = False
+
+
+def registry(with_stats: bool = True) -> CollectorRegistry:
+    global _registered
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        reg = CollectorRegistry()
+        multiprocess.MultiProcessCollector(reg)
+        if with_stats:
+            reg.register(_stats)
+        return reg
+    if with_stats and not _registered:
+        REGISTRY.register(_stats)
+        _registered = True
+    return REGISTRY
+
+
+def render(with_stats: bool = True) -> tuple[bytes, str]:
+    return generate_latest(registry(with_stats)), CONTENT_TYPE_LATEST
@@ -0,0 +1,209 @@
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable
+from fastapi import HTTPException
+from app.config import settings
+from app.services.command_builder import check_template
+
+_TRUE = {'true', '1', 'yes', 'on'}
+_FALSE = {'false', '0', 'no', 'off'}
+
+
+class _Invalid(ValueError):
+    pass
+
+
+def _to_int(v):
+    if type(v) is int:
+        return v
+    if isinstance(v, bool) or isinstance(v, float) and not v.is_integer():
+        raise ValueError
+    return int(v)
+
+
+def _to_float(v):
+    if type(v) is float:
+        return v
+    if isinstance(v, bool):
+        raise ValueError
+    return float(v)
+
+
+def _to_bool(v):
+    if isinstance(v, bool):
+        return v
+    s = str(v).strip().lower()
+    if s in _TRUE:
+        return True
+    if s in _FALSE:
+        return False
+    raise ValueError
+
+
+def _scalar(v):
+    if isinstance(v, (dict, list)):
+        raise ValueError
+    return v
+
+
+def _to_str(v):
+    if type(v) is str:
+        return v
+    return str(_scalar(v))
+
+
+_COERCE = {'int': _to_int, 'float': _to_float, 'bool': _to_bool, 'enum': _scalar}
+_NUMERIC = ('int', 'float')
+
+
+@dataclass(frozen=True)
+class ParamSpec:
+    name: str
+    type: str
+    required: bool
+    default: Any
+    check: Callable[[Any], Any]  # coerced value, or ValueError
+
+
+def compile_param(name: str, spec: dict) -> ParamSpec:
+    rules = spec.get('validation') or {}
+    ptype = spec.get('type') or 'string'
+    coerce = _COERCE.get(ptype, _to_str)
+    try:
+        search = re.compile(rules['regex']).search if rules.get('regex') else None
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid regex for parameter {name}: {e}")
+    choices = frozenset(rules['enum']) if rules.get('enum') is not None else None
+    lo, hi = rules.get('min'), rules.get('max')
+    bounded = lo is not None or hi is not None
+    numeric = ptype in _NUMERIC
+    expected = f"expected {ptype}"
+
+    # everything a request needs is bound into one closure; absent rules cost a local None test
+    def check(raw):
+        try:
+            v = coerce(raw)
+        except (TypeError, ValueError):
+            raise _Invalid(expected)
+        if choices is not None and v not in choices:
+            raise _Invalid("not one of the allowed values")
+        if bounded:
+            # min/max bound numbers by value and strings by length
+            size = v if numeric else len(v) if isinstance(v, str) else None
+            if size is not None:
+                if lo is not None and size < lo:
+                    raise _Invalid(f"below minimum {lo}")
+                if hi is not None and size > hi:
+                    raise _Invalid(f"above maximum {hi}")
+        if search is not None and search(v if isinstance(v, str) else str(v)) is None:
+            raise _Invalid("does not match the required pattern")
+        return v
+
+    return ParamSpec(name=name, type=ptype, required=bool(spec.get('required', True)), default=spec.get('default'), check=check)
+
+
+class CompiledModule:
+    """One module version's parameter validator and argv/env builder.
+
+    Regexes, coercions and template lookups are resolved once, so a request
+    costs one pass over the parameters plus one over the template.
+    """
+
+    def __init__(self, module_id: int, version: int, parameters_schema: dict, command_template: dict):
+        self.module_id = module_id
+        self.version = version
+        interp, script = check_template(command_template)
+        self.params = tuple(compile_param(n, s or {}) for n, s in (parameters_schema or {}).items())
+        self._checks = tuple((p.name, p.check, p.required, p.default) for p in self.params)
+        self._known = frozenset(p.name for p in self.params)
+        self.secret_names = frozenset(p.name for p in self.params if p.type == 'secret')
+        self._prefix = (interp, script)
+        self._positional = tuple(command_template.get('positional_args') or ())
+        self._named = tuple((command_template.get('named_args') or {}).items())
+        self._env = tuple((str(k), p) for k, p in (command_template.get('env') or {}).items())
+
+    def validate(self, params: dict) -> dict:
+        """Coerced parameters with defaults applied; 400 listing every bad parameter."""
+        out: dict = {}
+        errors: list[dict] = []
+        for name, check, required, default in self._checks:
+            raw = params.get(name)
+            if raw is None:
+                if default is not None:
+                    raw = default
+                elif required:
+                    errors.append({"param": name, "msg": "required"})
+                    continue
+                else:
+                    continue
+            try:
+                out[name] = check(raw)
+            except _Invalid as e:
+                errors.append({"param": name, "msg": str(e)})
+        if not self._known.issuperset(params):
+            errors.extend({"param": n, "msg": "unknown parameter"} for n in params if n not in self._known)
+        if errors:
+            raise HTTPException(status_code=400, detail=errors)
+        return out
+
+    def argv(self, params: dict) -> list[str]:
+        argv = list(self._prefix)
+        for name in self._positional:
+            v = params.get(name)
+            if v is not None:
+                argv.append(str(v))
+        for flag, name in self._named:
+            v = params.get(name)
+            if v is not None:
+                argv.extend((flag, str(v)))
+        return argv
+
+    def env(self, params: dict) -> dict[str, str]:
+        return {key: str(params[name]) for key, name in self._env if params.get(name) is not None}
+
+    def secrets(self, params: dict) -> list[str]:
+        return [str(v) for k, v in params.items() if k in self.secret_names and v is not None]
+
+
+class CompiledModuleCache:
+    """LRU of ``CompiledModule`` keyed by ``(module_id, version)``.
+
+    A module update bumps its version, so other processes simply miss on the
+    new key; ``invalidate`` also drops the old versions in this process.
+    """
+
+    def __init__(self, max_size: int | None = None):
+        self.max_size = settings.MODULE_SPEC_CACHE_SIZE if max_size is None else max_size
+        self._entries: OrderedDict[tuple[int, int], CompiledModule] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, module) -> CompiledModule:
+        key = (module.id, module.version or 1)
+        with self._lock:
+            cm = self._entries.get(key)
+            if cm is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cm
+            self.misses += 1
+        cm = CompiledModule(module.id, module.version or 1, module.parameters_schema_json, module.command_template_json)
+        with self._lock:
+            self._entries[key] = cm
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return cm
+
+    def invalidate(self, module_id: int):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == module_id]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+compiled_modules = CompiledModuleCache()
@@ -0,0 +1,15 @@
+import os
+import redis
+from app.config import settings
+
+_client = None
+_client_pid = None
+
+
+def client() -> redis.Redis:
+    """Process-wide Redis connection pool for app state (not the Celery broker)."""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+        _client_pid = os.getpid()
+    return _client
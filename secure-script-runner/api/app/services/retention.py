@@ -0,0 +1,204 @@
+"""Retention sweeper: expired executions, artifacts and audit rows, deleted in bounded batches.
+
+Policies, 0 meaning keep forever:
+- executions finished more than ``Module.retention_days`` (or, when the
+  module leaves it unset, ``EXECUTION_RETENTION_DAYS``) ago go together with
+  their log rows, params, artifact rows and objects, and archived log blob;
+- artifacts past ``retention_until`` (set from ``ARTIFACT_RETENTION_DAYS``
+  when stored) go on their own, even if their execution is kept;
+- audit rows older than ``AUDIT_RETENTION_DAYS``.
+
+Every batch is at most ``RETENTION_BATCH_SIZE`` rows and its own transaction,
+so no statement holds locks for long; objects are removed with multi-object
+deletes before the rows that point at them. A sweep stops after
+``RETENTION_MAX_RUNTIME_SEC`` and records where it was in Redis, so the next
+run resumes at the same module.
+"""
+import json
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from app.audit import audit
+from app.config import settings
+from app.models import AuditLog, Execution, ExecutionArtifact, ExecutionLog, ExecutionParam, ExecStatus, Module, TERMINAL_STATUSES
+from app.services import memo, metrics, storage
+from app.services.storage import artifact_key
+from app.services.redis_client import client as redis_client
+
+CHECKPOINT_KEY = 'retention:checkpoint'
+LOCK_KEY = 'retention:lock'
+S3_DELETE_MAX = 1000  # keys per DeleteObjects request
+
+
+def artifact_expiry(now: datetime | None = None) -> datetime | None:
+    if not settings.ARTIFACT_RETENTION_DAYS:
+        return None
+    return (now or datetime.utcnow()) + timedelta(days=settings.ARTIFACT_RETENTION_DAYS)
+
+
+def checkpoint() -> dict:
+    raw = redis_client().hgetall(CHECKPOINT_KEY)
+    return {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v for k, v in raw.items()}
+
+
+class Sweep:
+    def __init__(self, db: Session, s3=None, batch_size: int | None = None, max_runtime: float | None = None, now: datetime | None = None):
+        self.db = db
+        self.s3 = s3 or storage.client()
+        self.batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+        self.deadline = time.monotonic() + (settings.RETENTION_MAX_RUNTIME_SEC if max_runtime is None else max_runtime)
+        self.now = now or datetime.utcnow()
+        self.report = {"executions": 0, "logs": 0, "params": 0, "artifacts": 0, "audit_logs": 0,
+                       "objects": 0, "object_errors": 0, "bytes": 0, "complete": False}
+        self.phase, self.module_id = 'artifacts', 0
+
+    def _time_left(self) -> bool:
+        return time.monotonic() < self.deadline
+
+    def _count(self, kind: str, n: int):
+        if n:
+            self.report[kind] += n
+            metrics.RETENTION_DELETED.labels(kind).inc(n)
+
+    def _save(self, phase: str, module_id: int = 0):
+        self.phase, self.module_id = phase, module_id
+        try:
+            redis_client().hset(CHECKPOINT_KEY, mapping={
+                "phase": phase, "module_id": module_id, "updated_at": datetime.utcnow().isoformat(), "report": json.dumps(self.report),
+            })
+        except Exception:
+            pass
+
+    # -- object storage ------------------------------------------------------
+
+    def delete_objects(self, keys: list[str]):
+        for i in range(0, len(keys), S3_DELETE_MAX):
+            chunk = keys[i:i + S3_DELETE_MAX]
+            try:
+                resp = self.s3.delete_objects(Bucket=settings.S3_BUCKET, Delete={'Objects': [{'Key': k} for k in chunk], 'Quiet': True})
+            except Exception:
+                self.report["object_errors"] += len(chunk)
+                continue
+            errors = len(resp.get('Errors', []))
+            self.report["object_errors"] += errors
+            self._count("objects", len(chunk) - errors)
+
+    # -- phases ----------------------------------------------------------------
+
+    def expired_artifacts(self) -> bool:
+        while self._time_left():
+            rows = self.db.execute(
+                select(ExecutionArtifact.id, ExecutionArtifact.execution_id, ExecutionArtifact.filename, ExecutionArtifact.storage_key, ExecutionArtifact.size_bytes)
+                .where(ExecutionArtifact.retention_until < self.now)
+                .order_by(ExecutionArtifact.id).limit(self.batch_size)
+            ).all()
+            if not rows:
+                return True
+            self.delete_objects([r.storage_key or artifact_key(r.execution_id, r.filename) for r in rows])
+            self.db.execute(delete(ExecutionArtifact).where(ExecutionArtifact.id.in_([r.id for r in rows])))
+            self.db.commit()
+            self._count("artifacts", len(rows))
+            self.report["bytes"] += sum(r.size_bytes or 0 for r in rows)
+            self._save('artifacts')
+        return False
+
+    def executions(self, start_module: int = 0) -> bool:
+        policies = self.db.execute(select(Module.id, Module.retention_days).where(Module.id >= start_module).order_by(Module.id)).all()
+        for module_id, days in policies:
+            days = settings.EXECUTION_RETENTION_DAYS if days is None else days
+            if not days:
+                continue
+            cutoff = self.now - timedelta(days=days)
+            while True:
+                if not self._time_left():
+                    return False
+                ids = self.db.execute(
+                    select(Execution.id)
+                    .where(Execution.module_id == module_id, Execution.finished_at < cutoff, Execution.status.in_(TERMINAL_STATUSES))
+                    .order_by(Execution.id).limit(self.batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                self._purge(ids)
+                self._save('executions', module_id)
+        return True
+
+    def _purge(self, ids: list[int]):
+        db = self.db
+        arts = db.execute(select(ExecutionArtifact.execution_id, ExecutionArtifact.filename, ExecutionArtifact.storage_key, ExecutionArtifact.size_bytes)
+                          .where(ExecutionArtifact.execution_id.in_(ids))).all()
+        archives = db.execute(select(Execution.log_archive_key).where(Execution.id.in_(ids), Execution.log_archive_key.isnot(None))).scalars().all()
+        memoized = db.execute(select(Execution.id, Execution.module_id, Execution.memo_key)
+                              .where(Execution.id.in_(ids), Execution.memo_key.isnot(None), Execution.status == ExecStatus.succeeded.value)).all()
+        self.delete_objects([a.storage_key or artifact_key(a.execution_id, a.filename) for a in arts] + list(archives))
+        self.report["bytes"] += sum(a.size_bytes or 0 for a in arts)
+
+        # log rows can run to thousands per execution: delete them in their own batches
+        while True:
+            rows = db.execute(select(ExecutionLog.id, func.length(ExecutionLog.chunk_text_redacted))
+                              .where(ExecutionLog.execution_id.in_(ids)).limit(self.batch_size)).all()
+            if not rows:
+                break
+            db.execute(delete(ExecutionLog).where(ExecutionLog.id.in_([r[0] for r in rows])))
+            db.commit()
+            self._count("logs", len(rows))
+            self.report["bytes"] += sum(r[1] or 0 for r in rows)
+
+        self._count("params", db.execute(delete(ExecutionParam).where(ExecutionParam.execution_id.in_(ids))).rowcount)
+        self._count("artifacts", db.execute(delete(ExecutionArtifact).where(ExecutionArtifact.execution_id.in_(ids))).rowcount)
+        # runs served from a purged one keep their row, but have nothing left to link to
+        db.query(Execution).filter(Execution.memo_source_id.in_(ids)).update({"memo_source_id": None}, synchronize_session=False)
+        self._count("executions", db.execute(delete(Execution).where(Execution.id.in_(ids))).rowcount)
+        db.commit()
+        for m in memoized:
+            memo.forget(m.module_id, m.memo_key, m.id)
+
+    def audit_logs(self) -> bool:
+        if not settings.AUDIT_RETENTION_DAYS:
+            return True
+        cutoff = self.now - timedelta(days=settings.AUDIT_RETENTION_DAYS)
+        while self._time_left():
+            ids = self.db.execute(select(AuditLog.id).where(AuditLog.timestamp < cutoff)
+                                  .order_by(AuditLog.timestamp, AuditLog.id).limit(self.batch_size)).scalars().all()
+            if not ids:
+                return True
+            self.db.execute(delete(AuditLog).where(AuditLog.id.in_(ids)))
+            self.db.commit()
+            self._count("audit_logs", len(ids))
+            self._save('audit_logs')
+        return False
+
+    def run(self, start_module: int = 0) -> dict:
+        done = self.expired_artifacts() and self.executions(start_module) and self.audit_logs()
+        self.report["complete"] = done
+        if done:
+            self._save('done')
+        else:
+            self._save(self.phase, self.module_id)
+        metrics.RETENTION_BYTES.inc(self.report["bytes"])
+        if any(self.report[k] for k in ("executions", "artifacts", "audit_logs")):
+            audit(self.db, None, 'retention.sweep', 'retention', self.now.date().isoformat(), None, self.report)
+            self.db.commit()
+        return self.report
+
+
+def sweep(db: Session, s3=None) -> dict:
+    """One sweep, resuming at the module where the last unfinished one stopped; skipped while another runs."""
+    r = redis_client()
+    ttl = int(settings.RETENTION_MAX_RUNTIME_SEC * 2) + 60
+    try:
+        if not r.set(LOCK_KEY, 1, nx=True, ex=ttl):
+            return {"skipped": "another sweep is running"}
+        state = checkpoint()
+    except Exception:
+        r, state = None, {}
+    start = int(state.get('module_id') or 0) if state.get('phase') == 'executions' else 0
+    try:
+        return Sweep(db, s3).run(start)
+    finally:
+        if r is not None:
+            try:
+                r.delete(LOCK_KEY)
+            except Exception:
+                pass
@@ -0,0 +1,349 @@
+import json
+import time
+import uuid
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Execution, ExecStatus
+from app.services.events import publish_status
+from app.services.redis_client import client as redis_client
+
+LANES = ('interactive', 'batch')  # strict priority order
+
+WORKERS_KEY = 'sched:workers'   # node -> {"cpu", "mem_mb", "slots", "seen"}
+ALLOCS_KEY = 'sched:allocs'     # execution id -> {"worker", "cpu", "mem_mb", "module_id", "user_id"}
+JOBS_KEY = 'sched:jobs'         # execution id -> Job (without secret values), until a worker starts it
+LOCK_KEY = 'sched:lock'
+DIRTY_KEY = 'sched:dirty'
+
+
+def pending_key(lane: str) -> str:
+    return f"sched:pending:{lane}"
+
+
+def secret_key(execution_id: int) -> str:
+    return f"sched:secret:{execution_id}"
+
+
+def worker_queue(node: str) -> str:
+    return f"ssr.{node}"
+
+
+@dataclass
+class Job:
+    execution_id: int
+    module_id: int
+    user_id: int
+    cpu: float
+    mem_mb: int
+    params: dict
+    lane: str = 'interactive'
+    module_cap: int | None = None
+    enqueued_at: float = 0.0
+    secret_names: list[str] = field(default_factory=list)
+
+
+class Scheduler:
+    """Admission control between ``execute_module`` and the workers.
+
+    Executions wait in per-lane Redis sorted sets (FIFO within a lane,
+    ``interactive`` strictly before ``batch``). Each worker node publishes its
+    cpu / memory / slot capacity with a heartbeat; a dispatch pass computes
+    free capacity from the current allocations and places each admissible job
+    on the best-fitting node's own Celery queue. Jobs over the per-module or
+    per-user concurrency cap are skipped, and smaller jobs may backfill past a
+    large one unless it has waited longer than ``SCHED_STARVATION_SEC``, in
+    which case capacity is held for it. Passes are serialised by a Redis lock;
+    triggers that arrive during a pass make it run again.
+
+    The job record stays in ``sched:jobs`` until a worker starts the execution,
+    so when a node stops heartbeating its placed-but-unstarted executions go
+    back to pending; ones it had already started are failed. Secret parameter
+    values are kept out of that record, under a per-execution key with a TTL
+    that is read at dispatch and deleted once the execution starts.
+    """
+
+    def __init__(self, redis=None):
+        self._redis = redis
+
+    @property
+    def r(self):
+        return self._redis or redis_client()
+
+    # -- workers ---------------------------------------------------------
+
+    def heartbeat(self, node: str, cpu: float, mem_mb: int, slots: int):
+        self.r.hset(WORKERS_KEY, node, json.dumps({"cpu": cpu, "mem_mb": mem_mb, "slots": slots, "seen": time.time()}))
+
+    def remove_worker(self, node: str):
+        self.r.hdel(WORKERS_KEY, node)
+
+    def workers(self) -> dict[str, dict]:
+        now = time.time()
+        out = {}
+        for node, raw in self.r.hgetall(WORKERS_KEY).items():
+            w = json.loads(raw)
+            if now - w["seen"] <= settings.SCHED_WORKER_TTL_SEC:
+                out[node.decode() if isinstance(node, bytes) else node] = w
+        return out
+
+    # -- jobs ------------------------------------------------------------
+
+    def enqueue(self, job: Job):
+        self.enqueue_many([job])
+
+    def enqueue_many(self, jobs: list[Job]):
+        """Queue jobs in one round-trip; they keep their relative order within a lane."""
+        now = time.time()
+        pipe = self.r.pipeline()
+        for i, job in enumerate(jobs):
+            if job.lane not in LANES:
+                raise ValueError(f"unknown lane {job.lane}")
+            # equal scores would sort by member text ("10" < "9"), so keep them distinct
+            job.enqueued_at = job.enqueued_at or now + i * 1e-6
+            record = asdict(job)
+            secrets = {k: record['params'].pop(k) for k in job.secret_names if k in record['params']}
+            if secrets:
+                pipe.set(secret_key(job.execution_id), json.dumps(secrets), ex=settings.SCHED_SECRET_TTL_SEC)
+            pipe.hset(JOBS_KEY, job.execution_id, json.dumps(record))
+            pipe.zadd(pending_key(job.lane), {job.execution_id: job.enqueued_at})
+        pipe.execute()
+
+    def cancel(self, execution_id: int) -> bool:
+        pipe = self.r.pipeline()
+        for lane in LANES:
+            pipe.zrem(pending_key(lane), execution_id)
+        pipe.hdel(JOBS_KEY, execution_id)
+        pipe.delete(secret_key(execution_id))
+        return any(pipe.execute()[:len(LANES)])
+
+    def started(self, execution_id: int):
+        """A worker picked the execution up: drop what it would be requeued from."""
+        pipe = self.r.pipeline()
+        pipe.hdel(JOBS_KEY, execution_id)
+        pipe.delete(secret_key(execution_id))
+        pipe.execute()
+
+    def release(self, execution_id: int):
+        """Free the capacity held by a finished execution."""
+        pipe = self.r.pipeline()
+        pipe.hdel(ALLOCS_KEY, execution_id)
+        pipe.hdel(JOBS_KEY, execution_id)
+        pipe.delete(secret_key(execution_id))
+        pipe.execute()
+
+    def allocations(self) -> dict[int, dict]:
+        return {int(k): json.loads(v) for k, v in self.r.hgetall(ALLOCS_KEY).items()}
+
+    # -- dispatch --------------------------------------------------------
+
+    def dispatch(self, send=None) -> list[int]:
+        """Run dispatch passes until no trigger is outstanding; returns dispatched ids."""
+        r = self.r
+        r.set(DIRTY_KEY, 1)
+        dispatched = []
+        while True:
+            token = uuid.uuid4().hex
+            if not r.set(LOCK_KEY, token, nx=True, px=int(settings.SCHED_LOCK_TTL_SEC * 1000)):
+                return dispatched  # the lock holder sees our dirty flag and runs again
+            try:
+                r.delete(DIRTY_KEY)
+                dispatched += self._pass(send)
+            finally:
+                if r.get(LOCK_KEY) == token.encode():
+                    r.delete(LOCK_KEY)
+            if not r.exists(DIRTY_KEY):
+                return dispatched
+
+    def _pass(self, send) -> list[int]:
+        r = self.r
+        workers = self.workers()
+        allocs = self.allocations()
+        # allocations on nodes that stopped heartbeating will never be released by them
+        dead = {eid: a["worker"] for eid, a in allocs.items() if a["worker"] not in workers}
+        if dead:
+            r.hdel(ALLOCS_KEY, *dead)
+            for eid in dead:
+                allocs.pop(eid)
+            self._recover(dead)
+
+        free = {n: {"cpu": w["cpu"], "mem_mb": w["mem_mb"], "slots": w["slots"]} for n, w in workers.items()}
+        per_module: dict[int, int] = {}
+        per_user: dict[int, int] = {}
+        for a in allocs.values():
+            f = free.get(a["worker"])
+            if f:
+                f["cpu"] -= a["cpu"]
+                f["mem_mb"] -= a["mem_mb"]
+                f["slots"] -= 1
+            per_module[a["module_id"]] = per_module.get(a["module_id"], 0) + 1
+            per_user[a["user_id"]] = per_user.get(a["user_id"], 0) + 1
+
+        max_cpu = max((w["cpu"] for w in workers.values()), default=0)
+        max_mem = max((w["mem_mb"] for w in workers.values()), default=0)
+        now = time.time()
+        placed: list[tuple[Job, str]] = []
+        oversized: list[Job] = []
+        for lane in LANES:
+            ids = r.zrange(pending_key(lane), 0, settings.SCHED_SCAN_LIMIT - 1)
+            raws = r.hmget(JOBS_KEY, ids) if ids else []
+            blocked = False
+            for raw in raws:
+                if raw is None:
+                    continue
+                job = Job(**json.loads(raw))
+                if workers and (job.cpu > max_cpu or job.mem_mb > max_mem):
+                    oversized.append(job)
+                    continue
+                module_cap = job.module_cap or settings.SCHED_MAX_PER_MODULE
+                if per_module.get(job.module_id, 0) >= module_cap or per_user.get(job.user_id, 0) >= settings.SCHED_MAX_PER_USER:
+                    continue
+                node = self._best_fit(free, job)
+                if node is None:
+                    if now - job.enqueued_at > settings.SCHED_STARVATION_SEC:
+                        # stop backfilling so capacity drains towards this job
+                        blocked = True
+                        break
+                    continue
+                f = free[node]
+                f["cpu"] -= job.cpu
+                f["mem_mb"] -= job.mem_mb
+                f["slots"] -= 1
+                per_module[job.module_id] = per_module.get(job.module_id, 0) + 1
+                per_user[job.user_id] = per_user.get(job.user_id, 0) + 1
+                placed.append((job, node))
+            if blocked:
+                break
+
+        if placed:
+            self._commit(placed, send)
+        if oversized:
+            self._reject(oversized, max_cpu, max_mem)
+        return [job.execution_id for job, _ in placed]
+
+    @staticmethod
+    def _best_fit(free: dict[str, dict], job: Job) -> str | None:
+        best, best_left = None, None
+        for node, f in free.items():
+            if f["slots"] < 1 or f["cpu"] < job.cpu or f["mem_mb"] < job.mem_mb:
+                continue
+            # tightest remaining fit keeps large holes open for large jobs
+            left = (f["cpu"] - job.cpu) / max(job.cpu, 0.01) + (f["mem_mb"] - job.mem_mb) / max(job.mem_mb, 1)
+            if best_left is None or left < best_left:
+                best, best_left = node, left
+        return best
+
+    def _recover(self, dead: dict[int, str]):
+        """Requeue executions a lost node never started; fail the ones it was running."""
+        db = SessionLocal()
+        try:
+            rows = db.query(Execution.id, Execution.status).filter(Execution.id.in_(list(dead))).all()
+            queued = [eid for eid, status in rows if status == ExecStatus.queued.value]
+            raws = self.r.hmget(JOBS_KEY, queued) if queued else []
+            lost = {eid: f"Worker {dead[eid]} stopped responding" for eid, status in rows if status == ExecStatus.running.value}
+            requeue = []
+            for eid, raw in zip(queued, raws):
+                job = Job(**json.loads(raw)) if raw else None
+                if job is None or (job.secret_names and not self.r.exists(secret_key(eid))):
+                    lost[eid] = f"Worker {dead[eid]} was lost before the execution started"
+                else:
+                    requeue.append(job)
+            if requeue:
+                # back at their original position; the start guard drops the stale message if the node returns
+                pipe = self.r.pipeline()
+                for job in requeue:
+                    pipe.zadd(pending_key(job.lane), {job.execution_id: job.enqueued_at})
+                pipe.execute()
+            self._fail(db, lost)
+        finally:
+            db.close()
+
+    def _fail(self, db, errors: dict[int, str]):
+        if not errors:
+            return
+        now = datetime.utcnow()
+        for eid, error in errors.items():
+            self.cancel(eid)
+            db.query(Execution).filter(Execution.id == eid, Execution.status.in_([ExecStatus.queued.value, ExecStatus.running.value])).update({
+                "status": ExecStatus.failed.value, "error_summary": error, "finished_at": now,
+            }, synchronize_session=False)
+        db.commit()
+        for eid in errors:
+            publish_status(eid, ExecStatus.failed.value)
+
+    def _commit(self, placed: list[tuple[Job, str]], send):
+        from app.worker.celery_app import celery
+        send = send or (lambda job, node: celery.send_task('app.tasks.run_execution', args=[job.execution_id, job.params], queue=worker_queue(node)))
+        now = time.time()
+        with_secrets = [job for job, _ in placed if job.secret_names]
+        if with_secrets:
+            pipe = self.r.pipeline()
+            for job in with_secrets:
+                pipe.get(secret_key(job.execution_id))
+            expired = {}
+            for job, raw in zip(with_secrets, pipe.execute()):
+                if raw is None:
+                    expired[job.execution_id] = "Secret parameters expired before the execution was dispatched"
+                else:
+                    job.params.update(json.loads(raw))
+            if expired:
+                db = SessionLocal()
+                try:
+                    self._fail(db, expired)
+                finally:
+                    db.close()
+                placed = [(job, node) for job, node in placed if job.execution_id not in expired]
+                if not placed:
+                    return
+        # database first: if the commit fails the jobs are still pending and no capacity is held
+        db = SessionLocal()
+        try:
+            for job, node in placed:
+                db.query(Execution).filter_by(id=job.execution_id).update({
+                    "dispatched_at": datetime.utcnow(),
+                    "queue_wait_ms": int((now - job.enqueued_at) * 1000),
+                    "worker_id": node,
+                })
+            db.commit()
+        finally:
+            db.close()
+        pipe = self.r.pipeline()
+        for job, node in placed:
+            pipe.hset(ALLOCS_KEY, job.execution_id, json.dumps({"worker": node, "cpu": job.cpu, "mem_mb": job.mem_mb, "module_id": job.module_id, "user_id": job.user_id}))
+            pipe.zrem(pending_key(job.lane), job.execution_id)
+        pipe.execute()
+        for job, node in placed:
+            try:
+                send(job, node)
+            except Exception:
+                # broker hiccup: put it back at its original position
+                self.r.hdel(ALLOCS_KEY, job.execution_id)
+                self.r.zadd(pending_key(job.lane), {job.execution_id: job.enqueued_at})
+
+    def _reject(self, jobs: list[Job], max_cpu: float, max_mem: int):
+        db = SessionLocal()
+        try:
+            self._fail(db, {job.execution_id: f"Requested {job.cpu} cpu / {job.mem_mb} MB exceeds the largest worker ({max_cpu} cpu / {max_mem} MB)"
+                            for job in jobs})
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        workers = self.workers()
+        allocs = self.allocations()
+        used: dict[str, dict] = {n: {"cpu": 0.0, "mem_mb": 0, "running": 0} for n in workers}
+        for a in allocs.values():
+            u = used.get(a["worker"])
+            if u:
+                u["cpu"] += a["cpu"]
+                u["mem_mb"] += a["mem_mb"]
+                u["running"] += 1
+        return {
+            "pending": {lane: self.r.zcard(pending_key(lane)) for lane in LANES},
+            "running": len(allocs),
+            "workers": {n: {**w, "used": used[n]} for n, w in workers.items()},
+        }
+
+
+scheduler = Scheduler()
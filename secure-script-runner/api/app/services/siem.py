@@ -1,10 +1,260 @@
 from app.config import settings
+import atexit
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
 import httpx
 
+# statuses that reject the payload itself; auth/config errors (401, 403, 404, ...)
+# and 429/5xx are retried and spooled until the SIEM accepts the batch
+REJECTED = {400, 413, 422}
+
+
+class SiemForwarder:
+    """Delivers audit events to ``SIEM_WEBHOOK_URL`` from a background thread.
+
+    ``submit`` only enqueues, so request latency no longer depends on the SIEM.
+    The sender batches events (NDJSON or a JSON array), reuses one keep-alive
+    client and retries with exponential backoff. Batches that still fail,
+    and anything arriving while the SIEM is backing off, are appended to a
+    bounded on-disk spool that is replayed (oldest first) once delivery
+    succeeds again. When the spool is full the oldest segment is dropped.
+    Only a 400/413/422 rejection discards a batch; discarded events are
+    counted in ``dropped`` like spool overflow.
+    """
+
+    def __init__(self, url: str | None = None, spool_dir: str | None = None):
+        self.url = url
+        self.spool_dir = spool_dir or settings.SIEM_SPOOL_DIR
+        self.batch_size = settings.SIEM_BATCH_SIZE
+        self.flush_interval = settings.SIEM_FLUSH_INTERVAL_SEC
+        self.max_retries = settings.SIEM_MAX_RETRIES
+        self.max_backoff = settings.SIEM_MAX_BACKOFF_SEC
+        self.spool_max_bytes = settings.SIEM_SPOOL_MAX_MB * 1024 * 1024
+        self._q: queue.Queue = queue.Queue(maxsize=settings.SIEM_QUEUE_MAX)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid = None
+        self._client: httpx.Client | None = None
+        self._backoff_until = 0.0
+        self._backoff = 0.0
+        self._seq = 0
+        self.enqueued = self.sent = self.batches = self.failures = self.spooled = self.replayed = self.dropped = 0
+        self.last_error: str | None = None
+        self.last_success_at: float | None = None
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._client = None
+                self._thread = threading.Thread(target=self._run, name='siem-forwarder', daemon=True)
+                self._thread.start()
+
+    def submit(self, event: dict):
+        if not self.url:
+            return
+        self._ensure_started()
+        try:
+            self._q.put_nowait(event)
+            self.enqueued += 1
+        except queue.Full:
+            self._spool([event])
+
+    # -- sender thread -------------------------------------------------
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                if time.monotonic() < self._backoff_until:
+                    self._spool(batch)
+                elif self._deliver(batch):
+                    self._replay_spool()
+                else:
+                    self._spool(batch)
+            elif time.monotonic() >= self._backoff_until and self._spool_files():
+                self._replay_spool()
+
+    def _take_batch(self) -> list[dict]:
+        try:
+            batch = [self._q.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _http(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(timeout=settings.SIEM_TIMEOUT_SEC, limits=httpx.Limits(max_keepalive_connections=2))
+        return self._client
+
+    def _encode(self, batch: list[dict]) -> tuple[bytes, str]:
+        if settings.SIEM_FORMAT == 'array':
+            return json.dumps(batch, default=str).encode(), 'application/json'
+        return ''.join(json.dumps(e, default=str) + '\n' for e in batch).encode(), 'application/x-ndjson'
+
+    def _deliver(self, batch: list[dict]) -> bool:
+        body, ctype = self._encode(batch)
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = self._http().post(self.url, content=body, headers={'Content-Type': ctype})
+                if resp.status_code < 400 or resp.status_code in REJECTED:
+                    if resp.status_code in REJECTED:
+                        # the SIEM refused this payload; resending it will not help
+                        self.failures += 1
+                        self.dropped += len(batch)
+                        self.last_error = f"HTTP {resp.status_code} (batch dropped)"
+                    else:
+                        self.sent += len(batch)
+                        self.last_success_at = time.time()
+                    self.batches += 1
+                    self._backoff = 0.0
+                    self._backoff_until = 0.0
+                    return True
+                self.last_error = f"HTTP {resp.status_code}"
+            except Exception as e:
+                self.last_error = repr(e)
+            self.failures += 1
+            if attempt < self.max_retries:
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+        self._backoff = min(max(self._backoff * 2, 1.0), self.max_backoff)
+        self._backoff_until = time.monotonic() + self._backoff
+        return False
+
+    # -- spool -----------------------------------------------------------
+
+    def _spool_files(self) -> list[str]:
+        try:
+            return sorted(f for f in os.listdir(self.spool_dir) if f.endswith('.ndjson'))
+        except FileNotFoundError:
+            return []
+
+    def _spool(self, batch: list[dict]):
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            with self._lock:
+                self._seq += 1
+                name = f"{time.time_ns():020d}-{os.getpid()}-{self._seq:06d}.ndjson"
+            data = ''.join(json.dumps(e, default=str) + '\n' for e in batch).encode()
+            tmp = os.path.join(self.spool_dir, name + '.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(self.spool_dir, name))
+            self.spooled += len(batch)
+            self._trim_spool()
+        except Exception as e:
+            self.dropped += len(batch)
+            self.last_error = repr(e)
+
+    def _trim_spool(self):
+        files = self._spool_files()
+        sizes = {f: os.path.getsize(os.path.join(self.spool_dir, f)) for f in files}
+        total = sum(sizes.values())
+        for f in files:
+            if total <= self.spool_max_bytes:
+                break
+            try:
+                with open(os.path.join(self.spool_dir, f), 'rb') as fh:
+                    self.dropped += sum(1 for _ in fh)
+                os.remove(os.path.join(self.spool_dir, f))
+            except FileNotFoundError:
+                pass
+            total -= sizes[f]
+
+    def _replay_spool(self):
+        try:
+            lock = open(os.path.join(self.spool_dir, '.replay.lock'), 'w')
+        except FileNotFoundError:
+            return
+        with lock:
+            try:
+                # several API/worker processes may share a spool; one replays at a time
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            for name in self._spool_files():
+                path = os.path.join(self.spool_dir, name)
+                try:
+                    with open(path, 'rb') as f:
+                        events = [json.loads(line) for line in f if line.strip()]
+                except FileNotFoundError:
+                    continue
+                for i in range(0, len(events), self.batch_size):
+                    if not self._deliver(events[i:i + self.batch_size]):
+                        # keep the undelivered remainder for the next attempt
+                        rest = events[i:]
+                        with open(path + '.tmp', 'wb') as f:
+                            f.write(''.join(json.dumps(e) + '\n' for e in rest).encode())
+                        os.replace(path + '.tmp', path)
+                        return
+                    self.replayed += len(events[i:i + self.batch_size])
+                os.remove(path)
+
+    # -- introspection ---------------------------------------------------
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until queued events have been handed to the sender (tests, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while not self._q.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def stats(self) -> dict:
+        files = self._spool_files()
+        spool_bytes = 0
+        for f in files:
+            try:
+                spool_bytes += os.path.getsize(os.path.join(self.spool_dir, f))
+            except FileNotFoundError:
+                pass
+        return {
+            "enabled": bool(self.url),
+            "queued": self._q.qsize(),
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "batches": self.batches,
+            "failures": self.failures,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "spool_files": len(files),
+            "spool_bytes": spool_bytes,
+            "dropped": self.dropped,
+            "backing_off": time.monotonic() < self._backoff_until,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+        }
+
+
+forwarder = SiemForwarder(settings.SIEM_WEBHOOK_URL)
+
+
+@atexit.register
+def _spool_pending():
+    # events still in memory at shutdown go to disk instead of being lost
+    pending = []
+    while True:
+        try:
+            pending.append(forwarder._q.get_nowait())
+        except queue.Empty:
+            break
+    if pending:
+        forwarder._spool(pending)
+
+
 def post_siem(event: dict):
-    if not settings.SIEM_WEBHOOK_URL:
-        return
-    try:
-        httpx.post(settings.SIEM_WEBHOOK_URL, json=event, timeout=3.0)
-    except Exception:
-        pass
+    forwarder.submit(event)
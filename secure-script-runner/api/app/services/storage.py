@@ -1,25 +1,36 @@
 from app.config import settings
 import boto3
+import os
+import threading
+import time
+from collections import OrderedDict
 from botocore.client import Config
-from datetime import timedelta, datetime
 
 _session = None
+_client = None
+_client_pid = None
+_lock = threading.Lock()
 
 def client():
-    global _session
-    if _session is None:
-        _session = boto3.session.Session(
-            aws_access_key_id=settings.S3_ACCESS_KEY,
-            aws_secret_access_key=settings.S3_SECRET_KEY,
-            region_name=settings.S3_REGION,
-        )
-    s3 = _session.client(
-        's3',
-        endpoint_url=settings.S3_ENDPOINT_URL,
-        config=Config(signature_version='s3v4', s3={'addressing_style': 'path'}),
-        use_ssl=settings.S3_SECURE,
-    )
-    return s3
+    """Process-wide S3 client. boto3 clients are thread-safe, so one pooled client is shared."""
+    global _session, _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            _session = boto3.session.Session(
+                aws_access_key_id=settings.S3_ACCESS_KEY,
+                aws_secret_access_key=settings.S3_SECRET_KEY,
+                region_name=settings.S3_REGION,
+            )
+            _client = _session.client(
+                's3',
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                config=Config(signature_version='s3v4', s3={'addressing_style': 'path'}, max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS),
+                use_ssl=settings.S3_SECURE,
+            )
+            _client_pid = os.getpid()
+    return _client
 
 
 def presign_put(key: str, expires_sec: int = 3600):
@@ -28,3 +39,57 @@ def presign_put(key: str, expires_sec: int = 3600):
 
 def presign_get(key: str, expires_sec: int = 3600):
     return client().generate_presigned_url('get_object', Params={'Bucket': settings.S3_BUCKET, 'Key': key}, ExpiresIn=expires_sec)
+
+
+def artifact_key(execution_id: int, filename: str) -> str:
+    return f"exec/{execution_id}/{filename}"
+
+
+class PresignedURLCache:
+    """Bounded LRU of presigned GET URLs by object key.
+
+    A URL is signed for ``ARTIFACT_URL_TTL_SEC`` and handed out again until it
+    has less than ``ARTIFACT_URL_REFRESH_SEC`` left, so every link returned is
+    good for at least that long while repeated listings cost a dict lookup.
+    """
+
+    def __init__(self, max_size: int | None = None):
+        self.max_size = settings.ARTIFACT_URL_CACHE_SIZE if max_size is None else max_size
+        self._items: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: list[str]) -> list[str]:
+        now = time.time()
+        fresh_until = now + settings.ARTIFACT_URL_REFRESH_SEC
+        out: dict[str, str] = {}
+        with self._lock:
+            for k in keys:
+                item = self._items.get(k)
+                if item is not None and item[1] > fresh_until:
+                    self._items.move_to_end(k)
+                    out[k] = item[0]
+            self.hits += len(out)
+        missing = [k for k in dict.fromkeys(keys) if k not in out]
+        if missing:
+            ttl = settings.ARTIFACT_URL_TTL_SEC
+            signed = [(k, presign_get(k, ttl)) for k in missing]
+            with self._lock:
+                self.misses += len(missing)
+                for k, url in signed:
+                    out[k] = url
+                    if self.max_size > 0:
+                        self._items[k] = (url, now + ttl)
+                        self._items.move_to_end(k)
+                while len(self._items) > self.max_size:
+                    self._items.popitem(last=False)
+        return [out[k] for k in keys]
+
+
+url_cache = PresignedURLCache()
+
+
+def artifact_urls(keys: list[str]) -> list[str]:
+    """Working download links for ``keys``, signed with the process-wide client and cached until shortly before expiry."""
+    return url_cache.get_many(keys)
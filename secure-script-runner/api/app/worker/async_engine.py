@@ -0,0 +1,273 @@
+import asyncio
+import os
+import struct
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import httpx
+from celery.signals import worker_process_shutdown
+from app.config import settings
+from app.database import SessionLocal
+from app.services import metrics
+from app.services.log_ingest import LogIngestor
+from app.services.redaction import RedactionEngine
+from app.worker import lifecycle, sandbox
+from app.worker.pool import pool, POOL_WORKDIR, RUNNER_USER
+
+# multiplexed stream header: stream type (1 stdout, 2 stderr), 3 pad bytes, big-endian payload size
+_FRAME = struct.Struct('>BxxxL')
+# after a deadline kill, how long the output stream gets to end before the pump is cancelled
+KILL_DRAIN_SEC = 10.0
+
+
+class DockerAPI:
+    """The few Docker Engine API calls the engine needs, over the unix socket with httpx."""
+
+    def __init__(self, socket_path: str | None = None, version: str | None = None):
+        transport = httpx.AsyncHTTPTransport(uds=socket_path or settings.DOCKER_SOCKET)
+        self._http = httpx.AsyncClient(
+            transport=transport,
+            base_url=f"http://docker/{version or settings.DOCKER_API_VERSION}",
+            # exec output streams may stay silent for as long as the script runs
+            timeout=httpx.Timeout(30.0, read=None),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=32),
+        )
+
+    async def exec_create(self, container_id: str, argv: list[str], env: dict[str, str]) -> str:
+        resp = await self._http.post(f"/containers/{container_id}/exec", json={
+            "Cmd": argv,
+            "Env": [f"{k}={v}" for k, v in env.items()],
+            "WorkingDir": POOL_WORKDIR,
+            "User": RUNNER_USER,
+            "AttachStdout": True,
+            "AttachStderr": True,
+            "Tty": False,
+        })
+        resp.raise_for_status()
+        return resp.json()['Id']
+
+    async def exec_frames(self, exec_id: str):
+        """Start the exec and yield ``(stream, payload)`` frames until it ends."""
+        async with self._http.stream('POST', f"/exec/{exec_id}/start", json={"Detach": False, "Tty": False}) as resp:
+            resp.raise_for_status()
+            buf = bytearray()
+            async for data in resp.aiter_raw():
+                buf += data
+                while len(buf) >= _FRAME.size:
+                    kind, size = _FRAME.unpack_from(buf)
+                    if len(buf) < _FRAME.size + size:
+                        break
+                    yield ('stderr' if kind == 2 else 'stdout'), bytes(buf[_FRAME.size:_FRAME.size + size])
+                    del buf[:_FRAME.size + size]
+
+    async def exec_exit_code(self, exec_id: str) -> int | None:
+        resp = await self._http.get(f"/exec/{exec_id}/json")
+        resp.raise_for_status()
+        return resp.json().get('ExitCode')
+
+    async def kill(self, container_id: str):
+        resp = await self._http.post(f"/containers/{container_id}/kill")
+        if resp.status_code not in (204, 404, 409):
+            resp.raise_for_status()
+
+
+class AsyncEngine:
+    """Runs many executions concurrently on one asyncio loop per worker process.
+
+    ``submit`` claims an execution (it is ``running`` on this node before the
+    task returns and is acked), hands it to the loop thread and returns, so a
+    single prefork child supervises up to ``ASYNC_ENGINE_MAX_CONCURRENCY``
+    sandboxes (``submit`` blocks while that many are in flight). Executions
+    still in flight when ``shutdown`` gives up are killed and failed. Output is
+    read over the Docker API without a thread per container; each execution
+    has a deadline timer that kills the container even if it never prints.
+    Blocking work (database writes, container create/remove, artifact upload)
+    runs on a small thread pool so the loop stays responsive.
+    """
+
+    def __init__(self, max_concurrency: int | None = None):
+        self.max_concurrency = max_concurrency or settings.ASYNC_ENGINE_MAX_CONCURRENCY
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._blocking: ThreadPoolExecutor | None = None
+        self.docker: DockerAPI | None = None
+        self._inflight: dict[int, object] = {}  # execution id -> its container, once acquired
+        self.running = self.started = self.timeouts = self.errors = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if os.getpid() != self._pid:
+            self._reset()
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='exec-engine', daemon=True).start()
+                self._blocking = ThreadPoolExecutor(max_workers=settings.ASYNC_ENGINE_THREADS, thread_name_prefix='exec-engine-io')
+                self.docker = DockerAPI()
+                self._loop = loop
+        return self._loop
+
+    def submit(self, execution_id: int, params: dict) -> Future | None:
+        """Claim the execution and start it on the loop; None if it did not start."""
+        loop = self._ensure_loop()
+        self._slots.acquire()
+        db = SessionLocal()
+        try:
+            with metrics.stage('prepare'):
+                prep = lifecycle.start(db, execution_id, params)
+        except Exception as e:
+            self._slots.release()
+            self.errors += 1
+            lifecycle.fail(db, execution_id, e)
+            db.close()
+            lifecycle.released(execution_id)
+            return None
+        if prep is None:
+            # requeued elsewhere or already settled
+            self._slots.release()
+            db.close()
+            return None
+        self._inflight[execution_id] = None
+        fut = asyncio.run_coroutine_threadsafe(self.run(db, execution_id, prep), loop)
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    async def _io(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._blocking, fn, *args)
+
+    async def run(self, db, execution_id: int, prep: lifecycle.Prepared):
+        """Run an execution ``submit`` has claimed with ``db``; closes the session."""
+        self.running += 1
+        self.started += 1
+        metrics.EXECUTIONS_RUNNING.inc()
+        container = None
+        try:
+            if prep.sandbox_backend != 'docker':
+                # other backends stream through blocking pipes: run on an io thread
+                await self._io(sandbox.run, db, execution_id, prep)
+                return
+            sandbox.backend('docker')  # refuse if docker is not enabled on this worker
+            with metrics.stage('container_acquire'):
+                container = await self._io(pool.acquire, prep.cpu_limit, prep.mem_limit_mb)
+                self._inflight[execution_id] = container
+                await self._io(lifecycle.set_sandbox, db, execution_id, container.id)
+
+            with metrics.stage('exec_start'):
+                exec_id = await self.docker.exec_create(container.id, prep.argv, prep.env)
+            redactor = RedactionEngine(prep.secrets)
+            ingestor = LogIngestor(db, execution_id, redactor)
+            timed_out = False
+            with metrics.stage('log_pump'):
+                pump = asyncio.ensure_future(self._pump(exec_id, ingestor))
+                try:
+                    await asyncio.wait_for(asyncio.shield(pump), prep.timeout_sec)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    self.timeouts += 1
+                    # end the output rather than cancel the pump mid-feed: it drains what is left to EOF
+                    await self.docker.kill(container.id)
+                    try:
+                        await asyncio.wait_for(pump, KILL_DRAIN_SEC)
+                    except asyncio.TimeoutError:
+                        pass
+                finally:
+                    if not pump.done():
+                        pump.cancel()
+                    # the pump never returns with a feed in flight, so close runs alone
+                    await asyncio.gather(pump, return_exceptions=True)
+                    await self._io(ingestor.close)
+
+            with metrics.stage('finalize'):
+                exit_code = await self.docker.exec_exit_code(exec_id)
+                await self._io(lifecycle.finish, db, execution_id, exit_code, timed_out, redactor.applied)
+            with metrics.stage('artifacts'):
+                await self._io(lifecycle.store_artifacts, db, sandbox.DockerSandbox(container), execution_id)
+        except Exception as e:
+            self.errors += 1
+            await self._io(lifecycle.fail, db, execution_id, e)
+        finally:
+            with metrics.stage('release'):
+                if container is not None:
+                    await self._io(pool.release, container)
+                await self._io(db.close)
+                await self._io(lifecycle.released, execution_id)
+            self._inflight.pop(execution_id, None)
+            self.running -= 1
+            metrics.EXECUTIONS_RUNNING.dec()
+
+    async def _pump(self, exec_id: str, ingestor: LogIngestor):
+        frames = self.docker.exec_frames(exec_id)
+        nxt = None
+        io = None  # blocking ingestor call on the io pool; shielded, and waited for even when cancelled
+        try:
+            while True:
+                if nxt is None:
+                    nxt = asyncio.ensure_future(frames.__anext__())
+                done, _ = await asyncio.wait({nxt}, timeout=ingestor.flush_interval)
+                if not done:
+                    # quiet script: still flush partial chunks so followers see them
+                    io = asyncio.ensure_future(self._io(ingestor.tick))
+                    await asyncio.shield(io)
+                    continue
+                fut, nxt = nxt, None
+                try:
+                    stream, data = fut.result()
+                except StopAsyncIteration:
+                    return
+                io = asyncio.ensure_future(self._io(ingestor.feed, stream, data))
+                await asyncio.shield(io)
+        finally:
+            if io is not None and not io.done():
+                await asyncio.wait({io})
+            if nxt is not None:
+                nxt.cancel()
+                await asyncio.gather(nxt, return_exceptions=True)
+            await frames.aclose()
+
+    def shutdown(self, grace: float | None = None):
+        """Wait up to ``grace`` seconds for in-flight executions, then stop the loop.
+
+        Whatever is still in flight after that is failed and its container
+        destroyed here, rather than left ``running`` with nobody watching it.
+        """
+        loop = self._loop
+        if loop is None or os.getpid() != self._pid:
+            return
+        grace = settings.ASYNC_ENGINE_SHUTDOWN_GRACE_SEC if grace is None else grace
+        deadline = loop.time() + grace
+        while self._inflight and loop.time() < deadline:
+            threading.Event().wait(0.2)
+        loop.call_soon_threadsafe(loop.stop)
+        self._blocking.shutdown(wait=False)
+        for execution_id, container in list(self._inflight.items()):
+            if container is not None:
+                pool.release(container)
+            db = SessionLocal()
+            try:
+                lifecycle.fail(db, execution_id, RuntimeError(f"Worker shut down after {grace:g}s before the execution finished"))
+            except Exception:
+                pass  # reap_orphans settles it when the node starts again
+            finally:
+                db.close()
+            lifecycle.released(execution_id)
+        self._inflight.clear()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "started": self.started,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+engine = AsyncEngine()
+
+
+@worker_process_shutdown.connect
+def _stop_engine(**kwargs):
+    engine.shutdown()
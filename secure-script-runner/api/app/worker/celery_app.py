@@ -1,5 +1,11 @@
 from celery import Celery
 from app.config import settings
 
-celery = Celery('secure_script_runner', broker=settings.REDIS_URL, backend=settings.REDIS_URL)
+celery = Celery('secure_script_runner', broker=settings.REDIS_URL, backend=settings.REDIS_URL, include=['app.tasks'])
 celery.conf.update(task_serializer='json', result_serializer='json', accept_content=['json'])
+celery.conf.beat_schedule = {
+    'maintain-log-partitions': {'task': 'app.tasks.maintain_log_partitions', 'schedule': 3600.0},
+    'compact-pending-logs': {'task': 'app.tasks.compact_pending_logs', 'schedule': 600.0},
+    'sweep-retention': {'task': 'app.tasks.sweep_retention', 'schedule': settings.RETENTION_SWEEP_INTERVAL_SEC},
+    'dispatch-executions': {'task': 'app.tasks.dispatch_executions', 'schedule': settings.SCHED_DISPATCH_INTERVAL_SEC},
+}
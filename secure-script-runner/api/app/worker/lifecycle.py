@@ -0,0 +1,136 @@
+"""Database side of one execution, shared by the prefork task and the async engine."""
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Execution, ExecStatus, ExecutionArtifact, TERMINAL_STATUSES
+from app.services.module_spec import compiled_modules
+from app.services.entity_cache import get_module
+from app.services.events import publish_status
+from app.services import memo, metrics
+from app.services.retention import artifact_expiry
+from app.services.scheduler import scheduler
+from app.worker.celery_app import celery
+from app.worker.node import node_name
+
+
+@dataclass
+class Prepared:
+    argv: list[str]
+    env: dict[str, str]
+    secrets: list[str]
+    cpu_limit: float
+    mem_limit_mb: int
+    timeout_sec: int
+    sandbox_backend: str = 'docker'
+
+
+# Every step ends with a commit and reads nothing afterwards: touching an expired
+# attribute would open a new transaction and pin a pooled connection while the
+# script runs, which exhausts the pool once many executions share a process.
+
+def start(db: Session, execution_id: int, params: dict) -> Prepared | None:
+    """Claim a queued execution for this node; None if it is no longer ours to run.
+
+    A message can outlive its placement: the scheduler requeues executions of a
+    node that stopped heartbeating, or fails them, and the node may come back
+    and still consume the old message.
+    """
+    node = node_name()
+    now = datetime.utcnow()
+    claimed = db.query(Execution).filter(
+        Execution.id == execution_id, Execution.status == ExecStatus.queued.value,
+        or_(Execution.worker_id.is_(None), Execution.worker_id == node),
+    ).update({"status": ExecStatus.running.value, "started_at": now, "worker_id": node}, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        return None
+    module_id, lane, queued_at = db.query(Execution.module_id, Execution.lane, Execution.queued_at).filter_by(id=execution_id).one()
+    if queued_at is not None:
+        metrics.QUEUE_WAIT_SECONDS.labels(lane).observe(max((now - queued_at).total_seconds(), 0.0))
+    m = get_module(db, module_id)
+    cm = compiled_modules.get(m)
+    # the API validated already; checked again here since the task args are only as trusted as the broker
+    params = cm.validate(params)
+    prep = Prepared(cm.argv(params), cm.env(params), cm.secrets(params), m.cpu_limit, m.mem_limit_mb, m.timeout_sec, m.sandbox_backend)
+    metrics.commit(db, 'start')
+    publish_status(execution_id, ExecStatus.running.value)
+    if settings.SCHEDULER_ENABLED:
+        try:
+            scheduler.started(execution_id)
+        except Exception:
+            pass  # the record goes with the allocation on release
+    return prep
+
+
+def set_sandbox(db: Session, execution_id: int, sandbox_id: str):
+    db.query(Execution).filter_by(id=execution_id).update({"sandbox_id": sandbox_id[:12]})
+    metrics.commit(db, 'sandbox')
+
+
+def finish(db: Session, execution_id: int, exit_code: int | None, timed_out: bool, redactions_applied: bool):
+    ex = db.query(Execution).get(execution_id)
+    ex.redactions_applied = redactions_applied
+    ex.exit_code = exit_code if exit_code is not None else 1
+    ex.finished_at = datetime.utcnow()
+    if timed_out:
+        status = ExecStatus.timeout.value
+    else:
+        status = ExecStatus.succeeded.value if exit_code == 0 else ExecStatus.failed.value
+    ex.status = status
+    if ex.started_at is not None:
+        ex.runtime_sec = (ex.finished_at - ex.started_at).total_seconds()
+    # read before the commit (see above)
+    runtime = ex.runtime_sec
+    memo_key = ex.memo_key if status == ExecStatus.succeeded.value else None
+    m = get_module(db, ex.module_id) if memo_key else None
+    metrics.commit(db, 'finish')
+    metrics.EXECUTIONS_FINISHED.labels(status).inc()
+    if runtime is not None:
+        metrics.RUNTIME_SECONDS.labels(status).observe(runtime)
+    publish_status(execution_id, status)
+    if m is not None and m.cacheable:
+        memo.store(m.id, memo_key, execution_id, m.cache_ttl_sec)
+    if settings.LOG_ARCHIVE_ENABLED:
+        # after a grace period so live followers finish reading from the table
+        try:
+            celery.send_task('app.tasks.compact_execution_logs', args=[execution_id], countdown=settings.LOG_ARCHIVE_DELAY_SEC)
+        except Exception:
+            pass  # compact_pending_logs picks it up
+
+
+def store_artifacts(db: Session, sandbox, execution_id: int):
+    # Collect artifacts: everything the script left in <workdir>/artifacts
+    try:
+        for art in sandbox.collect_artifacts(execution_id):
+            db.add(ExecutionArtifact(execution_id=execution_id, filename=art.filename, size_bytes=art.size_bytes, content_type=art.content_type, checksum_sha256=art.sha256, storage_key=art.key, retention_until=artifact_expiry()))
+        metrics.commit(db, 'artifacts')
+    except Exception:
+        db.rollback()
+
+
+def fail(db: Session, execution_id: int, e: Exception):
+    db.rollback()
+    ex = db.query(Execution).get(execution_id)
+    # an execution that already ended (or was failed by the scheduler) keeps its outcome
+    if ex and ex.status not in TERMINAL_STATUSES:
+        ex.status = ExecStatus.failed.value
+        ex.error_summary = str(e)
+        ex.finished_at = datetime.utcnow()
+        if ex.started_at is not None:
+            ex.runtime_sec = (ex.finished_at - ex.started_at).total_seconds()
+        metrics.commit(db, 'fail')
+        metrics.EXECUTIONS_FINISHED.labels(ExecStatus.failed.value).inc()
+        publish_status(execution_id, ExecStatus.failed.value)
+
+
+def released(execution_id: int):
+    """Give the execution's capacity back to the scheduler and admit what now fits."""
+    if not settings.SCHEDULER_ENABLED:
+        return
+    try:
+        scheduler.release(execution_id)
+        scheduler.dispatch()
+    except Exception:
+        pass  # the periodic dispatch pass catches up
@@ -0,0 +1,29 @@
+"""Prometheus endpoint for a worker node, run as a sidecar next to ``celery worker``.
+
+The worker's prefork children write samples to ``PROMETHEUS_MULTIPROC_DIR``
+(shared with this process); the exporter serves their aggregate so scraping
+never touches a child that is busy running scripts. It needs no application
+settings, only the directory and ``WORKER_METRICS_PORT`` (default 9808).
+
+    PROMETHEUS_MULTIPROC_DIR=/var/run/ssr-metrics python -m app.worker.metrics_exporter
+"""
+import os
+import time
+
+
+def main():
+    from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        raise SystemExit("PROMETHEUS_MULTIPROC_DIR must point at the worker's metrics directory")
+    os.makedirs(path, exist_ok=True)
+    # only the aggregate of the children's files: importing app.services.metrics here would add this process's own
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(int(os.environ.get('WORKER_METRICS_PORT', '9808')), registry=registry)
+    while True:
+        time.sleep(3600)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import socket
+import threading
+from celery.signals import celeryd_after_setup, worker_init, worker_process_shutdown, worker_shutdown
+from app.config import settings
+from app.services.scheduler import scheduler, worker_queue
+
+# Each worker node consumes its own queue so the scheduler can place an
+# execution on a specific host, and advertises that host's capacity. On start
+# it settles executions a previous run of the node left behind.
+
+_node: dict = {}
+_stop = threading.Event()
+
+
+def host_capacity(concurrency: int) -> tuple[float, int, int]:
+    cpu = settings.WORKER_CPU or float(os.cpu_count() or 1)
+    if settings.WORKER_MEM_MB:
+        mem_mb = settings.WORKER_MEM_MB
+    else:
+        total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+        mem_mb = int(total * 0.8)  # leave headroom for the worker itself and the OS
+    if settings.WORKER_SLOTS:
+        slots = settings.WORKER_SLOTS
+    elif settings.EXECUTION_ENGINE == 'async':
+        slots = concurrency * settings.ASYNC_ENGINE_MAX_CONCURRENCY
+    else:
+        slots = concurrency
+    return cpu, mem_mb, slots
+
+
+def node_name() -> str:
+    """This worker's node name (the hostname outside a worker, e.g. scripts and benchmarks)."""
+    return _node.get('name') or socket.gethostname()
+
+
+def _heartbeat_loop():
+    while not _stop.wait(settings.SCHED_HEARTBEAT_SEC):
+        try:
+            scheduler.heartbeat(_node['name'], *_node['capacity'])
+        except Exception:
+            pass
+
+
+@celeryd_after_setup.connect
+def _register_node(sender, instance, **kwargs):
+    instance.app.amqp.queues.select_add(worker_queue(sender))
+    _node['name'] = sender
+    _node['capacity'] = host_capacity(instance.concurrency or 1)
+    try:
+        from app.worker.sandbox import reap_orphans
+        reap_orphans(sender)
+    except Exception:
+        pass  # retried on the next start; the scheduler fails them if this node stays away
+    try:
+        scheduler.heartbeat(sender, *_node['capacity'])
+    except Exception:
+        pass
+    threading.Thread(target=_heartbeat_loop, name='sched-heartbeat', daemon=True).start()
+
+
+@worker_shutdown.connect
+def _unregister_node(**kwargs):
+    _stop.set()
+    if _node:
+        try:
+            scheduler.remove_worker(_node['name'])
+        except Exception:
+            pass
+
+
+@worker_init.connect
+def _reset_metric_samples(**kwargs):
+    # multiprocess metric files of a previous worker run would be summed forever
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path and os.path.isdir(path):
+        for name in os.listdir(path):
+            full = os.path.join(path, name)
+            if os.path.isdir(full):
+                shutil.rmtree(full, ignore_errors=True)
+            else:
+                os.unlink(full)
+
+
+@worker_process_shutdown.connect
+def _mark_metrics_dead(pid=None, **kwargs):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,174 @@
+import os, socket, threading
+from concurrent.futures import ThreadPoolExecutor
+import docker  # type: ignore
+from celery.signals import worker_process_init, worker_process_shutdown
+from app.config import settings
+from app.services import metrics
+
+# Single-use runners execute in /work, which the runner image chowns to uid 1000.
+POOL_WORKDIR = "/work"
+RUNNER_USER = "1000:1000"
+
+
+class ContainerPool:
+    """Per-process pool of pre-created runner containers, keyed by limits profile.
+
+    Containers are started idle (no network, non-root, scripts mounted read-only,
+    cpu/mem limits applied) and each one is handed to exactly one execution,
+    which runs its argv through ``exec``. After use a container is destroyed,
+    never reused; the pool refills ahead in the background up to
+    ``RUNNER_POOL_SIZE`` per profile and ``RUNNER_POOL_MAX_IDLE`` overall.
+    """
+
+    def __init__(self, size: int | None = None, max_idle: int | None = None):
+        self.size = settings.RUNNER_POOL_SIZE if size is None else size
+        self.max_idle = settings.RUNNER_POOL_MAX_IDLE if max_idle is None else max_idle
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._client = None
+        self._idle: dict[tuple, list] = {}
+        self._creating: dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self._refiller = ThreadPoolExecutor(max_workers=1, thread_name_prefix='runner-pool')
+        self.owner = f"{socket.gethostname()}:{self._pid}"
+        self.hits = self.misses = self.created = self.destroyed = self.errors = 0
+
+    def _check_fork(self):
+        # Docker clients and threads do not survive a fork (Celery prefork children).
+        if os.getpid() != self._pid:
+            self._reset()
+
+    @property
+    def client(self):
+        self._check_fork()
+        if self._client is None:
+            self._client = docker.from_env()
+        return self._client
+
+    @staticmethod
+    def profile(cpu_limit: float, mem_limit_mb: int) -> tuple:
+        return (float(cpu_limit or settings.DEFAULT_CPU_LIMIT), int(mem_limit_mb or settings.DEFAULT_MEM_LIMIT_MB))
+
+    def _create(self, key: tuple):
+        cpu, mem_mb = key
+        c = self.client.containers.run(
+            settings.RUNNER_IMAGE,
+            ["exec sleep infinity"],
+            user=RUNNER_USER,
+            network_mode='none',
+            working_dir=POOL_WORKDIR,
+            detach=True,
+            volumes={
+                os.getcwd() + '/scripts': {'bind': settings.SCRIPT_BASE, 'mode': 'ro'},
+            },
+            mem_limit=mem_mb * 1024 * 1024,
+            nano_cpus=int(cpu * 1e9),
+            stdin_open=False,
+            tty=False,
+            labels={'ssr.pool': self.owner},
+        )
+        self.created += 1
+        return c
+
+    def acquire(self, cpu_limit: float, mem_limit_mb: int):
+        self._check_fork()
+        key = self.profile(cpu_limit, mem_limit_mb)
+        container = None
+        while container is None:
+            with self._lock:
+                idle = self._idle.get(key)
+                c = idle.pop() if idle else None
+            if c is None:
+                break
+            try:
+                c.reload()
+                if c.status == 'running':
+                    container = c
+                    continue
+            except Exception:
+                pass
+            self.release(c)
+        if container is not None:
+            self.hits += 1
+            metrics.POOL_ACQUIRE.labels('hit').inc()
+        else:
+            self.misses += 1
+            metrics.POOL_ACQUIRE.labels('miss').inc()
+            container = self._create(key)
+        self.prefill(key)
+        return container
+
+    def release(self, container):
+        """Destroy a container handed out by ``acquire`` (or a stale idle one)."""
+        try:
+            container.remove(force=True)
+        except Exception:
+            pass
+        self.destroyed += 1
+
+    def prefill(self, key: tuple):
+        with self._lock:
+            want = self.size - len(self._idle.get(key, ())) - self._creating.get(key, 0)
+            room = self.max_idle - sum(len(v) for v in self._idle.values()) - sum(self._creating.values())
+            n = max(0, min(want, room))
+            if n:
+                self._creating[key] = self._creating.get(key, 0) + n
+        for _ in range(n):
+            self._refiller.submit(self._refill_one, key)
+
+    def _refill_one(self, key: tuple):
+        try:
+            c = self._create(key)
+        except Exception:
+            self.errors += 1
+            c = None
+        with self._lock:
+            self._creating[key] -= 1
+            if c is not None:
+                self._idle.setdefault(key, []).append(c)
+
+    def exec(self, container, argv: list[str], environment: dict[str, str]):
+        """Start ``argv`` in ``container``; returns the exec id and a demuxed frame stream."""
+        api = self.client.api
+        exec_id = api.exec_create(container.id, argv, stdout=True, stderr=True, environment=environment, workdir=POOL_WORKDIR, user=RUNNER_USER)['Id']
+        return exec_id, api.exec_start(exec_id, stream=True, demux=True)
+
+    def exit_code(self, exec_id: str) -> int | None:
+        return self.client.api.exec_inspect(exec_id).get('ExitCode')
+
+    def drain(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for containers in idle.values():
+            for c in containers:
+                self.release(c)
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = {f"{k[0]}cpu/{k[1]}mb": len(v) for k, v in self._idle.items()}
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+            "created": self.created,
+            "destroyed": self.destroyed,
+            "errors": self.errors,
+            "idle": idle,
+        }
+
+
+pool = ContainerPool()
+
+
+@worker_process_init.connect
+def _warm_pool(**kwargs):
+    if pool.size:
+        pool.prefill(pool.profile(settings.DEFAULT_CPU_LIMIT, settings.DEFAULT_MEM_LIMIT_MB))
+
+
+@worker_process_shutdown.connect
+def _drain_pool(**kwargs):
+    pool.drain()
@@ -0,0 +1,309 @@
+"""Sandbox backends: where a module's argv actually runs.
+
+A backend hands out one single-use ``Sandbox`` per execution. ``start``
+returns demultiplexed ``(stdout, stderr)`` frames for ``pump_frames``, ``kill``
+ends them (the deadline watchdog calls it), and ``destroy`` removes everything
+the execution left behind. Modules pick a backend with ``sandbox_backend``;
+a worker only runs the ones listed in ``SANDBOX_BACKENDS``.
+"""
+import abc
+import ctypes
+import os
+import resource
+import selectors
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Execution, ExecStatus, Module
+from app.services import metrics
+from app.services.artifacts import collect_artifacts, collect_directory
+from app.services.log_ingest import LogIngestor, pump_frames
+from app.services.redaction import RedactionEngine
+from app.worker import lifecycle
+from app.worker.pool import pool, POOL_WORKDIR
+
+CLONE_NEWNET = 0x40000000
+CLONE_NEWUSER = 0x10000000
+LOCAL_PATH = '/usr/local/bin:/usr/bin:/bin'
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def enabled_backends() -> set[str]:
+    return {b.strip() for b in settings.SANDBOX_BACKENDS.split(',') if b.strip()}
+
+
+class Sandbox(abc.ABC):
+    id: str
+
+    @abc.abstractmethod
+    def start(self, argv: list[str], env: dict[str, str]):
+        """Run ``argv``; returns an iterator of ``(stdout, stderr)`` byte frames."""
+
+    @abc.abstractmethod
+    def kill(self):
+        ...
+
+    @abc.abstractmethod
+    def exit_code(self) -> int | None:
+        ...
+
+    @abc.abstractmethod
+    def collect_artifacts(self, execution_id: int):
+        ...
+
+    @abc.abstractmethod
+    def destroy(self):
+        ...
+
+
+class DockerSandbox(Sandbox):
+    """A pre-created runner container from the per-process pool."""
+
+    def __init__(self, container):
+        self.container = container
+        self.id = container.id
+        self._exec_id = None
+
+    def start(self, argv, env):
+        self._exec_id, frames = pool.exec(self.container, argv, env)
+        return frames
+
+    def kill(self):
+        self.container.kill()
+
+    def exit_code(self):
+        return pool.exit_code(self._exec_id)
+
+    def collect_artifacts(self, execution_id):
+        return collect_artifacts(self.container, f"{POOL_WORKDIR}/artifacts", execution_id)
+
+    def destroy(self):
+        pool.release(self.container)
+
+
+class DockerBackend:
+    name = 'docker'
+
+    def create(self, execution_id: int, cpu_limit: float, mem_limit_mb: int, timeout_sec: int) -> DockerSandbox:
+        return DockerSandbox(pool.acquire(cpu_limit, mem_limit_mb))
+
+
+class ProcessSandbox(Sandbox):
+    """A child process of the worker in a private temp workdir, with no network.
+
+    Limits come from rlimits (address space, cpu seconds, file size, no core
+    dumps, and process count when running as ``LOCAL_SANDBOX_UID``) and, when
+    ``LOCAL_SANDBOX_CGROUP`` names a delegated cgroup v2 directory, a
+    per-execution cgroup with ``cpu.max``, ``memory.max`` and ``pids.max``
+    that is also used to kill every descendant. The script runs
+    in its own session and network namespace, as ``LOCAL_SANDBOX_UID`` when
+    the worker is root. Meant for trusted, short-lived modules: it shares the
+    worker's kernel, filesystem view and installed interpreters.
+    """
+
+    def __init__(self, execution_id: int, cpu_limit: float, mem_limit_mb: int, timeout_sec: int):
+        self.workdir = tempfile.mkdtemp(prefix=f"ssr-{execution_id}-", dir=settings.LOCAL_SANDBOX_ROOT)
+        self.id = os.path.basename(self.workdir)
+        self.cpu_limit = float(cpu_limit or settings.DEFAULT_CPU_LIMIT)
+        self.mem_limit_mb = int(mem_limit_mb or settings.DEFAULT_MEM_LIMIT_MB)
+        self.timeout_sec = timeout_sec
+        self.proc: subprocess.Popen | None = None
+        self.cgroup = None
+        self._procs_fd = None
+        os.makedirs(os.path.join(self.workdir, 'artifacts'))
+        os.makedirs(os.path.join(self.workdir, 'tmp'))
+        self._as_root = os.geteuid() == 0
+        if self._as_root:
+            for root, dirs, _ in os.walk(self.workdir):
+                for d in [root] + [os.path.join(root, x) for x in dirs]:
+                    os.chown(d, settings.LOCAL_SANDBOX_UID, settings.LOCAL_SANDBOX_GID)
+        if settings.LOCAL_SANDBOX_CGROUP:
+            self.cgroup = os.path.join(settings.LOCAL_SANDBOX_CGROUP, self.id)
+            os.mkdir(self.cgroup)
+            self._cg_write('cpu.max', f"{int(self.cpu_limit * 100000)} 100000")
+            self._cg_write('memory.max', str(self.mem_limit_mb * 1024 * 1024))
+            if os.path.exists(os.path.join(self.cgroup, 'pids.max')):
+                self._cg_write('pids.max', str(settings.LOCAL_SANDBOX_MAX_PROCS))
+            self._procs_fd = os.open(os.path.join(self.cgroup, 'cgroup.procs'), os.O_WRONLY)
+
+    def _cg_write(self, name: str, value: str):
+        with open(os.path.join(self.cgroup, name), 'w') as f:
+            f.write(value)
+
+    def _confine(self):
+        # runs in the child between fork and exec: plain syscalls only, nothing that may take a lock
+        os.setsid()
+        if self._procs_fd is not None:
+            os.write(self._procs_fd, b'0')  # "0" moves the writing process
+        flags = CLONE_NEWNET if self._as_root else CLONE_NEWNET | CLONE_NEWUSER
+        if _libc.unshare(flags) != 0:
+            raise OSError(ctypes.get_errno(), 'unshare(CLONE_NEWNET) failed; the process sandbox needs a network namespace')
+        mem = self.mem_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+        cpu = int(self.timeout_sec * max(self.cpu_limit, 1.0)) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+        fsize = settings.LOCAL_SANDBOX_MAX_FILE_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        if self._as_root:
+            # RLIMIT_NPROC counts every process of the real uid, so it only bounds the script once it has a uid of
+            # its own (shared by the sandboxes running at once); as the worker's uid it would count the worker too
+            resource.setrlimit(resource.RLIMIT_NPROC, (settings.LOCAL_SANDBOX_MAX_PROCS, settings.LOCAL_SANDBOX_MAX_PROCS))
+            os.setgroups([])
+            os.setgid(settings.LOCAL_SANDBOX_GID)
+            os.setuid(settings.LOCAL_SANDBOX_UID)
+
+    def start(self, argv, env):
+        base = {'PATH': LOCAL_PATH, 'HOME': self.workdir, 'TMPDIR': os.path.join(self.workdir, 'tmp'), 'LANG': 'C.UTF-8'}
+        try:
+            self.proc = subprocess.Popen(argv, cwd=self.workdir, env={**base, **env}, stdin=subprocess.DEVNULL,
+                                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True, preexec_fn=self._confine)
+        finally:
+            if self._procs_fd is not None:
+                os.close(self._procs_fd)
+                self._procs_fd = None
+        return self._frames()
+
+    def _frames(self):
+        sel = selectors.DefaultSelector()
+        sel.register(self.proc.stdout, selectors.EVENT_READ, 0)
+        sel.register(self.proc.stderr, selectors.EVENT_READ, 1)
+        try:
+            while sel.get_map():
+                for key, _ in sel.select():
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        sel.unregister(key.fileobj)
+                    elif key.data:
+                        yield None, data
+                    else:
+                        yield data, None
+        finally:
+            sel.close()
+            self.proc.stdout.close()
+            self.proc.stderr.close()
+
+    def kill(self):
+        if self.cgroup and os.path.exists(os.path.join(self.cgroup, 'cgroup.kill')):
+            try:
+                self._cg_write('cgroup.kill', '1')
+            except OSError:
+                pass
+        if self.proc is not None:
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    def exit_code(self):
+        code = self.proc.wait()
+        # match the container convention: 128 + signal number
+        return code if code >= 0 else 128 - code
+
+    def collect_artifacts(self, execution_id):
+        return collect_directory(os.path.join(self.workdir, 'artifacts'), execution_id)
+
+    def destroy(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.kill()
+            self.proc.wait()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+        if self._procs_fd is not None:
+            os.close(self._procs_fd)
+        if self.cgroup:
+            try:
+                os.rmdir(self.cgroup)
+            except OSError:
+                pass
+
+
+class ProcessBackend:
+    name = 'process'
+
+    def create(self, execution_id: int, cpu_limit: float, mem_limit_mb: int, timeout_sec: int) -> ProcessSandbox:
+        return ProcessSandbox(execution_id, cpu_limit, mem_limit_mb, timeout_sec)
+
+
+BACKENDS = {'docker': DockerBackend(), 'process': ProcessBackend()}
+
+
+def backend(name: str | None):
+    name = name or 'docker'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown sandbox backend {name!r}")
+    if name not in enabled_backends():
+        raise ValueError(f"Sandbox backend {name!r} is not enabled on this worker (SANDBOX_BACKENDS)")
+    return BACKENDS[name]
+
+
+def run(db, execution_id: int, prep):
+    """Run a started execution to its end in a sandbox of its module's backend (blocking)."""
+    box = None
+    try:
+        with metrics.stage('container_acquire'):
+            box = backend(prep.sandbox_backend).create(execution_id, prep.cpu_limit, prep.mem_limit_mb, prep.timeout_sec)
+            lifecycle.set_sandbox(db, execution_id, box.id)
+
+        with metrics.stage('exec_start'):
+            frames = box.start(prep.argv, prep.env)
+        redactor = RedactionEngine(prep.secrets)
+        ingestor = LogIngestor(db, execution_id, redactor)
+        with metrics.stage('log_pump'):
+            try:
+                finished = pump_frames(frames, ingestor, time.time() + prep.timeout_sec, box.kill)
+            finally:
+                ingestor.close()
+
+        with metrics.stage('finalize'):
+            lifecycle.finish(db, execution_id, box.exit_code(), not finished, redactor.applied)
+        with metrics.stage('artifacts'):
+            lifecycle.store_artifacts(db, box, execution_id)
+    finally:
+        if box is not None:
+            with metrics.stage('release'):
+                box.destroy()
+
+
+def reap_orphans(node: str) -> int:
+    """Fail what this node left running and destroy its sandboxes; returns how many.
+
+    Called when the worker starts, before it consumes anything, so every
+    execution still marked running on this node was orphaned by a crash or a
+    shutdown that outlasted its grace period.
+    """
+    db = SessionLocal()
+    try:
+        rows = (db.query(Execution.id, Execution.sandbox_id, Module.sandbox_backend)
+                .join(Module, Module.id == Execution.module_id)
+                .filter(Execution.status == ExecStatus.running.value, Execution.worker_id == node).all())
+        for execution_id, sandbox_id, backend_name in rows:
+            if sandbox_id:
+                _destroy_orphan(backend_name or 'docker', sandbox_id)
+            lifecycle.fail(db, execution_id, RuntimeError(f"Worker {node} restarted while the execution was running"))
+            lifecycle.released(execution_id)
+        return len(rows)
+    finally:
+        db.close()
+
+
+def _destroy_orphan(backend_name: str, sandbox_id: str):
+    try:
+        if backend_name == 'docker':
+            pool.client.containers.get(sandbox_id).remove(force=True)
+            return
+        if settings.LOCAL_SANDBOX_CGROUP:
+            cgroup = os.path.join(settings.LOCAL_SANDBOX_CGROUP, sandbox_id)
+            if os.path.exists(os.path.join(cgroup, 'cgroup.kill')):
+                with open(os.path.join(cgroup, 'cgroup.kill'), 'w') as f:
+                    f.write('1')
+            try:
+                os.rmdir(cgroup)
+            except OSError:
+                pass
+        shutil.rmtree(os.path.join(settings.LOCAL_SANDBOX_ROOT or tempfile.gettempdir(), sandbox_id), ignore_errors=True)
+    except Exception:
+        pass  # already gone
@@ -0,0 +1,82 @@
+"""Latency of GET /api/modules/exec/{id}/artifacts for an execution with many artifacts.
+
+Links are presigned per request with the real boto3 client (signing is
+local, no bucket needed): the first listing signs every key, later ones are
+served from the URL cache until the links near expiry. Fails if a warm
+listing is not at least ``--min-speedup`` times faster than a cold one.
+
+    cd api && python -m bench.artifact_urls --artifacts 500 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import bench.common
+
+os.environ.setdefault('S3_ENDPOINT_URL', 'http://minio:9000')
+os.environ.setdefault('S3_ACCESS_KEY', 'bench')
+os.environ.setdefault('S3_SECRET_KEY', 'bench')
+
+
+def seed(n: int) -> int:
+    from app.database import SessionLocal
+    from app.models import Execution, ExecutionArtifact
+    from bench.e2e import seed as seed_module
+    module_id = seed_module(1.0, 256)
+    db = SessionLocal()
+    e = Execution(module_id=module_id, trigger_user_id=1, status='succeeded')
+    db.add(e)
+    db.flush()
+    # every tenth row predates stored keys and falls back to the derived one
+    db.add_all([ExecutionArtifact(execution_id=e.id, filename=f"out-{i}.bin", size_bytes=1024, content_type='application/octet-stream',
+                                  storage_key=None if i % 10 == 0 else f"exec/{e.id}/out-{i}.bin") for i in range(n)])
+    db.commit()
+    exec_id = e.id
+    db.close()
+    return exec_id
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--artifacts', type=int, default=500)
+    ap.add_argument('--requests', type=int, default=200)
+    ap.add_argument('--min-speedup', type=float, default=5.0)
+    args = ap.parse_args()
+    bench.common.setup_db()
+    from app.main import app
+    from app.database import dispose_async_engine
+    from app.services.storage import url_cache
+    from bench.e2e import summary
+    exec_id = seed(args.artifacts)
+
+    async def drive():
+        import httpx
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as client:
+            async def get() -> tuple[float, list]:
+                t0 = time.perf_counter()
+                resp = await client.get(f'/api/modules/exec/{exec_id}/artifacts', headers={'X-Demo-User': 'bench@example.com'})
+                resp.raise_for_status()
+                return time.perf_counter() - t0, resp.json()
+
+            cold, body = await get()
+            warm = [(await get())[0] for _ in range(args.requests)]
+        await dispose_async_engine()
+        return cold, warm, body
+
+    cold, warm, body = asyncio.run(drive())
+    assert len(body) == args.artifacts and all('X-Amz-Signature=' in a['url'] for a in body), body[:2]
+    out = {
+        "artifacts": args.artifacts,
+        "cold_ms": round(cold * 1000, 2),
+        "warm": summary(warm),
+        "url_cache": {"hits": url_cache.hits, "misses": url_cache.misses},
+    }
+    out["speedup"] = round(out["cold_ms"] / out["warm"]["p50_ms"], 1)
+    print(json.dumps(out, indent=2))
+    if out["speedup"] < args.min_speedup:
+        raise SystemExit(f"warm listing only {out['speedup']}x faster than cold")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Script tree rescan: serial 8 KB hashing vs. the parallel scanner, cold and warm.
+
+    cd api && python -m bench.checksum --files 50000 --kb 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+import bench.common  # noqa: F401  (env defaults)
+
+
+def legacy_sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(8192), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_tree(root: str, files: int, kb: int):
+    payload = os.urandom(kb * 1024)
+    for i in range(files):
+        d = os.path.join(root, f"team{i % 50:02d}", f"svc{i % 17:02d}")
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f"job{i}.sh"), 'wb') as f:
+            f.write(b"#!/bin/bash\n# %d\n" % i + payload)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--files', type=int, default=50000)
+    ap.add_argument('--kb', type=int, default=4)
+    args = ap.parse_args()
+    from app.services import checksum
+    # measure the local cache only
+    checksum.ChecksumCache._load = lambda self, paths: None
+    checksum.ChecksumCache._store = lambda self, entries: self._local.update(entries)
+
+    root = tempfile.mkdtemp(prefix='ssr-bench-scripts-')
+    make_tree(root, args.files, args.kb)
+
+    t0 = time.perf_counter()
+    legacy = {}
+    for dirpath, _, names in os.walk(root):
+        for n in names:
+            p = os.path.join(dirpath, n)
+            legacy[p] = legacy_sha256_file(p)
+    t_legacy = time.perf_counter() - t0
+
+    cold = checksum.scan_tree(root)
+    warm = checksum.scan_tree(root)
+    assert {p: d for p, (d, _) in cold.files.items()} == legacy
+    print(json.dumps({
+        "files": args.files,
+        "kb_per_file": args.kb,
+        "serial_8k_seconds": round(t_legacy, 3),
+        "parallel_cold_seconds": round(cold.seconds, 3),
+        "warm_rescan_seconds": round(warm.seconds, 3),
+        "warm_cache_hits": sum(1 for _, c in warm.files.values() if c),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# Benchmarks run against a throwaway SQLite database unless DATABASE_URL is set.
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ.setdefault('REDIS_URL', 'redis://localhost:6379/15')
+# (with a long busy timeout: concurrent writers otherwise fail with "database is locked")
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='ssr-bench-'), 'bench.db') + '?timeout=60')
+
+
+def setup_db():
+    from app.database import Base, engine
+    import app.models  # noqa: F401  (register tables)
+    Base.metadata.create_all(bind=engine)
+    return engine
@@ -0,0 +1,296 @@
+"""End-to-end executions/sec: POST /execute through the worker task to a finished row.
+
+Drives the real FastAPI app over ASGI and the real ``run_execution`` task
+(scheduler, lifecycle, log ingest, artifact upload) with only the edges
+replaced: the Celery broker hop by an in-process queue drained by
+``--workers`` threads, Docker by a stand-in whose scripts print ``--lines``
+lines over ``--run-ms`` and leave ``--artifacts`` files, S3 by an in-memory
+bucket, and Redis by fakeredis unless ``--redis-url`` is given. Point
+DATABASE_URL at PostgreSQL for numbers that mean anything; the SQLite default
+serialises every commit.
+
+    cd api && python -m bench.e2e --executions 500 --concurrency 50 --workers 8 --lines 2000
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import queue
+import statistics
+import tarfile
+import threading
+import time
+import bench.common
+
+
+class FakeContainer:
+    _ids = itertools.count(1)
+
+    def __init__(self, archive: bytes):
+        self.id = f"{next(self._ids):064x}"
+        self.status = 'running'
+        self._archive = archive
+
+    def reload(self):
+        pass
+
+    def kill(self):
+        self.status = 'exited'
+
+    def remove(self, force=False):
+        self.status = 'removed'
+
+    def get_archive(self, path, chunk_size=None):
+        data, size = self._archive, chunk_size or len(self._archive) or 1
+        return (data[i:i + size] for i in range(0, len(data), size)), {}
+
+
+class FakeDockerAPI:
+    def __init__(self, lines: int, frame_lines: int, run_sec: float):
+        self.lines, self.frame_lines, self.run_sec = lines, frame_lines, run_sec
+        self._ids = itertools.count(1)
+
+    def exec_create(self, container_id, argv, **kwargs):
+        return {'Id': f"exec-{next(self._ids)}"}
+
+    def exec_start(self, exec_id, stream=True, demux=True):
+        line = b"[INFO] processed batch 00042 rows=1000 user=ops@example.com took=12ms\n"
+        frames = max(1, -(-self.lines // self.frame_lines))
+        pause = self.run_sec / frames
+        for i in range(0, max(self.lines, 1), self.frame_lines):
+            if pause:
+                time.sleep(pause)
+            frame = line * min(self.frame_lines, self.lines - i)
+            yield (None, frame) if i % (self.frame_lines * 10) == 0 else (frame, None)
+
+    def exec_inspect(self, exec_id):
+        return {'ExitCode': 0}
+
+
+class FakeDocker:
+    """The slice of docker-py that ``ContainerPool`` uses."""
+
+    def __init__(self, args):
+        self.api = FakeDockerAPI(args.lines, args.frame_lines, args.run_ms / 1000)
+        self.create_sec = args.create_ms / 1000
+        self.archive = artifact_archive(args.artifacts, args.artifact_kb)
+        self.containers = self
+
+    def run(self, *args, **kwargs):
+        if self.create_sec:
+            time.sleep(self.create_sec)
+        return FakeContainer(self.archive)
+
+
+def artifact_archive(count: int, kb: int) -> bytes:
+    buf = io.BytesIO()
+    payload = os.urandom(kb * 1024)
+    with tarfile.open(fileobj=buf, mode='w') as tar:
+        for i in range(count):
+            info = tarfile.TarInfo(f"artifacts/out-{i}.bin")
+            info.size = len(payload)
+            tar.addfile(info, io.BytesIO(payload))
+    return buf.getvalue()
+
+
+class FakeS3:
+    def __init__(self):
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def _count(self, body):
+        with self._lock:
+            self.bytes += len(body)
+
+    def put_object(self, Body=b'', **kwargs):
+        self._count(Body)
+        return {}
+
+    def create_multipart_upload(self, **kwargs):
+        return {'UploadId': 'bench'}
+
+    def upload_part(self, Body=b'', PartNumber=1, **kwargs):
+        self._count(Body)
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        return {}
+
+    def abort_multipart_upload(self, **kwargs):
+        return {}
+
+    def generate_presigned_url(self, op, Params=None, ExpiresIn=3600):
+        return f"http://bench/{Params['Key']}?expires={ExpiresIn}"
+
+
+def pct(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+
+def summary(values: list[float]) -> dict:
+    return {"p50_ms": pct(values, 0.50), "p95_ms": pct(values, 0.95), "p99_ms": pct(values, 0.99),
+            "mean_ms": round(statistics.fmean(values) * 1000, 2) if values else None}
+
+
+def seed(module_cpu: float, mem_mb: int) -> int:
+    from app.database import SessionLocal
+    from app.models import Module, ModuleAssignment, Script, User
+    from app.config import settings
+    db = SessionLocal()
+    user = User(name='bench', email='bench@example.com', role='admin')
+    script = Script(name='bench', path=settings.SCRIPT_BASE + '/bench.py', interpreter='python3', checksum='bench')
+    db.add_all([user, script])
+    db.flush()
+    m = Module(name='bench', script_id=script.id, timeout_sec=600, cpu_limit=module_cpu, mem_limit_mb=mem_mb,
+               parameters_schema_json={"run": {"type": "int", "required": True, "validation": {"min": 0}}},
+               command_template_json={"interpreter": "python3", "script_path": script.path, "named_args": {"--run": "run"}})
+    db.add(m)
+    db.flush()
+    db.add(ModuleAssignment(module_id=m.id, subject_type='user', subject_id=user.id, permissions=['run', 'view']))
+    db.commit()
+    module_id = m.id
+    db.close()
+    return module_id
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--executions', type=int, default=200)
+    ap.add_argument('--concurrency', type=int, default=20, help='clients posting /execute at once')
+    ap.add_argument('--workers', type=int, default=4, help='threads running the worker task')
+    ap.add_argument('--lines', type=int, default=1000, help='log lines per execution')
+    ap.add_argument('--frame-lines', type=int, default=8)
+    ap.add_argument('--run-ms', type=float, default=50.0, help='script runtime, spread over its output')
+    ap.add_argument('--create-ms', type=float, default=0.0, help='container create latency (pool misses)')
+    ap.add_argument('--artifacts', type=int, default=1)
+    ap.add_argument('--artifact-kb', type=int, default=64)
+    ap.add_argument('--scheduler', action='store_true', help='admit through the Redis scheduler (one fake node)')
+    ap.add_argument('--redis-url', help='real Redis instead of fakeredis')
+    ap.add_argument('--timeout', type=float, default=600.0)
+    args = ap.parse_args()
+
+    if args.redis_url:
+        os.environ['REDIS_URL'] = args.redis_url
+    bench.common.setup_db()
+    from app.config import settings
+    settings.SCHEDULER_ENABLED = args.scheduler
+    settings.LOG_ARCHIVE_ENABLED = False
+    from app.services import redis_client, storage
+    if not args.redis_url:
+        import fakeredis  # pip install fakeredis
+        redis_client._client, redis_client._client_pid = fakeredis.FakeRedis(), os.getpid()
+    s3 = FakeS3()
+    storage._client, storage._client_pid = s3, os.getpid()
+    from app.worker.pool import pool
+    pool._check_fork()
+    pool._client = FakeDocker(args)
+
+    from prometheus_client import REGISTRY
+    from app.main import app
+    from app.database import dispose_async_engine
+    from app.services.scheduler import scheduler
+    from app.worker.celery_app import celery
+    from app.tasks import run_execution
+
+    module_id = seed(settings.DEFAULT_CPU_LIMIT, settings.DEFAULT_MEM_LIMIT_MB)
+    if args.scheduler:
+        from app.worker import node
+        node._node['name'] = 'bench@local'  # as a worker registers it, so starts match the placement
+        scheduler.heartbeat('bench@local', float(args.workers), 1 << 20, args.workers)
+
+    jobs: queue.Queue = queue.Queue()
+    done_at: dict[int, float] = {}
+    all_done = threading.Event()
+
+    def send_task(name, args=None, **kwargs):
+        # stands in for the broker: the job is taken by the next free worker thread
+        jobs.put(args)
+
+    def worker():
+        while True:
+            item = jobs.get()
+            if item is None:
+                return
+            execution_id, params = item
+            run_execution(execution_id, params)
+            done_at[execution_id] = time.perf_counter()
+            if len(done_at) >= args.executions:
+                all_done.set()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.workers)]
+    for t in threads:
+        t.start()
+    celery.send_task = send_task
+
+    posted_at: dict[int, float] = {}
+    enqueue: list[float] = []
+
+    async def drive():
+        import httpx
+        todo = iter(range(args.executions))
+        headers = {'X-Demo-User': 'bench@example.com'}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench', timeout=60) as client:
+            async def one_client():
+                for i in todo:
+                    t0 = time.perf_counter()
+                    resp = await client.post(f'/api/modules/{module_id}/execute', json={"parameters": {"run": i}}, headers=headers)
+                    resp.raise_for_status()
+                    enqueue.append(time.perf_counter() - t0)
+                    posted_at[resp.json()['id']] = t0
+
+            await asyncio.gather(*(one_client() for _ in range(args.concurrency)))
+        await dispose_async_engine()
+
+    lines_before = sum(REGISTRY.get_sample_value('ssr_log_lines_total', {'stream': s}) or 0 for s in ('stdout', 'stderr'))
+    t0 = time.perf_counter()
+    asyncio.run(drive())
+    post_elapsed = time.perf_counter() - t0
+    finished = all_done.wait(args.timeout)
+    elapsed = time.perf_counter() - t0
+    for _ in threads:
+        jobs.put(None)
+
+    from sqlalchemy import func
+    from app.database import SessionLocal
+    from app.models import Execution
+    db = SessionLocal()
+    statuses = dict(db.query(Execution.status, func.count()).group_by(Execution.status).all())
+    # queued_at -> started_at as the worker records it, so scheduler admission waits are included
+    queue_wait = [(s - q).total_seconds() for q, s in db.query(Execution.queued_at, Execution.started_at).filter(Execution.started_at.isnot(None))]
+    db.close()
+    lines = sum(REGISTRY.get_sample_value('ssr_log_lines_total', {'stream': s}) or 0 for s in ('stdout', 'stderr')) - lines_before
+    pump_sec = REGISTRY.get_sample_value('ssr_execution_stage_seconds_sum', {'stage': 'log_pump'}) or 0.0
+    ids = [i for i in posted_at if i in done_at]
+    print(json.dumps({
+        "executions": args.executions,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "scheduler": args.scheduler,
+        "database": settings.DATABASE_URL.split(':', 1)[0],
+        "completed": len(done_at),
+        "timed_out": not finished,
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "executions_per_sec": round(len(done_at) / elapsed, 1),
+        "posts_per_sec": round(args.executions / post_elapsed, 1),
+        "enqueue": summary(enqueue),
+        "queue_wait": summary(queue_wait),
+        "end_to_end": summary([done_at[i] - posted_at[i] for i in ids]),
+        "log_ingest": {
+            "lines": int(lines),
+            "lines_per_sec": round(lines / elapsed),
+            # per second of log_pump stage time summed over executions (includes the --run-ms pauses)
+            "lines_per_pump_sec": round(lines / pump_sec) if pump_sec else None,
+        },
+        "artifact_bytes_uploaded": s3.bytes,
+        "container_pool": pool.stats(),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Enqueue-path lookups (user by email + module by id): database every time vs. the read-through cache.
+
+Needs the Redis at REDIS_URL (docker compose up redis); the database defaults to throwaway SQLite.
+
+    cd api && python -m bench.entity_cache --users 500 --modules 200 --lookups 20000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import bench.common
+
+
+def seed(users: int, modules: int):
+    from app.database import SessionLocal
+    from app.models import User, Script, Module
+    db = SessionLocal()
+    db.add_all(User(name=f"u{i}", email=f"u{i}@example.com", role='user') for i in range(users))
+    db.add(Script(name='job.py', path='/opt/scripts/job.py', interpreter='python3', checksum='na'))
+    db.flush()
+    tmpl = {"interpreter": "python3", "script_path": "/opt/scripts/job.py", "named_args": {"--n": "n"}}
+    db.add_all(Module(name=f"m{i}", script_id=1, parameters_schema_json={"n": {"type": "int"}}, command_template_json=tmpl,
+                      timeout_sec=60, cpu_limit=1, mem_limit_mb=256) for i in range(modules))
+    db.commit()
+    db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--users', type=int, default=500)
+    ap.add_argument('--modules', type=int, default=200)
+    ap.add_argument('--lookups', type=int, default=20000)
+    args = ap.parse_args()
+    from app.database import SessionLocal
+    from app.models import User, Module
+    from app.services import entity_cache
+    from app.services.redis_client import client
+    try:
+        client().ping()
+    except Exception as e:
+        sys.exit(f"Redis not reachable at REDIS_URL: {e}")
+
+    bench.common.setup_db()
+    seed(args.users, args.modules)
+    rnd = random.Random(7)
+    keys = [(f"u{rnd.randrange(args.users)}@example.com", rnd.randrange(args.modules) + 1) for _ in range(args.lookups)]
+
+    def run(lookup) -> float:
+        db = SessionLocal()
+        t0 = time.perf_counter()
+        for email, mid in keys:
+            lookup(db, email, mid)
+            db.rollback()  # one request per iteration: nothing carried in the identity map
+        db.close()
+        return (time.perf_counter() - t0) / len(keys) * 1e6
+
+    uncached = run(lambda db, e, m: (db.query(User).filter_by(email=e).first(), db.query(Module).get(m)))
+    for c in (entity_cache.module_cache, entity_cache.user_cache):
+        c.invalidate()
+    cached = run(lambda db, e, m: (entity_cache.get_user_by_email(db, e), entity_cache.get_module(db, m)))
+    print(json.dumps({
+        "lookups": args.lookups,
+        "database_us_per_request": round(uncached, 2),
+        "cached_us_per_request": round(cached, 2),
+        "cache": entity_cache.stats(),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Log ingest throughput: per-line commits vs. LogIngestor.
+
+    cd api && python -m bench.log_ingest --lines 20000
+"""
+import argparse
+import json
+import time
+from bench.common import setup_db
+
+
+def synthetic_output(lines: int, frame_lines: int = 8):
+    line = b"[INFO] processed batch 00042 rows=1000 user=ops@example.com took=12ms\n"
+    for i in range(0, lines, frame_lines):
+        yield ('stderr' if i % 10 == 0 else 'stdout'), line * min(frame_lines, lines - i)
+
+
+def run_per_line(db, execution_id: int, lines: int) -> int:
+    from app.models import ExecutionLog
+    from bench.redaction import legacy_mask_secrets
+    seq = 0
+    for _, frame in synthetic_output(lines):
+        for raw in frame.splitlines(keepends=True):
+            red = legacy_mask_secrets(raw.decode('utf-8', errors='ignore'), ['s3cr3t'])
+            db.add(ExecutionLog(execution_id=execution_id, stream='stdout', chunk_text_redacted=red, sequence_no=seq))
+            seq += 1
+            db.commit()
+    return seq
+
+
+def run_ingestor(db, execution_id: int, lines: int) -> int:
+    from app.services.log_ingest import LogIngestor
+    from app.services.redaction import RedactionEngine
+    ing = LogIngestor(db, execution_id, RedactionEngine(['s3cr3t']))
+    for stream, frame in synthetic_output(lines):
+        ing.feed(stream, frame)
+    ing.close()
+    return ing.chunks
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--lines', type=int, default=20000)
+    args = ap.parse_args()
+    setup_db()
+    from app.database import SessionLocal
+    results = {}
+    for i, (name, fn) in enumerate([('per_line_commit', run_per_line), ('log_ingestor', run_ingestor)], start=1):
+        db = SessionLocal()
+        try:
+            t0 = time.perf_counter()
+            rows = fn(db, i, args.lines)
+            dt = time.perf_counter() - t0
+        finally:
+            db.close()
+        results[name] = {"lines": args.lines, "rows": rows, "seconds": round(dt, 3), "lines_per_sec": round(args.lines / dt)}
+    results["speedup"] = round(results["log_ingestor"]["lines_per_sec"] / results["per_line_commit"]["lines_per_sec"], 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
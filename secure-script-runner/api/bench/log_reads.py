@@ -0,0 +1,77 @@
+"""Paged log reads and their query plan.
+
+Seeds many executions' worth of log rows, checks that the page query is an
+index range scan on ux_execution_logs_exec_seq (exits non-zero otherwise)
+and times paging through one large execution.
+
+    cd api && python -m bench.log_reads --executions 50 --rows 20000
+"""
+import argparse
+import json
+import sys
+import time
+from sqlalchemy import insert, text
+from bench.common import setup_db
+
+
+def seed(db, executions: int, rows: int):
+    from app.models import ExecutionLog
+    for ex in range(1, executions + 1):
+        n = rows if ex == 1 else rows // 10
+        for start in range(0, n, 5000):
+            db.execute(insert(ExecutionLog), [
+                {"execution_id": ex, "stream": "stdout", "chunk_text_redacted": f"line {i}\n", "sequence_no": i}
+                for i in range(start, min(start + 5000, n))
+            ])
+    db.commit()
+
+
+def query_plan(db, exec_id: int, since_seq: int, limit: int) -> str:
+    # same shape as app.routes.executions._logs_select
+    sql = ("SELECT * FROM execution_logs WHERE execution_id = :e AND sequence_no >= :s "
+           "ORDER BY sequence_no LIMIT :l")
+    prefix = 'EXPLAIN QUERY PLAN ' if db.bind.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = db.execute(text(prefix + sql), {"e": exec_id, "s": since_seq, "l": limit}).all()
+    return '\n'.join(str(r[-1]) for r in rows)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--executions', type=int, default=50)
+    ap.add_argument('--rows', type=int, default=20000)
+    ap.add_argument('--page', type=int, default=1000)
+    args = ap.parse_args()
+    setup_db()
+    from app.database import SessionLocal
+    from app.routes.executions import _logs_select
+    db = SessionLocal()
+    try:
+        seed(db, args.executions, args.rows)
+        plan = query_plan(db, 1, args.rows // 2, args.page)
+        t0 = time.perf_counter()
+        pages, seq = 0, 0
+        while True:
+            rows = db.execute(_logs_select(1, seq, args.page)).scalars().all()
+            pages += 1
+            if len(rows) < args.page:
+                break
+            seq = rows[-1].sequence_no + 1
+        dt = time.perf_counter() - t0
+    finally:
+        db.close()
+    uses_index = 'ux_execution_logs_exec_seq' in plan
+    print(json.dumps({
+        "rows": args.rows,
+        "page": args.page,
+        "pages": pages,
+        "seconds": round(dt, 3),
+        "ms_per_page": round(dt / pages * 1000, 2),
+        "plan": plan,
+        "uses_index": uses_index,
+    }, indent=2))
+    if not uses_index:
+        sys.exit("page query does not use ux_execution_logs_exec_seq")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Per-request parameter validation and argv/env build cost for one module.
+
+Compares the unvalidated legacy builder, compiling the module version on every
+request, and the ``(module_id, version)`` cache the API and workers use.
+
+    cd api && python -m bench.module_params --iterations 100000 --params 12
+"""
+import argparse
+import json
+import time
+from types import SimpleNamespace
+import bench.common  # noqa: F401  (env defaults)
+
+
+def make_module(n: int):
+    from app.config import settings
+    schema, named, env = {}, {}, {}
+    kinds = [
+        ("string", {"regex": r"^[a-z0-9._-]+@[a-z0-9.-]+\.[a-z]{2,}$"}, "ops@example.com"),
+        ("int", {"min": 1, "max": 365}, "30"),
+        ("enum", {"enum": ["prod", "staging", "dev"]}, "staging"),
+        ("float", {"min": 0, "max": 1}, 0.25),
+        ("bool", None, "true"),
+        ("secret", None, "s3cr3t-value"),
+    ]
+    params = {}
+    for i in range(n):
+        ptype, rules, value = kinds[i % len(kinds)]
+        name = f"p{i}"
+        schema[name] = {"name": name, "type": ptype, "required": True, "validation": rules}
+        if ptype == "secret":
+            env[f"P{i}"] = name
+        else:
+            named[f"--p{i}"] = name
+        params[name] = value
+    template = {"interpreter": "python3", "script_path": settings.SCRIPT_BASE + "/job.py", "named_args": named, "env": env}
+    module = SimpleNamespace(id=1, version=1, parameters_schema_json=schema, command_template_json=template)
+    return module, params
+
+
+def per_call_us(fn, iterations: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - t0) / iterations * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--iterations', type=int, default=100000)
+    ap.add_argument('--params', type=int, default=12)
+    args = ap.parse_args()
+    from app.services.command_builder import build_argv, extract_env_map
+    from app.services.module_spec import CompiledModule, compiled_modules
+
+    m, params = make_module(args.params)
+    tmpl, schema = m.command_template_json, m.parameters_schema_json
+
+    def legacy_build():
+        build_argv(tmpl, params)
+        extract_env_map(tmpl, params)
+
+    def run(cm):
+        p = cm.validate(params)
+        cm.argv(p)
+        cm.env(p)
+        cm.secrets(p)
+
+    uncached = lambda: run(CompiledModule(m.id, m.version, schema, tmpl))
+    cached = lambda: run(compiled_modules.get(m))
+    cm = compiled_modules.get(m)
+    assert cm.argv(params) == build_argv(tmpl, params) and cm.env(params) == extract_env_map(tmpl, params)
+    print(json.dumps({
+        "params": args.params,
+        "iterations": args.iterations,
+        "legacy_build_only_us": round(per_call_us(legacy_build, args.iterations), 2),
+        "validate_and_build_compiled_per_request_us": round(per_call_us(uncached, args.iterations // 10 or 1), 2),
+        "validate_and_build_cached_us": round(per_call_us(cached, args.iterations), 2),
+        "cache": compiled_modules.stats(),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""OIDC verification against a local stand-in IdP: JWKS caching, rotation and token expiry.
+
+Serves a JWKS document from a local HTTP server (counting fetches) and drives
+``GET /api/scripts`` in ``AUTH_MODE=oidc`` with RS256 tokens, checking that:
+
+- repeated requests with one token fetch the JWKS once and verify it once;
+- a token signed with a rotated-in key (unknown ``kid``) triggers one refetch,
+  and further unknown kids inside the refetch interval (``--min-refetch``)
+  do not;
+- a cached token is rejected once its ``exp`` passes.
+
+Exits non-zero if any check fails.
+
+    cd api && python -m bench.oidc --requests 200
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bench.common  # noqa: F401  (env defaults)
+
+ISSUER = 'http://idp.bench'
+AUDIENCE = 'ssr-bench'
+
+
+class StandInIdP:
+    """JWKS endpoint on 127.0.0.1 that serves whatever keys are currently published."""
+
+    def __init__(self):
+        self.keys: list[dict] = []
+        self.fetches = 0
+        idp = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                idp.fetches += 1
+                body = json.dumps({"keys": idp.keys}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/jwks"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def signing_key(kid: str, bits: int) -> tuple[str, dict]:
+    import rsa
+    from jose import jwk
+    pub, priv = rsa.newkeys(bits)
+    public = jwk.construct(pub.save_pkcs1().decode(), 'RS256').to_dict()
+    return priv.save_pkcs1().decode(), {**public, "kid": kid, "use": "sig"}
+
+
+def token(pem: str, kid: str, ttl: float, email: str = 'bench@example.com') -> str:
+    from jose import jwt
+    now = int(time.time())
+    return jwt.encode({"iss": ISSUER, "aud": AUDIENCE, "sub": email, "email": email, "iat": now, "exp": now + int(ttl)},
+                      pem, algorithm='RS256', headers={"kid": kid})
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--requests', type=int, default=200)
+    ap.add_argument('--key-bits', type=int, default=2048)
+    ap.add_argument('--min-refetch', type=float, default=1.0, help='OIDC_JWKS_MIN_REFETCH_SEC for the run')
+    ap.add_argument('--exp-sec', type=int, default=2, help='lifetime of the short-lived token in the expiry check')
+    args = ap.parse_args()
+
+    idp = StandInIdP()
+    from app.config import settings
+    settings.AUTH_MODE = 'oidc'
+    settings.OIDC_ISSUER, settings.OIDC_AUDIENCE, settings.OIDC_JWKS_URL = ISSUER, AUDIENCE, idp.url
+    bench.common.setup_db()
+    from app.main import app
+    from app.services.jwks import JWKSCache, VerifiedTokenCache
+    import app.services.jwks as jwks
+    import app.security as security
+    # fresh caches bound to the stand-in (the module-level ones were built from the env at import)
+    security.jwks_cache = jwks.jwks_cache = JWKSCache(idp.url, min_refetch=args.min_refetch)
+    security.token_cache = jwks.token_cache = VerifiedTokenCache()
+
+    pem1, jwk1 = signing_key('k1', args.key_bits)
+    pem2, jwk2 = signing_key('k2', args.key_bits)
+    idp.keys = [jwk1]
+    checks: dict[str, bool] = {}
+    out: dict = {"jwks_url": idp.url}
+
+    async def drive():
+        import httpx
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as client:
+            async def get(tok: str) -> tuple[int, float]:
+                t0 = time.perf_counter()
+                resp = await client.get('/api/scripts', headers={'Authorization': f'Bearer {tok}'})
+                return resp.status_code, time.perf_counter() - t0
+
+            # 1. cache hit: one fetch, one verification, then token cache hits
+            tok1 = token(pem1, 'k1', 600)
+            cold_status, cold = await get(tok1)
+            warm = [await get(tok1) for _ in range(args.requests)]
+            checks["cached_token_ok"] = cold_status == 200 and all(s == 200 for s, _ in warm)
+            checks["one_jwks_fetch"] = idp.fetches == 1
+            checks["verified_once"] = security.token_cache.misses == 1 and security.token_cache.hits == args.requests
+            out["first_request_ms"] = round(cold * 1000, 2)
+            out["cached_request_p50_ms"] = round(sorted(d for _, d in warm)[len(warm) // 2] * 1000, 2)
+
+            # 2. rotation: an unknown kid refetches once; more unknown kids right after do not
+            await asyncio.sleep(args.min_refetch)  # the initial fetch counts against the refetch limit
+            idp.keys = [jwk1, jwk2]
+            status, _ = await get(token(pem2, 'k2', 600))
+            checks["rotated_key_accepted"] = status == 200
+            checks["refetch_on_unknown_kid"] = idp.fetches == 2
+            bogus = [await get(token(pem2, f'unknown-{i}', 600)) for i in range(20)]
+            checks["unknown_kid_rejected"] = all(s == 401 for s, _ in bogus)
+            checks["refetch_rate_limited"] = idp.fetches == 2
+
+            # 3. expiry: a cached token stops working at exp
+            short = token(pem1, 'k1', args.exp_sec)
+            before, _ = await get(short)
+            await get(short)
+            await asyncio.sleep(args.exp_sec + 1.1)
+            after, _ = await get(short)
+            checks["accepted_before_exp"] = before == 200
+            checks["rejected_after_exp"] = after == 401
+        await jwks.http_client().aclose()
+
+    asyncio.run(drive())
+    out.update({"requests": args.requests, "jwks_fetches": idp.fetches,
+                "token_cache": {"hits": security.token_cache.hits, "misses": security.token_cache.misses}, "checks": checks})
+    print(json.dumps(out, indent=2))
+    idp.server.shutdown()
+    if not all(checks.values()):
+        sys.exit("failed: " + ", ".join(k for k, ok in checks.items() if not ok))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Redaction throughput over MB-scale synthetic logs: legacy per-line masking
+(one str.replace per secret plus one pass per PII pattern) vs. RedactionEngine.
+
+    cd api && python -m bench.redaction --mb 8 --secrets 20
+"""
+import argparse
+import json
+import random
+import re
+import string
+import time
+import bench.common  # noqa: F401  (settings env)
+
+LEGACY_PII = [re.compile(r"[\w.-]+@[\w.-]+\.[A-Za-z]{2,}")]
+
+
+def legacy_mask_secrets(text: str, secrets) -> str:
+    t = text
+    for s in secrets:
+        if s:
+            t = t.replace(s, "***")
+    for pat in LEGACY_PII:
+        t = pat.sub("***", t)
+    return t
+
+
+def synthetic_log(mb: int, secrets: list[str], seed: int = 7) -> bytes:
+    rnd = random.Random(seed)
+    words = [''.join(rnd.choices(string.ascii_lowercase, k=rnd.randint(3, 9))) for _ in range(500)]
+    out, size = [], 0
+    while size < mb * 1024 * 1024:
+        line = ' '.join(rnd.choices(words, k=rnd.randint(6, 16)))
+        r = rnd.random()
+        if r < 0.02:
+            line += f" token={rnd.choice(secrets)}"
+        elif r < 0.04:
+            line += f" notify {rnd.choice(words)}@example.com"
+        line = f"[INFO] {line}\n"
+        out.append(line)
+        size += len(line)
+    return ''.join(out).encode()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--mb', type=int, default=8)
+    ap.add_argument('--secrets', type=int, default=20)
+    ap.add_argument('--frame', type=int, default=4096, help='bytes per output frame fed to the stream redactor')
+    args = ap.parse_args()
+    from app.services.redaction import RedactionEngine
+    rnd = random.Random(1)
+    secrets = [''.join(rnd.choices(string.ascii_letters + string.digits, k=24)) for _ in range(args.secrets)]
+    data = synthetic_log(args.mb, secrets)
+    text = data.decode()
+
+    t0 = time.perf_counter()
+    legacy = ''.join(legacy_mask_secrets(line, secrets) for line in text.splitlines(keepends=True))
+    t_legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    engine = RedactionEngine(secrets)
+    stream = engine.stream()
+    parts = [stream.feed(data[i:i + args.frame].decode()) for i in range(0, len(data), args.frame)]
+    parts.append(stream.flush())
+    t_engine = time.perf_counter() - t0
+
+    assert ''.join(parts) == legacy, "engine output differs from legacy redaction"
+    mb = len(data) / (1024 * 1024)
+    print(json.dumps({
+        "mb": round(mb, 2),
+        "secrets": args.secrets,
+        "legacy_mb_per_sec": round(mb / t_legacy, 1),
+        "engine_mb_per_sec": round(mb / t_engine, 1),
+        "speedup": round(t_legacy / t_engine, 2),
+        "redactions": engine.redactions,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Per-execution overhead of each sandbox backend for a script that does almost nothing.
+
+Times create, start, output drain, exit code, artifact collection (into an
+in-memory bucket) and destroy. A bare ``subprocess.run`` is the floor. The
+docker backend needs a reachable daemon and the runner image, and is skipped
+otherwise; ``--pool`` keeps that many warm runners per profile as in production.
+
+    cd api && python -m bench.sandbox --runs 200
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import time
+import bench.common  # noqa: F401  (env defaults)
+
+SCRIPT = ['/bin/sh', '-c', 'echo started; mkdir -p artifacts; echo done > artifacts/result.txt']
+
+
+def one(backend, execution_id: int) -> dict:
+    t = {}
+    t0 = time.perf_counter()
+    box = backend.create(execution_id, 1.0, 256, 30)
+    t['create'] = time.perf_counter() - t0
+    try:
+        t1 = time.perf_counter()
+        frames = box.start(SCRIPT, {})
+        t['start'] = time.perf_counter() - t1
+        t1 = time.perf_counter()
+        for _ in frames:
+            pass
+        code = box.exit_code()
+        t['run'] = time.perf_counter() - t1
+        if code != 0:
+            raise RuntimeError(f"exit code {code}")
+        t1 = time.perf_counter()
+        box.collect_artifacts(execution_id)
+        t['artifacts'] = time.perf_counter() - t1
+    finally:
+        t1 = time.perf_counter()
+        box.destroy()
+        t['destroy'] = time.perf_counter() - t1
+    t['total'] = time.perf_counter() - t0
+    return t
+
+
+def report(samples: list[dict]) -> dict:
+    totals = sorted(s['total'] for s in samples)
+    out = {
+        "p50_ms": round(totals[len(totals) // 2] * 1000, 2),
+        "p95_ms": round(totals[min(len(totals) - 1, int(len(totals) * 0.95))] * 1000, 2),
+        "executions_per_sec": round(len(totals) / sum(totals), 1),
+    }
+    out["mean_ms_by_phase"] = {k: round(statistics.fmean(s[k] for s in samples) * 1000, 2) for k in samples[0] if k != 'total'}
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--runs', type=int, default=200)
+    ap.add_argument('--pool', type=int, default=2, help='RUNNER_POOL_SIZE for the docker backend')
+    args = ap.parse_args()
+    from app.config import settings
+    settings.SANDBOX_BACKENDS = 'docker,process'
+    settings.RUNNER_POOL_SIZE = args.pool
+    from app.services import storage
+    from bench.e2e import FakeS3
+    storage._client, storage._client_pid = FakeS3(), os.getpid()
+    from app.worker import sandbox
+
+    results = {"runs": args.runs}
+    bare = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        subprocess.run(SCRIPT[:2] + ['echo started'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        bare.append({'total': time.perf_counter() - t0})
+    results["bare_subprocess"] = {k: v for k, v in report(bare).items() if k != 'mean_ms_by_phase'}
+
+    for name in ('process', 'docker'):
+        backend = sandbox.backend(name)
+        try:
+            one(backend, 0)  # warm up (and probe the docker daemon)
+        except Exception as e:
+            results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+            continue
+        results[name] = report([one(backend, i) for i in range(1, args.runs + 1)])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""SIEM forwarding against a local stand-in webhook: batching, spool on outage, replay.
+
+Runs a ``SiemForwarder`` (with a temp spool) against a local HTTP server that
+records every event it accepts and can be switched to answer 503. Checks that:
+
+- a burst of ``--events`` is delivered in batches of at most ``SIEM_BATCH_SIZE``
+  and ``submit`` never waits on the network;
+- while the SIEM answers 503, or 401 as with an expired token, events end up
+  in the on-disk spool;
+- once it is back, the spool is replayed oldest first and every event arrives
+  exactly once;
+- a batch the SIEM rejects with 400 is discarded and counted as dropped.
+
+Exits non-zero if any check fails.
+
+    cd api && python -m bench.siem --events 2000 --outage-events 500
+"""
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bench.common  # noqa: F401  (env defaults)
+
+
+class StandInSIEM:
+    """Webhook on 127.0.0.1 accepting NDJSON or JSON array batches."""
+
+    def __init__(self):
+        self.status = 200
+        self.events: list[dict] = []
+        self.batch_sizes: list[int] = []
+        self.rejected = 0
+        self._lock = threading.Lock()
+        siem = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with siem._lock:
+                    if siem.status >= 400:
+                        siem.rejected += 1
+                    else:
+                        text = body.decode()
+                        events = json.loads(text) if text.startswith('[') else [json.loads(line) for line in text.splitlines() if line]
+                        siem.events.extend(events)
+                        siem.batch_sizes.append(len(events))
+                self.send_response(siem.status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/events"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def received(self) -> int:
+        with self._lock:
+            return len(self.events)
+
+
+def wait_for(cond, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--events', type=int, default=2000)
+    ap.add_argument('--outage-events', type=int, default=500)
+    ap.add_argument('--batch-size', type=int, default=100)
+    ap.add_argument('--format', choices=['ndjson', 'array'], default='ndjson')
+    ap.add_argument('--timeout', type=float, default=60.0)
+    args = ap.parse_args()
+
+    siem = StandInSIEM()
+    from app.config import settings
+    settings.SIEM_BATCH_SIZE = args.batch_size
+    settings.SIEM_FORMAT = args.format
+    settings.SIEM_FLUSH_INTERVAL_SEC = 0.1
+    settings.SIEM_MAX_RETRIES = 1
+    settings.SIEM_MAX_BACKOFF_SEC = 1.0
+    from app.services.siem import SiemForwarder
+    fwd = SiemForwarder(siem.url, spool_dir=tempfile.mkdtemp(prefix='ssr-siem-bench-'))
+    checks: dict[str, bool] = {}
+    seq = iter(range(1 << 30))
+
+    def burst(n: int) -> list[float]:
+        took = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            fwd.submit({"seq": next(seq), "action": "bench.event", "entity_type": "bench", "entity_id": "1"})
+            took.append(time.perf_counter() - t0)
+        return sorted(took)
+
+    # 1. batching
+    t0 = time.perf_counter()
+    took = burst(args.events)
+    checks["burst_delivered"] = wait_for(lambda: siem.received() >= args.events, args.timeout)
+    burst_sec = time.perf_counter() - t0
+    checks["batched"] = len(siem.batch_sizes) < args.events and max(siem.batch_sizes, default=0) <= args.batch_size
+    out = {
+        "events": args.events,
+        "batches": len(siem.batch_sizes),
+        "events_per_sec": round(siem.received() / burst_sec),
+        "submit_p99_us": round(took[min(len(took) - 1, int(len(took) * 0.99))] * 1e6, 1),
+    }
+
+    # 2. outage: 503s, then 401s, send everything to the spool
+    out["outage"] = {}
+    for n, status in enumerate((503, 401), 1):
+        siem.status = status
+        burst(args.outage_events)
+        checks[f"spooled_on_{status}"] = wait_for(lambda: fwd.spooled >= n * args.outage_events, args.timeout)
+        out["outage"][status] = {"events": args.outage_events, "rejected_posts": siem.rejected, "spooled": fwd.spooled}
+    checks["nothing_accepted_during_outage"] = siem.received() == args.events
+    checks["nothing_dropped_during_outage"] = fwd.dropped == 0
+    out["outage"]["spool_files"] = fwd.stats()["spool_files"]
+
+    # 3. recovery: the spool is replayed, oldest first, once posts succeed again
+    siem.status = 200
+    t1 = time.perf_counter()
+    total = args.events + 2 * args.outage_events
+    checks["replayed"] = wait_for(lambda: siem.received() >= total and not fwd.stats()["spool_files"], args.timeout)
+    seqs = [e["seq"] for e in siem.events]
+    checks["exactly_once"] = sorted(seqs) == list(range(total))
+    checks["replay_in_order"] = seqs[args.events:] == sorted(seqs[args.events:])
+    out["recovery"] = {"replayed": fwd.replayed, "seconds": round(time.perf_counter() - t1, 3)}
+
+    # 4. a payload rejection is final: not spooled, counted as dropped
+    siem.status = 400
+    spooled = fwd.spooled
+    burst(10)
+    checks["dropped_on_400"] = wait_for(lambda: fwd.dropped == 10, args.timeout) and fwd.spooled == spooled
+    siem.status = 200
+    out["rejected"] = {"events": 10, "dropped": fwd.dropped}
+    out["checks"] = checks
+    print(json.dumps(out, indent=2))
+    siem.server.shutdown()
+    if not all(checks.values()):
+        sys.exit("failed: " + ", ".join(k for k, ok in checks.items() if not ok))
+
+
+if __name__ == '__main__':
+    main()
@@ -18,19 +18,17 @@ export default function ModulePage(){
     const res = await fetch(`${API}/api/modules/${id}/execute`, { method:'POST', headers, body: JSON.stringify(body) })
     const ex = await res.json()
     setExecId(ex.id)
-    pollLogs(ex.id, 0)
+    streamLogs(ex.id)
   }
 
-  async function pollLogs(exId, seq){
-    const res = await fetch(`${API}/api/modules/exec/${exId}/logs?sinceSeq=${seq}`, { headers })
-    const chunks = await res.json()
-    if(chunks.length){
-      setLogs(prev => [...prev, ...chunks])
-      const nextSeq = chunks[chunks.length-1].sequence_no + 1
-      setTimeout(()=>pollLogs(exId, nextSeq), 1000)
-    } else {
-      setTimeout(()=>pollLogs(exId, seq), 1500)
-    }
+  function streamLogs(exId){
+    // EventSource reconnects on its own and resumes via Last-Event-ID
+    const es = new EventSource(`${API}/api/modules/exec/${exId}/stream?sinceSeq=0`)
+    es.addEventListener('log', (e) => setLogs(prev => [...prev, JSON.parse(e.data)]))
+    es.addEventListener('status', (e) => {
+      const { status } = JSON.parse(e.data)
+      if(['succeeded','failed','canceled','timeout'].includes(status)) es.close()
+    })
   }
 
   return (